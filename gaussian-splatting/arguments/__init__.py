@@ -54,6 +54,13 @@ class ModelParams(ParamGroup):
         self._resolution = 4
         self._white_background = False
         self.data_device = "cuda"
+        # upper bound of decoded training images kept in memory (see utils/image_cache_utils.py)
+        self.image_cache_gb = 4.0
+        # decode JPEG images at full resolution before resizing, instead of a reduced DCT scale
+        self.full_decode = False
+        # directory of resized images shared by processes, e.g., by clients with overlapping images. disabled if empty
+        self.image_cache_dir = ""
+        self.image_cache_disk_gb = 64.0
         self.eval = False
         super().__init__(parser, "Loading Parameters", sentinel)
 
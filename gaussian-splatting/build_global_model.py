@@ -1,7 +1,8 @@
 # Copyright (C) 2024 Denso IT Laboratory, Inc.
 # All Rights Reserved
-from typing import List, Dict, Any
+from typing import List
 import os
+import re
 import sys
 import logging
 logger = logging.getLogger('build-global')
@@ -16,20 +17,30 @@ from tqdm import tqdm
 
 from scene.gaussian_model import GaussianModel
 from utils.model_update_utils import (get_model_params,
-                                      compute_visible_point_mask,
+                                      compute_visible_rows,
                                       rendering,
                                       sample_cameras,
-                                      get_cameras_from_metadata,
                                       knn_filtering,
                                       faiss_knn,
                                       reset_opacity,
                                       make_index)
 from utils.loss_utils import l1_loss, ssim
+from utils.store_utils import GaussianStore
+from utils.spatial_utils import VoxelIndex, auto_voxel_size
+from utils.registry_utils import CameraRegistry, count_overlap, popcount
+from utils.camera_table_utils import CameraTable
+from utils.schedule_utils import OverlapScheduler
+from utils.metadata_utils import load_metadatas
+from utils.ply_utils import params_nbytes
+from utils.model_io_utils import read_client_model
+from utils.prefetch_utils import Prefetcher
+from utils.journal_utils import Journal, get_rng_state, set_rng_state
+from utils.snapshot_utils import SnapshotWriter, load_snapshot
 
 
 def distillation(global_model: GaussianModel,
                  local_model: GaussianModel,
-                 global_metadatas: List[Dict[str, Any]],
+                 global_cameras: CameraTable,
                  img_height: List[int],
                  img_width: List[int],
                  fovx: List[float],
@@ -52,10 +63,9 @@ def distillation(global_model: GaussianModel,
             rgb_l = rendering(local_model, img_height[i], img_width[i], fovx[i], fovy[i], viewmats[i], bg_color)[0]
             target_images.append(rgb_l)
         # rendering target images from global model
-        target_camera_indices = sample_cameras(local_model, global_metadatas, max_cameras=len(target_images), far=far)
-        g_h, g_w, g_fovx, g_fovy, g_vmats = get_cameras_from_metadata(global_metadatas, target_camera_indices)
-        g_h = list(map(lambda x: x //resolution_scale, g_h))
-        g_w = list(map(lambda x: x //resolution_scale, g_w))
+        target_camera_indices = sample_cameras(local_model, None, max_cameras=len(target_images), far=far,
+                                               frustum=(global_cameras.viewmats, global_cameras.projmats))
+        g_h, g_w, g_fovx, g_fovy, g_vmats = global_cameras.gather(target_camera_indices).get_cameras(resolution_scale)
         for i in range(len(g_vmats)):
             rgb_g = rendering(global_model, g_h[i], g_w[i], g_fovx[i], g_fovy[i], g_vmats[i], bg_color)[0]
             target_images.append(rgb_g)
@@ -123,10 +133,10 @@ def distillation(global_model: GaussianModel,
     return global_model
 
 
-def update_model(global_params: Dict[str, Any],
+def update_model(global_store: GaussianStore,
                  client_model: GaussianModel,
-                 client_metadatas: List[Dict[str, Any]],
-                 global_model_camera_meta: List[Dict[str, Any]],
+                 client_cameras: CameraTable,
+                 global_cameras: CameraTable,
                  min_opacity: float,
                  lr_opacity: float,
                  lr_mlp: float,
@@ -138,38 +148,22 @@ def update_model(global_params: Dict[str, Any],
                  resolution_scale: int=1,
                  far: int=100):
     # get camera intrinsic
-    image_height, image_width, fovx, fovy, viewmats = get_cameras_from_metadata(client_metadatas)
-    image_height = list(map(lambda x: x //resolution_scale, image_height))
-    image_width = list(map(lambda x: x //resolution_scale, image_width))
+    image_height, image_width, fovx, fovy, viewmats = client_cameras.get_cameras(resolution_scale)
     # get visible Gaussians
-    vis_msk = compute_visible_point_mask(global_params['xyz'], client_metadatas, 'cpu')
-    logger.info(f"#global model's points: {len(global_params['xyz'])} ({vis_msk.sum()} visible points)")
+    vis_rows = compute_visible_rows(global_store, frustum=client_cameras.frustum_matrices('cpu'))
+    logger.info(f"#global model's points: {len(global_store)} ({len(vis_rows)} visible points)")
     logger.info(f"#local model's points: {len(client_model._xyz.data)}")
-    xyz_g = global_params['xyz']
-    rot_g = global_params['rotation']
-    scale_g = global_params['scaling']
-    opacity_g = global_params['opacity']
-    sh_g = torch.cat([global_params['features_dc'], global_params['features_rest']], 1)
-    vis_xyz_g = xyz_g[vis_msk]
-    vis_rot_g = rot_g[vis_msk]
-    vis_scale_g = scale_g[vis_msk]
-    vis_opacity_g = opacity_g[vis_msk]
-    vis_sh_g = sh_g[vis_msk]
+    vis_params = global_store.gather(vis_rows)
     tmp_global_model = GaussianModel(client_model.max_sh_degree)
-    logger.info(f'#points before model update: {len(vis_xyz_g)}')
-    new_params = dict(xyz=vis_xyz_g,
-                      rotation=vis_rot_g,
-                      scaling=vis_scale_g,
-                      features_dc=vis_sh_g[:, :1],
-                      features_rest=vis_sh_g[:, 1:],
-                      opacity=vis_opacity_g,
-                      app_mlp=global_params['app_mlp'],
-                      app_pos_emb=global_params['app_pos_emb'])
+    logger.info(f'#points before model update: {len(vis_rows)}')
+    new_params = dict(vis_params,
+                      app_mlp=global_store.app_mlp,
+                      app_pos_emb=global_store.app_pos_emb)
     tmp_global_model.set_params(new_params)
 
     tmp_global_model = distillation(tmp_global_model,
                                     client_model,
-                                    global_model_camera_meta,
+                                    global_cameras,
                                     image_height,
                                     image_width,
                                     fovx,
@@ -198,80 +192,97 @@ def update_model(global_params: Dict[str, Any],
         vis_scale_g = vis_scale_g[prune_mask]
         vis_opacity_g = vis_opacity_g[prune_mask]
         vis_sh_g = vis_sh_g[prune_mask]
-    xyz_g = torch.cat([xyz_g[~vis_msk], vis_xyz_g])
-    rot_g = torch.cat([rot_g[~vis_msk], vis_rot_g])
-    scale_g = torch.cat([scale_g[~vis_msk], vis_scale_g])
-    opacity_g = torch.cat([opacity_g[~vis_msk], vis_opacity_g])
-    sh_g = torch.cat([sh_g[~vis_msk], vis_sh_g])
-
-    new_params = dict(xyz=xyz_g,
-                      rotation=rot_g,
-                      scaling=scale_g,
-                      features_dc=sh_g[:, :1],
-                      features_rest=sh_g[:, 1:],
-                      opacity=opacity_g,
-                      app_mlp=app_mlp,
-                      app_pos_emb=app_pos_emb)
-    logger.info(f'#points after model update: {len(xyz_g)}')
-    return new_params
-
-
-def _update_model(global_params, client_model_index, metadatas, client_metadatas, global_model_cam_list, intersection, bg_color, load_iter, args):
+    # replace the visible region of the global model
+    global_store.remove(vis_rows)
+    global_store.append(dict(xyz=vis_xyz_g,
+                             rotation=vis_rot_g,
+                             scaling=vis_scale_g,
+                             features_dc=vis_sh_g[:, :1],
+                             features_rest=vis_sh_g[:, 1:],
+                             opacity=vis_opacity_g))
+    global_store.app_mlp = app_mlp
+    global_store.app_pos_emb = app_pos_emb
+    if global_store.compact():
+        logger.info(f'compact global model into {len(global_store)} points')
+    logger.info(f'#points after model update: {len(global_store)}')
+    return global_store
+
+
+def client_model_path(args, client_model_index, load_iter):
+    return os.path.join(args.model_dir,
+                        client_model_index,
+                        'point_cloud/iteration_' + str(load_iter) + '/point_cloud.ply')
+
+
+def _update_model(global_store, client_model_index, client_cameras, global_cameras, bg_color, load_iter, args, prefetcher=None):
     # load local model
-    client_model_file = os.path.join(args.model_dir,
-                                     client_model_index,
-                                     'point_cloud/iteration_' + str(load_iter) + '/point_cloud.ply')
+    client_model_file = client_model_path(args, client_model_index, load_iter)
     client_model = GaussianModel(args.sh_degree)
-    client_model.load_ply(client_model_file)
+    if prefetcher is not None:
+        client_model.load_ply_params(prefetcher.get(client_model_file))
+    else:
+        client_model.load_ply(client_model_file)
     logger.info(f'update model with {client_model_index}-th clients')
-    g_sub_l = np.setdiff1d(global_model_cam_list, intersection)
-    global_model_camera_meta = [metadatas[fname.split('.')[0]] for fname in g_sub_l]
-    global_params = update_model(global_params, client_model, client_metadatas,
-                                 global_model_camera_meta, args.min_opacity, args.lr_opacity,
-                                 args.lr_mlp, args.wd_mlp, args.lr_hash, args.lr_avec,
-                                 args.n_kd_epoch, bg_color, args.resolution, far=args.far)
-    return global_params
-
-
-def check_buffer(global_params,
-                 client_buffer,
-                 metadatas,
-                 load_iter,
-                 bg_color,
-                 global_model_cam_list,
-                 n_added_client,
-                 args):
-    tmp_client_buffer = []
-    for b_client_idx, b_client_cam_list in client_buffer:
-        torch.cuda.empty_cache()
-        intersection = np.intersect1d(global_model_cam_list, b_client_cam_list)
-        # client selection
-        if len(intersection) < args.overlap_img_threshold:
-            tmp_client_buffer.append([b_client_idx, b_client_cam_list])
-            continue
-        client_model_index = b_client_idx.split('.')[0]
-        client_metadatas = [metadatas[fname.split('.')[0]] for fname in b_client_cam_list]
-        global_params = _update_model(global_params, client_model_index, metadatas, client_metadatas,
-                                      global_model_cam_list, intersection, bg_color, load_iter, args)
-        # update global model's camera list
-        global_model_cam_list = np.union1d(global_model_cam_list, b_client_cam_list)
-        n_added_client += 1
-        # save model
-        if (n_added_client % args.save_freq) == 0:
-            torch.save(global_params, os.path.join(args.output_dir, f'global_model_{n_added_client}clients.pth'))
-    updated = len(tmp_client_buffer) < len(client_buffer)
-    return global_params, tmp_client_buffer, global_model_cam_list, updated, n_added_client
+    global_store = update_model(global_store, client_model, client_cameras,
+                                global_cameras, args.min_opacity, args.lr_opacity,
+                                args.lr_mlp, args.wd_mlp, args.lr_hash, args.lr_avec,
+                                args.n_kd_epoch, bg_color, args.resolution, far=args.far)
+    return global_store
+
+
+def log_plan(order, index_files, image_lists, image_bits, global_model_cams, n_kd_epoch):
+    """Logs the planned aggregation order and the estimated number of distillation iterations"""
+    global_model_cams = global_model_cams.copy()
+    total_iters = 0
+    for step, client in enumerate(order):
+        client_cams = image_bits[client]
+        overlap = count_overlap(global_model_cams, client_cams)
+        # global model's views are sampled up to the number of client's views
+        n_views = len(image_lists[client])
+        n_global_views = min(n_views, popcount(global_model_cams & ~client_cams))
+        n_iters = n_kd_epoch * (n_views + n_global_views)
+        total_iters += n_iters
+        logger.info(f'{step + 1}: {index_files[client]} (overlap: {overlap}, '
+                    f'#views: {n_views} + {n_global_views}, #iterations: {n_iters})')
+        global_model_cams |= client_cams
+    skipped = sorted(set(range(len(image_bits))) - set(order))
+    logger.info(f'{len(order)} clients are aggregated ({total_iters} iterations in total)')
+    if len(skipped) > 0:
+        logger.info(f'{len(skipped)} clients never reach the overlap threshold: '
+                    + ', '.join(index_files[client] for client in skipped))
+
+
+# snapshots written after every merged client to resume an interrupted run
+RESUME_SNAPSHOT_PATTERN = re.compile(r'resume_(\d+)clients\.pth$')
+
+
+def remove_stale_resume_snapshots(output_dir: str, n_clients: int=None):
+    """Removes resume snapshots of fewer than `n_clients` clients (all if None)
+
+    Called after a full base of `n_clients` clients is saved and journaled, since no later snapshot
+    depends on the older ones anymore.
+    """
+    for fname in os.listdir(output_dir):
+        match = RESUME_SNAPSHOT_PATTERN.match(fname)
+        if match and (n_clients is None or int(match.group(1)) < n_clients):
+            os.remove(os.path.join(output_dir, fname))
+
+
+def find_resume_point(records, plan, output_dir):
+    """Returns the journal's plan record and the latest snapshot (or final model) record whose file exists"""
+    if len(records) == 0 or records[0]['type'] != 'plan':
+        raise ValueError('journal does not start with a plan record')
+    header = records[0]
+    if header['order'] != plan:
+        raise ValueError('aggregation order differs from the journal. resume with the same arguments')
+    snapshot = None
+    for record in records[1:]:
+        if record['type'] in ('snapshot', 'done') and os.path.exists(os.path.join(output_dir, record['path'])):
+            snapshot = record
+    return header, snapshot
 
 
 def main(args):
-    metadata_dir = os.path.join(args.dataset_dir, 'train/metadata')
-    logger.info('load metadata')
-    # load metadata including camera intrinsic and extrinsic
-    metadata_files = sorted(os.listdir(metadata_dir))
-    metadatas = {}
-    for fname in tqdm(metadata_files):
-        file_idx = fname.split('.')[0]
-        metadatas[file_idx] = torch.load(os.path.join(metadata_dir, fname))
     # load image indices in clients data
     logger.info('load image lists')
     index_files = sorted(os.listdir(args.index_dir))
@@ -281,60 +292,132 @@ def main(args):
         index_files = index_files[:args.n_clients]
     image_lists = [list(np.loadtxt(os.path.join(args.index_dir, fname), dtype=str))
                    for fname in index_files if '.txt' in fname]
-    # load a 0-th local model as a global model
-    logger.info('initialize global model')
+    # camera sets are represented as bitsets over the registered images
+    registry = CameraRegistry(fname for image_list in image_lists for fname in image_list)
+    image_bits = [registry.encode(image_list) for image_list in image_lists]
     seed_model_index = index_files.pop(0).split('.')[0]
+    image_lists.pop(0)
+    # global model's camera set
+    global_model_cams = image_bits.pop(0)
+    # plan the aggregation order
+    logger.info(f'plan aggregation order ({args.schedule})')
+    scheduler = OverlapScheduler(image_bits, global_model_cams, args.overlap_img_threshold)
+    order = scheduler.plan(args.schedule)
+    if args.dry_run:
+        log_plan(order, index_files, image_lists, image_bits, global_model_cams, args.n_kd_epoch)
+        return
+
+    # the journal records merged clients and snapshots to resume an interrupted run
+    journal_path = os.path.join(args.output_dir, 'journal.jsonl')
+    plan = [index_files[client] for client in order]
+    header, snapshot = None, None
+    if args.resume and os.path.exists(journal_path):
+        header, snapshot = find_resume_point(Journal.read(journal_path), plan, args.output_dir)
+        if snapshot is None:
+            logger.info('no snapshot to resume from is found. start from the seed model')
+    start_step = snapshot['step'] if snapshot is not None else 0
+
+    logger.info('load metadata')
+    # load metadata including camera intrinsic and extrinsic
+    metadatas = load_metadatas(os.path.join(args.dataset_dir, 'train'))
+    # cameras are converted once and gathered by registry IDs at every step
+    camera_table = CameraTable.from_metadatas(registry.names, metadatas)
+    del metadatas
     load_iter = args.load_iteration
-    seed_model_file = os.path.join(args.model_dir,
-                                   seed_model_index,
-                                   'point_cloud/iteration_' + str(load_iter) + '/point_cloud.ply')
-    global_model = GaussianModel(args.sh_degree)
-    global_model.load_ply(seed_model_file)
-    # get model params
-    xyz_g, rot_g, scale_g, opacity_g, sh_g = get_model_params(global_model, preact=True, device='cpu')
-    global_params = dict(xyz=xyz_g,
-                        rotation=rot_g,
-                        scaling=scale_g,
-                        features_dc=sh_g[:, :1],
-                        features_rest=sh_g[:, 1:],
-                        opacity=opacity_g,
-                        app_mlp=global_model.mlp.state_dict(),
-                        app_pos_emb=global_model.pos_emb.state_dict())
-    del global_model
-    # global model's camera list
-    global_model_cam_list = image_lists.pop(0)
-    # placeholder
-    client_buffer = []
+    if snapshot is None:
+        # load a 0-th local model as a global model
+        logger.info('initialize global model')
+        seed_model_file = client_model_path(args, seed_model_index, load_iter)
+        global_model = GaussianModel(args.sh_degree)
+        global_model.load_ply(seed_model_file)
+        # get model params
+        xyz_g, rot_g, scale_g, opacity_g, sh_g = get_model_params(global_model, preact=True, device='cpu')
+        global_params = dict(xyz=xyz_g,
+                             rotation=rot_g,
+                             scaling=scale_g,
+                             features_dc=sh_g[:, :1],
+                             features_rest=sh_g[:, 1:],
+                             opacity=opacity_g,
+                             app_mlp=global_model.mlp.state_dict(),
+                             app_pos_emb=global_model.pos_emb.state_dict())
+        del global_model
+        voxel_size = None
+        if args.voxel_size >= 0:
+            voxel_size = args.voxel_size if args.voxel_size > 0 else auto_voxel_size(xyz_g)
+        journal = Journal(journal_path, [dict(type='plan', seed_model=seed_model_index, order=plan, voxel_size=voxel_size)])
+    else:
+        logger.info(f"resume from {snapshot['path']} ({start_step} / {len(order)} clients aggregated)")
+        global_params = load_snapshot(os.path.join(args.output_dir, snapshot['path']))
+        voxel_size = header['voxel_size']
+        journal = Journal(journal_path)
+        journal.write(dict(type='resume', step=start_step))
+    index = None
+    if voxel_size is not None:
+        logger.info(f'build spatial index (voxel size: {voxel_size})')
+        index = VoxelIndex(voxel_size)
+    global_store = GaussianStore(global_params, compact_ratio=args.compact_ratio, index=index)
+    del global_params
+    # snapshots are written as deltas on the previous one
+    if snapshot is None:
+        snapshot_writer = SnapshotWriter(args.base_freq)
+    else:
+        global_store.mark_snapshot()
+        snapshot_writer = SnapshotWriter(args.base_freq,
+                                         parent=os.path.join(args.output_dir, snapshot['path']),
+                                         depth=snapshot.get('depth', 0))
+    # skip aggregated clients
+    for client in order[:start_step]:
+        global_model_cams |= image_bits[client]
+    order = order[start_step:]
+    if snapshot is not None:
+        set_rng_state(snapshot['rng'])
     # set background color
     bg_color = torch.Tensor([1., 1., 1.]).cuda() if args.white_bg else torch.Tensor([0., 0., 0.]).cuda()
-    n_added_client = 1
-    for client_idx, client_cam_list in zip(index_files, image_lists):
-        intersection = np.intersect1d(global_model_cam_list, client_cam_list)
-        # client selection
-        if len(intersection) < args.overlap_img_threshold:
-            client_buffer.append([client_idx, client_cam_list])
-            continue
+    # read client models ahead in the scheduled order while the current one is distilled
+    prefetcher = None
+    if args.prefetch_depth > 0:
+        prefetcher = Prefetcher(lambda path: read_client_model(path, args.sh_degree),
+                                [client_model_path(args, index_files[client].split('.')[0], load_iter) for client in order],
+                                depth=args.prefetch_depth,
+                                max_bytes=int(args.prefetch_max_gb * (1 << 30)),
+                                size_fn=params_nbytes)
+    n_added_client = 1 + start_step
+    for step, client in enumerate(order, start_step):
+        torch.cuda.empty_cache()
         logger.info('---')
         # load a local model
-        client_model_index = client_idx.split('.')[0]
-        client_metadatas = [metadatas[fname.split('.')[0]] for fname in client_cam_list]
-        global_params = _update_model(global_params, client_model_index, metadatas, client_metadatas,
-                                      global_model_cam_list, intersection, bg_color, load_iter, args)
-        # update global model's camera list
-        global_model_cam_list = np.union1d(global_model_cam_list, client_cam_list)
+        client_model_index = index_files[client].split('.')[0]
+        client_cameras = camera_table.gather(registry.lookup(image_lists[client]))
+        global_cameras = camera_table.gather(registry.decode_ids(global_model_cams & ~image_bits[client]))
+        global_store = _update_model(global_store, client_model_index, client_cameras,
+                                     global_cameras, bg_color, load_iter, args, prefetcher)
+        # update global model's camera set
+        global_model_cams |= image_bits[client]
         n_added_client += 1
+        rng_state = get_rng_state()
+        journal.write(dict(type='merge', step=step, client=index_files[client], n_points=len(global_store), rng=rng_state))
         # save model
-        if (n_added_client % args.save_freq) == 0:
-            torch.save(global_params, os.path.join(args.output_dir, f'global_model_{n_added_client}clients.pth'))
-        # aggregate buffered models
-        while True:
-            global_params, client_buffer, global_model_cam_list, updated, n_added_client = check_buffer(global_params, client_buffer, metadatas,
-                                                                                                        load_iter, bg_color, global_model_cam_list,
-                                                                                                        n_added_client, args)
-            if not updated:
-                break
+        fname = None
+        retained = (n_added_client % args.save_freq) == 0
+        if retained:
+            fname = f'global_model_{n_added_client}clients.pth'
+        elif args.resume_freq > 0 and ((step + 1) % args.resume_freq) == 0:
+            fname = f'resume_{n_added_client}clients.pth'
+        if fname is not None:
+            # retained snapshots are saved in full, so that removing resume snapshots never breaks them
+            is_base = snapshot_writer.save(global_store, os.path.join(args.output_dir, fname), base=retained)
+            journal.write(dict(type='snapshot', step=step + 1, path=fname, depth=snapshot_writer.depth, rng=rng_state))
+            if is_base:
+                remove_stale_resume_snapshots(args.output_dir, n_added_client)
 
-    torch.save(global_params, os.path.join(args.output_dir, f'global_model.pth'))
+    if prefetcher is not None:
+        prefetcher.close()
+    # the final model is always a full base loadable by torch.load (pth) or memory-mapped (pack)
+    fname = f'global_model.{args.save_format}'
+    snapshot_writer.save(global_store, os.path.join(args.output_dir, fname), base=True)
+    journal.write(dict(type='done', step=start_step + len(order), path=fname, rng=get_rng_state()))
+    journal.close()
+    remove_stale_resume_snapshots(args.output_dir)
 
 
 if __name__=='__main__':
@@ -361,10 +444,18 @@ if __name__=='__main__':
     parser.add_argument('--lr', default=1e-3, type=float,
                         help='learning rate for alignment')
     parser.add_argument('--overlap-img-threshold', '-oth', default=20, type=int)
+    parser.add_argument('--schedule', default='sequential', choices=['sequential', 'greedy'],
+                        help='aggregation order (sequential: file order with buffering, greedy: largest overlap first)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='if True, only print the planned aggregation order and its estimated cost')
     ### aggregation args
     parser.add_argument('--min-opacity', '-min-o', default=0.005, type=float)
     parser.add_argument('--n-clients', default=-1, type=int)
     parser.add_argument('--n-kd-epoch', default=5, type=int)
+    parser.add_argument('--compact-ratio', default=0.5, type=float,
+                        help='compact the global model when the ratio of removed points exceeds this value')
+    parser.add_argument('--voxel-size', default=0.0, type=float,
+                        help="voxel size of the spatial index over the global model's points (0: automatic, <0: disabled)")
     ### optimizer args
     parser.add_argument('--lr-opacity', '-lro', default=0.05, type=float)
     parser.add_argument('--lr-mlp', '-lrm', default=1e-4, type=float)
@@ -373,9 +464,27 @@ if __name__=='__main__':
     parser.add_argument('--lr-avec', default=1e-3, type=float)
     ### misc
     parser.add_argument('--seed', default=1, type=int, help='random seed')
-    parser.add_argument('--save-freq', default=100, type=int)
+    parser.add_argument('--save-freq', default=100, type=int,
+                        help='a full snapshot global_model_{n}clients.pth is saved and retained every n aggregated models')
+    parser.add_argument('--resume-freq', default=1, type=int,
+                        help='a snapshot resume_{n}clients.pth for --resume is saved every n merged clients and removed '
+                             'once a later full snapshot is saved (0: resume only from the --save-freq snapshots)')
+    parser.add_argument('--base-freq', default=20, type=int,
+                        help='every n-th snapshot is saved in full and the others only store changes from the previous one (1: always full). '
+                             'with a resume snapshot per client, a run of 200 clients saves about 10 full snapshots '
+                             'and --resume loads a full one and at most 19 deltas')
+    parser.add_argument('--save-format', default='pth', choices=['pth', 'pack'],
+                        help='file format of the final global model. pack is memory-mapped by eval.py without copies')
+    parser.add_argument('--resume', action='store_true',
+                        help='if True, resume aggregation from the latest snapshot recorded in journal.jsonl of the output dir. '
+                             'an interruption loses the work of at most --resume-freq clients including the one being merged '
+                             '(default 1: only the client being merged; 0: up to --save-freq clients)')
     parser.add_argument('--resolution', '-r', default=4, type=int)
     parser.add_argument('--far', default=100, type=int)
+    parser.add_argument('--prefetch-depth', default=2, type=int,
+                        help='number of client models read ahead in a background thread (0: disabled)')
+    parser.add_argument('--prefetch-max-gb', default=8.0, type=float,
+                        help='memory budget of client models read ahead')
     args = parser.parse_args()
 
     os.makedirs(args.output_dir, exist_ok=True)
@@ -24,6 +24,9 @@ from lpipsPyTorch import lpips
 from utils.model_update_utils import (meganerf2colmap,
                                       rendering,
                                       get_model_params)
+from utils.metadata_utils import load_metadatas
+from utils.snapshot_utils import load_snapshot
+from utils.general_utils import draft_image
 
 
 def visualize_scalars(scalar_tensor: torch.Tensor) -> np.ndarray:
@@ -49,7 +52,8 @@ def evaluation(global_params,
                sh_degree,
                n_iter,
                lr,
-               resolution_scale=1):
+               resolution_scale=1,
+               draft=True):
     rendered_images = []
     rendered_depths = []
     psnrs = []
@@ -72,6 +76,9 @@ def evaluation(global_params,
         image_height //= resolution_scale
         global_model.set_params(global_params)
         image_PIL = Image.open(os.path.join(dataset_dir, 'val/rgbs', img_fname))
+        if draft:
+            # decode JPEG images at the smallest DCT scale that is not smaller than the target
+            draft_image(image_PIL, (image_width, image_height))
         image_PIL = image_PIL.resize((image_width, image_height))
         image = torch.from_numpy(np.array(image_PIL)) / 255.0
         image = image.permute(2, 0, 1)[:3].cuda()
@@ -130,7 +137,7 @@ if __name__=='__main__':
     parser.add_argument('--output-dir', '-o', default='./', type=str,
                         help='/path/to/output-dir')
     parser.add_argument('--global-params', '-g', required=True, type=str,
-                        help='/path/to/global-parameters')
+                        help='/path/to/global-parameters (.pth, .pack or .ply)')
     parser.add_argument('--dataset-dir', '-data', required=True, type=str,
                         help='/path/to/dataset-dir')
     ### appearance args
@@ -142,6 +149,8 @@ if __name__=='__main__':
     parser.add_argument('--white-bg', '-w', action='store_true')
     ### misc
     parser.add_argument('--resolution', '-r', default=4, type=int)
+    parser.add_argument('--full-decode', action='store_true',
+                        help='decode JPEG images at full resolution before resizing')
     args = parser.parse_args()
     os.makedirs(args.output_dir, exist_ok=True)
     # setup logger
@@ -170,14 +179,15 @@ if __name__=='__main__':
                          'app_pos_emb': tmp_model.pos_emb.state_dict()}
         del tmp_model
     else:
-        global_params = torch.load(args.global_params)
+        global_params = load_snapshot(args.global_params)
     logger.info(f'#Gaussians {len(global_params["xyz"])}')
     logger.info('load metadata')
     # set background color
     bg_color = torch.Tensor([1., 1., 1.]).cuda() if args.white_bg else torch.Tensor([0., 0.,0.]).cuda()
     # evaluation
     val_image_lists = sorted(os.listdir(os.path.join(args.dataset_dir, 'val/rgbs')))
-    val_metadatas = [torch.load(os.path.join(args.dataset_dir, 'val/metadata', f.split('.')[0]+'.pt')) for f in val_image_lists]
+    val_metadatas = load_metadatas(os.path.join(args.dataset_dir, 'val'), [f.split('.')[0] for f in val_image_lists])
+    val_metadatas = list(val_metadatas.values())
     images, depths, psnr, ssim, lpips = evaluation(global_params,
                                                    args.dataset_dir,
                                                    val_image_lists,
@@ -186,7 +196,8 @@ if __name__=='__main__':
                                                    args.sh_degree,
                                                    args.n_iter,
                                                    args.lr,
-                                                   args.resolution)
+                                                   args.resolution,
+                                                   not args.full_decode)
 
     with open(os.path.join(args.output_dir, 'metrics.json'), 'w') as f:
         json.dump(dict(psnr=psnr, ssim=ssim, lpips=lpips), f)
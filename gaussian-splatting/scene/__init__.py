@@ -17,6 +17,7 @@ from scene.dataset_readers import sceneLoadTypeCallbacks
 from scene.gaussian_model import GaussianModel
 from arguments import ModelParams
 from utils.camera_utils import cameraList_from_camInfos, camera_to_JSON
+from utils.image_cache_utils import get_image_cache, DiskImageCache
 
 class Scene:
 
@@ -39,6 +40,10 @@ class Scene:
 
         self.train_cameras = {}
         self.test_cameras = {}
+        get_image_cache().resize(int(args.image_cache_gb * (1 << 30)))
+        get_image_cache().draft = not args.full_decode
+        if args.image_cache_dir:
+            get_image_cache().disk = DiskImageCache(args.image_cache_dir, int(args.image_cache_disk_gb * (1 << 30)))
 
         if os.path.exists(os.path.join(args.source_path, "sparse")):
             scene_info = sceneLoadTypeCallbacks["Colmap"](args.source_path, args.images, args.eval)
@@ -28,7 +28,9 @@ class Camera(nn.Module):
                  trans=np.array([0.0, 0.0, 0.0]),
                  scale=1.0,
                  data_device = "cuda",
-                 is_val=None):
+                 is_val=None,
+                 image_path=None,
+                 resolution=None):
         super(Camera, self).__init__()
 
         self.uid = uid
@@ -46,14 +48,20 @@ class Camera(nn.Module):
             print(f"[Warning] Custom device {data_device} failed, fallback to default cuda device" )
             self.data_device = torch.device("cuda")
 
-        self.original_image = image.clamp(0.0, 1.0).to(self.data_device)
-        self.image_width = self.original_image.shape[2]
-        self.image_height = self.original_image.shape[1]
-
-        if gt_alpha_mask is not None:
-            self.original_image *= gt_alpha_mask.to(self.data_device)
+        self.image_path = image_path
+        if image is None:
+            # lazy camera: the image is decoded on use by `utils.image_cache_utils.get_image`
+            self.original_image = image_path
+            self.image_width, self.image_height = resolution
         else:
-            self.original_image *= torch.ones((1, self.image_height, self.image_width), device=self.data_device)
+            self.original_image = image.clamp(0.0, 1.0).to(self.data_device)
+            self.image_width = self.original_image.shape[2]
+            self.image_height = self.original_image.shape[1]
+
+            if gt_alpha_mask is not None:
+                self.original_image *= gt_alpha_mask.to(self.data_device)
+            else:
+                self.original_image *= torch.ones((1, self.image_height, self.image_width), device=self.data_device)
 
         self.zfar = 100.0
         self.znear = 0.01
@@ -38,6 +38,11 @@ CAMERA_MODEL_IDS = dict([(camera_model.model_id, camera_model)
                          for camera_model in CAMERA_MODELS])
 CAMERA_MODEL_NAMES = dict([(camera_model.model_name, camera_model)
                            for camera_model in CAMERA_MODELS])
+# record layouts of the binary files, which are packed without padding
+POINT3D_DTYPE = np.dtype([("id", "<u8"), ("xyz", "<f8", 3), ("rgb", "u1", 3), ("error", "<f8")])
+TRACK_ELEM_DTYPE = np.dtype([("image_id", "<i4"), ("point2D_idx", "<i4")])
+IMAGE_DTYPE = np.dtype([("id", "<i4"), ("qvec", "<f8", 4), ("tvec", "<f8", 3), ("camera_id", "<i4")])
+POINT2D_DTYPE = np.dtype([("xy", "<f8", 2), ("point3D_id", "<i8")])
 
 
 def qvec2rotmat(qvec):
@@ -80,6 +85,60 @@ def read_next_bytes(fid, num_bytes, format_char_sequence, endian_character="<"):
     data = fid.read(num_bytes)
     return struct.unpack(endian_character + format_char_sequence, data)
 
+def scan_points3D_binary(data):
+    """Finds the offsets of the variable-length records of points3D.bin.
+    Only the track length of every record is read, so this is the only per-point loop.
+    :param data: memoryview of the file
+    :return: offsets of the records and their track lengths as int64 arrays
+    """
+    num_points = struct.unpack_from("<Q", data, 0)[0]
+    unpack_track_length = struct.Struct("<Q").unpack_from
+    track_length_offset = POINT3D_DTYPE.itemsize
+    offsets = [0] * num_points
+    offset = 8
+    for p_id in range(num_points):
+        offsets[p_id] = offset
+        offset += track_length_offset + 8 + TRACK_ELEM_DTYPE.itemsize * unpack_track_length(data, offset + track_length_offset)[0]
+    offsets = np.array(offsets, dtype=np.int64)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    track_lengths = gather_records(raw, offsets + track_length_offset, np.dtype("<u8")).astype(np.int64)
+    return offsets, track_lengths
+
+def gather_records(raw, offsets, dtype, chunk_size=1 << 16):
+    """Copies fixed-size records at arbitrary byte offsets into an array of `dtype`.
+    Records are gathered in chunks to bound the size of the byte index.
+    """
+    records = np.empty(len(offsets), dtype=dtype)
+    out = records.view(np.uint8).reshape(len(offsets), dtype.itemsize)
+    columns = np.arange(dtype.itemsize)
+    for start in range(0, len(offsets), chunk_size):
+        out[start:start + chunk_size] = raw[offsets[start:start + chunk_size, None] + columns]
+    return records
+
+def read_points3D_binary_arrays(path_to_model_file, with_tracks=False):
+    """Reads points3D.bin into arrays without unpacking every point.
+    :param with_tracks: if False, track payloads are skipped
+    :return: dict of "ids", "xyz", "rgb" and "error". with tracks, "track_offsets" (N+1,),
+             "image_ids" and "point2D_idxs", where the track of the i-th point is
+             [track_offsets[i], track_offsets[i+1]) of the latter two
+    """
+    raw = np.memmap(path_to_model_file, dtype=np.uint8, mode="r")
+    offsets, track_lengths = scan_points3D_binary(memoryview(raw))
+    records = gather_records(raw, offsets, POINT3D_DTYPE)
+    points = dict(ids=records["id"].astype(np.int64), xyz=records["xyz"],
+                  rgb=records["rgb"], error=records["error"])
+    if with_tracks:
+        track_offsets = np.zeros(len(offsets) + 1, dtype=np.int64)
+        np.cumsum(track_lengths, out=track_offsets[1:])
+        # byte offset of every track element
+        elem_index = np.arange(track_offsets[-1], dtype=np.int64) - np.repeat(track_offsets[:-1], track_lengths)
+        elem_offsets = np.repeat(offsets + POINT3D_DTYPE.itemsize + 8, track_lengths) + TRACK_ELEM_DTYPE.itemsize * elem_index
+        track_elems = gather_records(raw, elem_offsets, TRACK_ELEM_DTYPE)
+        points.update(track_offsets=track_offsets,
+                      image_ids=track_elems["image_id"].astype(np.int64),
+                      point2D_idxs=track_elems["point2D_idx"].astype(np.int64))
+    return points
+
 def read_points3D_text(path):
     """
     see: src/base/reconstruction.cc
@@ -129,27 +188,11 @@ def read_points3D_binary(path_to_model_file):
     """
 
 
-    with open(path_to_model_file, "rb") as fid:
-        num_points = read_next_bytes(fid, 8, "Q")[0]
-
-        xyzs = np.empty((num_points, 3))
-        rgbs = np.empty((num_points, 3))
-        errors = np.empty((num_points, 1))
-
-        for p_id in range(num_points):
-            binary_point_line_properties = read_next_bytes(
-                fid, num_bytes=43, format_char_sequence="QdddBBBd")
-            xyz = np.array(binary_point_line_properties[1:4])
-            rgb = np.array(binary_point_line_properties[4:7])
-            error = np.array(binary_point_line_properties[7])
-            track_length = read_next_bytes(
-                fid, num_bytes=8, format_char_sequence="Q")[0]
-            track_elems = read_next_bytes(
-                fid, num_bytes=8*track_length,
-                format_char_sequence="ii"*track_length)
-            xyzs[p_id] = xyz
-            rgbs[p_id] = rgb
-            errors[p_id] = error
+    # tracks are not used, so they are skipped without being decoded
+    points = read_points3D_binary_arrays(path_to_model_file, with_tracks=False)
+    xyzs = points["xyz"].astype(np.float64)
+    rgbs = points["rgb"].astype(np.float64)
+    errors = points["error"].astype(np.float64).reshape(-1, 1)
     return xyzs, rgbs, errors
 
 def read_intrinsics_text(path):
@@ -184,30 +227,24 @@ def read_extrinsics_binary(path_to_model_file):
     """
     images = {}
     with open(path_to_model_file, "rb") as fid:
-        num_reg_images = read_next_bytes(fid, 8, "Q")[0]
-        for _ in range(num_reg_images):
-            binary_image_properties = read_next_bytes(
-                fid, num_bytes=64, format_char_sequence="idddddddi")
-            image_id = binary_image_properties[0]
-            qvec = np.array(binary_image_properties[1:5])
-            tvec = np.array(binary_image_properties[5:8])
-            camera_id = binary_image_properties[8]
-            image_name = ""
-            current_char = read_next_bytes(fid, 1, "c")[0]
-            while current_char != b"\x00":   # look for the ASCII 0 entry
-                image_name += current_char.decode("utf-8")
-                current_char = read_next_bytes(fid, 1, "c")[0]
-            num_points2D = read_next_bytes(fid, num_bytes=8,
-                                           format_char_sequence="Q")[0]
-            x_y_id_s = read_next_bytes(fid, num_bytes=24*num_points2D,
-                                       format_char_sequence="ddq"*num_points2D)
-            xys = np.column_stack([tuple(map(float, x_y_id_s[0::3])),
-                                   tuple(map(float, x_y_id_s[1::3]))])
-            point3D_ids = np.array(tuple(map(int, x_y_id_s[2::3])))
-            images[image_id] = Image(
-                id=image_id, qvec=qvec, tvec=tvec,
-                camera_id=camera_id, name=image_name,
-                xys=xys, point3D_ids=point3D_ids)
+        data = fid.read()
+    num_reg_images = struct.unpack_from("<Q", data, 0)[0]
+    offset = 8
+    for _ in range(num_reg_images):
+        properties = np.frombuffer(data, dtype=IMAGE_DTYPE, count=1, offset=offset)[0]
+        offset += IMAGE_DTYPE.itemsize
+        name_end = data.index(b"\x00", offset)   # look for the ASCII 0 entry
+        image_name = data[offset:name_end].decode("utf-8")
+        offset = name_end + 1
+        num_points2D = struct.unpack_from("<Q", data, offset)[0]
+        offset += 8
+        points2D = np.frombuffer(data, dtype=POINT2D_DTYPE, count=num_points2D, offset=offset)
+        offset += POINT2D_DTYPE.itemsize * num_points2D
+        image_id = int(properties["id"])
+        images[image_id] = Image(
+            id=image_id, qvec=properties["qvec"].astype(np.float64), tvec=properties["tvec"].astype(np.float64),
+            camera_id=int(properties["camera_id"]), name=image_name,
+            xys=points2D["xy"].astype(np.float64), point3D_ids=points2D["point3D_id"].astype(np.int64))
     return images
 
 
@@ -16,12 +16,12 @@ import torch.nn as nn
 import numpy as np
 import tinycudann as tcnn
 
-from plyfile import PlyData, PlyElement
-
 from utils.system_utils import mkdir_p
 from utils.sh_utils import RGB2SH
 from simple_knn._C import distCUDA2
 from utils.graphics_utils import BasicPointCloud
+from utils.ply_utils import write_gaussian_ply
+from utils.model_io_utils import read_client_model, save_client_pack
 from utils.general_utils import (strip_symmetric,
                                  build_scaling_rotation,
                                  inverse_sigmoid,
@@ -326,26 +326,28 @@ class GaussianModel:
         mkdir_p(os.path.dirname(path))
         print("Number of points at current iterations : ", self._xyz.shape[0])
 
-        xyz = self._xyz.detach().cpu().numpy()
-        normals = np.zeros_like(xyz)
-        f_dc = self._features_dc.detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
-        f_rest = self._features_rest.detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
-        opacities = self._opacity.detach().cpu().numpy()
-        scale = self._scaling.detach().cpu().numpy()
-        rotation = self._rotation.detach().cpu().numpy()
-
-        dtype_full = [(attribute, 'f4') for attribute in self.construct_list_of_attributes()]
-
-        elements = np.empty(xyz.shape[0], dtype=dtype_full)
-        attributes = np.concatenate((xyz, normals, f_dc, f_rest, opacities, scale, rotation), axis=1)
-        elements[:] = list(map(tuple, attributes))
-        el = PlyElement.describe(elements, 'vertex')
-        PlyData([el]).write(path)
+        write_gaussian_ply(path, self.get_ply_params())
 
+    def save_pack(self, path):
+        """Saves parameters as a pack, which is memory-mapped by `load_pack` without parsing"""
+        mkdir_p(os.path.dirname(path))
+        params = {k: v.cpu() if isinstance(v, torch.Tensor) else {sub_k: p.cpu() for sub_k, p in v.items()}
+                  for k, v in self.get_ply_params().items()}
+        save_client_pack(path, params)
+
+    def get_ply_params(self):
+        """Returns parameters in the format returned by `utils.ply_utils.read_gaussian_ply`"""
+        params = dict(xyz=self._xyz.detach(),
+                      features_dc=self._features_dc.detach(),
+                      features_rest=self._features_rest.detach(),
+                      opacity=self._opacity.detach(),
+                      scaling=self._scaling.detach(),
+                      rotation=self._rotation.detach())
         if self.use_img_feats:
-            torch.save(self.appearance_vec.data.detach().cpu(), os.path.join(os.path.dirname(path), 'appearance_vec.pt'))
-            torch.save(self.mlp.state_dict(), os.path.join(os.path.dirname(path), 'mlp.pt'))
-            torch.save(self.pos_emb.state_dict(), os.path.join(os.path.dirname(path), 'hash.pt'))
+            params['appearance_vec'] = self.appearance_vec.data.detach().cpu()
+            params['mlp'] = self.mlp.state_dict()
+            params['hash'] = self.pos_emb.state_dict()
+        return params
 
     def reset_opacity(self):
         opacities_new = inverse_sigmoid(torch.min(self.get_opacity, torch.ones_like(self.get_opacity)*0.01))
@@ -353,51 +355,23 @@ class GaussianModel:
         self._opacity = optimizable_tensors["opacity"]
 
     def load_ply(self, path):
-        plydata = PlyData.read(path)
-
-        xyz = np.stack((np.asarray(plydata.elements[0]["x"]),
-                        np.asarray(plydata.elements[0]["y"]),
-                        np.asarray(plydata.elements[0]["z"])),  axis=1)
-        opacities = np.asarray(plydata.elements[0]["opacity"])[..., np.newaxis]
-
-        features_dc = np.zeros((xyz.shape[0], 3, 1))
-        features_dc[:, 0, 0] = np.asarray(plydata.elements[0]["f_dc_0"])
-        features_dc[:, 1, 0] = np.asarray(plydata.elements[0]["f_dc_1"])
-        features_dc[:, 2, 0] = np.asarray(plydata.elements[0]["f_dc_2"])
-
-        extra_f_names = [p.name for p in plydata.elements[0].properties if p.name.startswith("f_rest_")]
-        extra_f_names = sorted(extra_f_names, key = lambda x: int(x.split('_')[-1]))
-        assert len(extra_f_names)==3*(self.max_sh_degree + 1) ** 2 - 3
-        features_extra = np.zeros((xyz.shape[0], len(extra_f_names)))
-        for idx, attr_name in enumerate(extra_f_names):
-            features_extra[:, idx] = np.asarray(plydata.elements[0][attr_name])
-        # Reshape (P,F*SH_coeffs) to (P, F, SH_coeffs except DC)
-        features_extra = features_extra.reshape((features_extra.shape[0], 3, (self.max_sh_degree + 1) ** 2 - 1))
-
-        if self.use_img_feats and os.path.exists(os.path.join(os.path.dirname(path), 'appearance_vec.pt')):
-            appearance_vec = torch.load(os.path.join(os.path.dirname(path), 'appearance_vec.pt'))
-            self.appearance_vec = nn.Parameter(appearance_vec.cuda())
-            self.mlp.load_state_dict(torch.load(os.path.join(os.path.dirname(path), 'mlp.pt')))
-            self.pos_emb.load_state_dict(torch.load(os.path.join(os.path.dirname(path), 'hash.pt')))
-
-        scale_names = [p.name for p in plydata.elements[0].properties if p.name.startswith("scale_")]
-        scale_names = sorted(scale_names, key = lambda x: int(x.split('_')[-1]))
-        scales = np.zeros((xyz.shape[0], len(scale_names)))
-        for idx, attr_name in enumerate(scale_names):
-            scales[:, idx] = np.asarray(plydata.elements[0][attr_name])
-
-        rot_names = [p.name for p in plydata.elements[0].properties if p.name.startswith("rot")]
-        rot_names = sorted(rot_names, key = lambda x: int(x.split('_')[-1]))
-        rots = np.zeros((xyz.shape[0], len(rot_names)))
-        for idx, attr_name in enumerate(rot_names):
-            rots[:, idx] = np.asarray(plydata.elements[0][attr_name])
-
-        self._xyz = nn.Parameter(torch.tensor(xyz, dtype=torch.float, device="cuda").requires_grad_(True))
-        self._features_dc = nn.Parameter(torch.tensor(features_dc, dtype=torch.float, device="cuda").transpose(1, 2).contiguous().requires_grad_(True))
-        self._features_rest = nn.Parameter(torch.tensor(features_extra, dtype=torch.float, device="cuda").transpose(1, 2).contiguous().requires_grad_(True))
-        self._opacity = nn.Parameter(torch.tensor(opacities, dtype=torch.float, device="cuda").requires_grad_(True))
-        self._scaling = nn.Parameter(torch.tensor(scales, dtype=torch.float, device="cuda").requires_grad_(True))
-        self._rotation = nn.Parameter(torch.tensor(rots, dtype=torch.float, device="cuda").requires_grad_(True))
+        # `path` may be a pack saved by `save_pack`. an up-to-date point_cloud.pack next to
+        # point_cloud.ply is read instead of parsing the ply file
+        self.load_ply_params(read_client_model(path, self.max_sh_degree, self.use_img_feats))
+
+    def load_ply_params(self, params):
+        """Sets parameters read by `utils.ply_utils.read_gaussian_ply`"""
+        if self.use_img_feats and 'appearance_vec' in params:
+            self.appearance_vec = nn.Parameter(params['appearance_vec'].cuda())
+            self.mlp.load_state_dict(params['mlp'])
+            self.pos_emb.load_state_dict(params['hash'])
+
+        self._xyz = nn.Parameter(params['xyz'].to(device="cuda").requires_grad_(True))
+        self._features_dc = nn.Parameter(params['features_dc'].to(device="cuda").requires_grad_(True))
+        self._features_rest = nn.Parameter(params['features_rest'].to(device="cuda").requires_grad_(True))
+        self._opacity = nn.Parameter(params['opacity'].to(device="cuda").requires_grad_(True))
+        self._scaling = nn.Parameter(params['scaling'].to(device="cuda").requires_grad_(True))
+        self._rotation = nn.Parameter(params['rotation'].to(device="cuda").requires_grad_(True))
 
         self.active_sh_degree = self.max_sh_degree
 
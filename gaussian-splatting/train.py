@@ -13,7 +13,6 @@ import os
 import sys
 import uuid
 from random import randint
-from PIL import Image
 
 import torch
 
@@ -25,7 +24,8 @@ from arguments import ModelParams, PipelineParams, OptimizationParams
 from utils.loss_utils import l1_loss, ssim
 from gaussian_renderer import render, network_gui
 from scene import Scene, GaussianModel
-from utils.general_utils import safe_state, PILtoTorch
+from utils.general_utils import safe_state
+from utils.image_cache_utils import get_image
 try:
     from torch.utils.tensorboard import SummaryWriter
     TENSORBOARD_FOUND = True
@@ -99,7 +99,7 @@ def training(dataset, opt, pipe, testing_iterations, saving_iterations, checkpoi
         if isinstance(gt_image, torch.Tensor):
             gt_image = gt_image.cuda()
         else:
-            gt_image = PILtoTorch(Image.open(gt_image), (viewpoint_cam.image_width, viewpoint_cam.image_height)).cuda()[:3, ...]
+            gt_image = get_image(gt_image, (viewpoint_cam.image_width, viewpoint_cam.image_height))
         
         if viewpoint_cam.is_val: # remove right-side pixels
             gt_image = gt_image[..., :gt_image.shape[-1]//2]
@@ -197,7 +197,7 @@ def training_report(tb_writer, iteration, Ll1, loss, l1_loss, elapsed, testing_i
                     if isinstance(viewpoint.original_image, torch.Tensor):
                         gt_image = torch.clamp(viewpoint.original_image.to("cuda"), 0.0, 1.0)
                     else:
-                        gt_image = torch.clamp(PILtoTorch(Image.open(viewpoint.original_image), (viewpoint.image_width, viewpoint.image_height)).cuda()[:3, ...], 0.0, 1.0)
+                        gt_image = torch.clamp(get_image(viewpoint.original_image, (viewpoint.image_width, viewpoint.image_height)), 0.0, 1.0)
                     if tb_writer and (idx < 5):
                         tb_writer.add_images(config['name'] + "_view_{}/render".format(viewpoint.image_name), image[None], global_step=iteration)
                         if iteration == testing_iterations[0]:
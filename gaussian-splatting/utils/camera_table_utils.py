@@ -0,0 +1,86 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import torch
+
+from .pose_utils import (stack_cameras, intrinsics_to_fovs, meganerf_to_colmap,
+                         meganerf_to_viewmats, full_projections)
+
+
+class CameraTable:
+    """Cameras of all images converted once and stored as stacked tensors indexed by integer image IDs.
+
+    Rows are in the order of `names`, so that the IDs of a `CameraRegistry` built from the same names
+    index the table directly. `gather` returns the rows of a camera subset (e.g., a client's images)
+    as another table without recomputing FoVs, view and projection matrices.
+
+    Attributes:
+        height, width (torch.Tensor): image size of shape (N,) on CPU
+        fovx, fovy (torch.Tensor): FoVs of shape (N,) in double precision on CPU
+        viewmats (torch.Tensor): column-major world-to-camera matrices of shape (N, 4, 4) on `device`
+        projmats (torch.Tensor): column-major full projection matrices of shape (N, 4, 4) on `device`
+        centers (torch.Tensor): camera centers in world coordinates of shape (N, 3) on `device`
+    """
+    def __init__(self,
+                 height: torch.Tensor,
+                 width: torch.Tensor,
+                 fovx: torch.Tensor,
+                 fovy: torch.Tensor,
+                 viewmats: torch.Tensor,
+                 projmats: torch.Tensor,
+                 centers: torch.Tensor):
+        self.height = height
+        self.width = width
+        self.fovx = fovx
+        self.fovy = fovy
+        self.viewmats = viewmats
+        self.projmats = projmats
+        self.centers = centers
+
+    @classmethod
+    def from_metadatas(cls, names: List[str], metadatas: Dict[str, Dict[str, Any]], device='cuda') -> 'CameraTable':
+        """
+        Args:
+            names (List[str]): image filenames whose rows are stored in this order, e.g., `CameraRegistry.names`
+            metadatas (Dict[str, Dict[str, Any]]): metadata keyed by the file stem, see `load_metadatas`
+            device: device of the matrices
+        """
+        cameras = stack_cameras([metadatas[name.split('.')[0]] for name in names])
+        fovx, fovy = intrinsics_to_fovs(cameras['intrinsics'], cameras['H'], cameras['W'])
+        viewmats = meganerf_to_viewmats(cameras['c2w'])
+        return cls(cameras['H'],
+                   cameras['W'],
+                   fovx,
+                   fovy,
+                   viewmats.to(device),
+                   full_projections(viewmats, fovx, fovy).to(device),
+                   meganerf_to_colmap(cameras['c2w'])[:, :, 3].to(device))
+
+    def __len__(self):
+        return len(self.height)
+
+    def gather(self, ids: Union[List[int], np.ndarray, torch.Tensor]) -> 'CameraTable':
+        """Returns the rows of `ids` in the given order"""
+        ids = torch.as_tensor(ids, dtype=torch.long).cpu()
+        device_ids = ids.to(self.viewmats.device)
+        return CameraTable(self.height[ids],
+                           self.width[ids],
+                           self.fovx[ids],
+                           self.fovy[ids],
+                           self.viewmats[device_ids],
+                           self.projmats[device_ids],
+                           self.centers[device_ids])
+
+    def get_cameras(self, resolution_scale: int=1) -> Tuple[List[int], List[int], List[float], List[float], torch.Tensor]:
+        """Returns the cameras in the format of `get_cameras_from_metadata` with the image size divided by `resolution_scale`"""
+        return ((self.height // resolution_scale).tolist(),
+                (self.width // resolution_scale).tolist(),
+                self.fovx.tolist(),
+                self.fovy.tolist(),
+                self.viewmats)
+
+    def frustum_matrices(self, device='cpu') -> Tuple[torch.Tensor, torch.Tensor]:
+        """Returns `viewmats` and `projmats` on `device` in the format of `get_frustum_matrices`"""
+        return self.viewmats.to(device), self.projmats.to(device)
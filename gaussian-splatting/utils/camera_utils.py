@@ -15,12 +15,14 @@ import numpy as np
 from scene.cameras import Camera
 from utils.general_utils import PILtoTorch
 from utils.graphics_utils import fov2focal
+from utils.image_header_utils import read_image_size
 
 WARNED = False
 
 
 def loadCam(args, id, cam_info, resolution_scale):
-    orig_w, orig_h = cam_info.image.size
+    # lazy camera infos only have the path, whose size is read from the file header
+    orig_w, orig_h = cam_info.image.size if cam_info.image is not None else read_image_size(cam_info.image_path)
 
     if args.resolution in [1, 2, 4, 8]:
         resolution = round(orig_w/(resolution_scale * args.resolution)), round(orig_h/(resolution_scale * args.resolution))
@@ -41,12 +43,14 @@ def loadCam(args, id, cam_info, resolution_scale):
         scale = float(global_down) * float(resolution_scale)
         resolution = (int(orig_w / scale), int(orig_h / scale))
 
-    resized_image_rgb = PILtoTorch(cam_info.image, resolution)
-    gt_image = resized_image_rgb[:3, ...]
-
+    gt_image = None
     loaded_mask = None
-    if resized_image_rgb.shape[1] == 4:
-        loaded_mask = resized_image_rgb[3:4, ...]
+    if cam_info.image is not None:
+        resized_image_rgb = PILtoTorch(cam_info.image, resolution)
+        gt_image = resized_image_rgb[:3, ...]
+
+        if resized_image_rgb.shape[1] == 4:
+            loaded_mask = resized_image_rgb[3:4, ...]
     # if data is in a validation set, mask right-side pixels, as in Mega-NeRF
     # See https://github.com/cmusatyalab/mega-nerf/issues/18 for more details
     if os.path.exists(cam_info.image_path.replace('train/rgbs', 'val/rgbs')):
@@ -58,7 +62,8 @@ def loadCam(args, id, cam_info, resolution_scale):
                   FoVx=cam_info.FovX, FoVy=cam_info.FovY, 
                   image=gt_image, gt_alpha_mask=loaded_mask,
                   image_name=cam_info.image_name, uid=id,
-                  data_device=args.data_device, is_val=is_val)
+                  data_device=args.data_device, is_val=is_val,
+                  image_path=cam_info.image_path, resolution=resolution)
 
 
 def cameraList_from_camInfos(cam_infos, resolution_scale, args):
@@ -0,0 +1,83 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Tuple
+
+import torch
+
+from .graphics_utils import getProjectionMatrix
+
+
+# default number of (camera, point) pairs evaluated at once by `frustum_visibility`
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+def compute_projection(fovx, fovy, extrinsic):
+    projection_matrix = getProjectionMatrix(znear=0.01, zfar=100, fovX=fovx, fovY=fovy).transpose(0,1).to(extrinsic.device)
+    full_proj_transform = (extrinsic.unsqueeze(0).bmm(projection_matrix.unsqueeze(0))).squeeze(0)
+    return full_proj_transform
+
+
+@torch.no_grad()
+def in_frustum_mask(points, viewmatrix, projmatrix, far: float=100.0, bound: float=1.3):
+    """This function is based on `in_frustum` in auxiliary.h of diff-gaussian-rasterization
+
+    Args:
+        points (torch.Tensor): gaussian center that is a Tensor of shape (#points, 3)
+        viewmatrix (torch.Tensor): world-to-camera matrix that is a column-major (=transposed) Tensor of shape (4, 4)
+        projmatrix (torch.Tensor): projection matrix that is a column-major (=transposed) Tensor of shape (4, 4)
+
+    Returns:
+        masks (torch.Tensor): binary mask that is a Tensor of shape (#points,)
+    """
+    p_hom = projmatrix.T[None, :4, :3] @ points.reshape(-1, 3, 1) + projmatrix.T[None, :4, -1:]
+    p_w = 1 / (p_hom[:, -1] + 1e-7)
+    p_proj = p_hom[:, :3, 0] * p_w
+    p_view = viewmatrix.T[None, :3, :3] @ points.reshape(-1, 3, 1) + viewmatrix.T[None, :3, -1:]
+
+    return torch.logical_and(torch.logical_and(p_proj[:, 0].abs() <= bound, p_proj[:, 1].abs() <= bound),
+                             torch.logical_and(p_view[:, -1, 0] > 0., p_view[:, -1, 0] < far))
+
+
+@torch.no_grad()
+def frustum_visibility(points: torch.Tensor,
+                       viewmats: torch.Tensor,
+                       projmats: torch.Tensor,
+                       far: float=100.0,
+                       bound: float=1.3,
+                       chunk_size: int=DEFAULT_CHUNK_SIZE) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Batched version of `in_frustum_mask` over all cameras
+
+    Points are processed in chunks of `chunk_size // #cameras` so that
+    the intermediate buffers never exceed `chunk_size` (camera, point) pairs.
+
+    Args:
+        points (torch.Tensor): gaussian center that is a Tensor of shape (#points, 3)
+        viewmats (torch.Tensor): column-major world-to-camera matrices of shape (#cameras, 4, 4)
+        projmats (torch.Tensor): column-major full projection matrices of shape (#cameras, 4, 4)
+        chunk_size (int): maximum number of (camera, point) pairs evaluated at once
+
+    Returns:
+        counts (torch.Tensor): number of visible points per camera that is a Tensor of shape (#cameras,)
+        mask (torch.Tensor): bool Tensor of shape (#points,) that is True if a point is visible from any camera
+    """
+    n_cams = len(viewmats)
+    counts = torch.zeros(n_cams, dtype=torch.long, device=points.device)
+    mask = torch.zeros(len(points), dtype=torch.bool, device=points.device)
+    if n_cams == 0 or len(points) == 0:
+        return counts, mask
+    # coefficients of x, y, w of the projection and z of the view of shape (#cameras, 4, 4, 1)
+    rows = torch.stack([projmats[:, :, 0], projmats[:, :, 1], projmats[:, :, 3], viewmats[:, :, 2]], 1)
+    rows = rows.to(points)[..., None]
+    step = max(chunk_size // n_cams, 1)
+    for start in range(0, len(points), step):
+        x, y, z = points[start:start + step].T[:, None]
+        # same operation order as the matrix product in `in_frustum_mask` to get identical values
+        transform = lambda i: x * rows[:, i, 0] + y * rows[:, i, 1] + z * rows[:, i, 2] + rows[:, i, 3]
+        p_w = 1 / (transform(2) + 1e-7)
+        visible = (transform(0) * p_w).abs() <= bound
+        visible &= (transform(1) * p_w).abs() <= bound
+        depth = transform(3)
+        visible &= (depth > 0.) & (depth < far)
+        counts += visible.sum(1)
+        mask[start:start + step] = visible.any(0)
+    return counts, mask
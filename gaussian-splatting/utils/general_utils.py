@@ -21,7 +21,18 @@ def inverse_sigmoid(x):
     return torch.log(x/(1-x))
 
 
-def PILtoTorch(pil_image, resolution):
+def draft_image(pil_image, resolution):
+    """Lets the JPEG decoder downscale by 1/2, 1/4 or 1/8 in the DCT domain,
+    as far as the decoded image is not smaller than `resolution`.
+    `pil_image` is modified in place, i.e., its size becomes the decoded size.
+    No-op for other formats and images that are already loaded."""
+    pil_image.draft(None, tuple(resolution))
+    return pil_image
+
+
+def PILtoTorch(pil_image, resolution, draft=True):
+    if draft:
+        draft_image(pil_image, resolution)
     resized_image_PIL = pil_image.resize(resolution, resample=Image.BOX)
     resized_image = torch.from_numpy(np.array(resized_image_PIL)) / 255.0
     if len(resized_image.shape) == 3:
@@ -0,0 +1,209 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Callable, Hashable, Optional, Tuple
+from collections import OrderedDict
+import os
+import time
+import hashlib
+
+import numpy as np
+import torch
+
+from PIL import Image
+
+from .general_utils import draft_image
+from .pack_utils import read_pack, write_pack
+
+
+DEFAULT_CACHE_BYTES = 4 << 30
+DEFAULT_DISK_CACHE_BYTES = 64 << 30
+# temporary files of entries older than this (in seconds) are left by crashed processes
+TMP_GRACE_PERIOD = 3600
+
+
+def load_image(image_path: str, resolution: Tuple[int, int], draft: bool=True) -> torch.Tensor:
+    """Decodes an image and resizes it as `PILtoTorch` does
+
+    Args:
+        image_path (str): /path/to/image
+        resolution (Tuple[int, int]): (width, height) after resizing
+        draft (bool): if True, JPEG images are decoded at a reduced scale (see `draft_image`)
+
+    Returns:
+        image (torch.Tensor): RGB image of shape (3, height, width) and dtype uint8
+    """
+    with Image.open(image_path) as img:
+        if draft:
+            draft_image(img, resolution)
+        resized_image_PIL = img.convert('RGB').resize(resolution, resample=Image.BOX)
+    return torch.from_numpy(np.array(resized_image_PIL)).permute(2, 0, 1)
+
+
+class DiskImageCache:
+    """Content-addressed cache of resized images on disk shared by processes (e.g., clients trained one after another)
+
+    An entry is keyed by the absolute image path, its mtime and size, the target resolution and `draft`,
+    so a modified image is never served from a stale entry. Each entry is a pack file (see `pack_utils`)
+    holding the uint8 image, which is memory-mapped on read: processes reading the same entry share the
+    page cache and the cache is never written through the maps.
+    Entries are written atomically, read hits refresh the entry's mtime, and the least recently used entries
+    are removed when the total size exceeds `max_bytes`. Temporary files left by crashed processes count toward
+    `max_bytes` and are removed once they are older than `TMP_GRACE_PERIOD`.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int=DEFAULT_DISK_CACHE_BYTES, prune_interval: int=64):
+        """
+        Args:
+            cache_dir (str): /path/to/cache, created if it does not exist
+            max_bytes (int): size budget of the cache
+            prune_interval (int): the cache is pruned every `prune_interval` new entries
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._n_written = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.prune()
+
+    def entry_path(self, image_path: str, resolution: Tuple[int, int], draft: bool=True) -> str:
+        stat = os.stat(image_path)
+        key = '\0'.join([os.path.abspath(image_path), str(stat.st_mtime_ns), str(stat.st_size),
+                         f'{resolution[0]}x{resolution[1]}', str(int(draft))])
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.pack')
+
+    def get(self, image_path: str, resolution: Tuple[int, int], draft: bool=True) -> torch.Tensor:
+        """Same as `load_image`, but the image is read from the cache if it has been resized before"""
+        path = self.entry_path(image_path, resolution, draft)
+        try:
+            arrays, _ = read_pack(path)
+            image = arrays['image']
+            if image.shape == (3, resolution[1], resolution[0]):
+                # mark as recently used
+                os.utime(path)
+                return torch.from_numpy(image)
+        except (OSError, ValueError, KeyError):
+            # missing (or removed by another process while being read) entries are written again
+            pass
+        image = load_image(image_path, resolution, draft)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_pack(path, dict(image=image.contiguous().numpy()),
+                   dict(image_path=os.path.abspath(image_path), resolution=list(resolution), draft=draft))
+        self._n_written += 1
+        if self._n_written % self.prune_interval == 0:
+            self.prune()
+        return image
+
+    def prune(self) -> int:
+        """Removes stale temporary files and the least recently used entries until the cache fits in `max_bytes`
+
+        Returns:
+            nbytes (int): size of the removed files
+        """
+        entries = []
+        tmp_files = []
+        for sub_dir in os.scandir(self.cache_dir):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                # temporary files are `{digest}.pack.tmp{pid}` (`{digest}.pack.{pid}` in older caches)
+                is_tmp = '.pack.' in entry.name
+                if not (is_tmp or entry.name.endswith('.pack')):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                (tmp_files if is_tmp else entries).append((stat.st_mtime, stat.st_size, entry.path))
+        # temporary files being written by other processes count toward the budget but are kept
+        total = sum(size for _, size, _ in entries + tmp_files)
+        removed = 0
+        deadline = time.time() - TMP_GRACE_PERIOD
+        for mtime, size, path in tmp_files:
+            if mtime >= deadline:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += size
+        for _, size, path in sorted(entries):
+            if total - removed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # removed by another process, or in use on platforms that do not allow it
+                continue
+            removed += size
+        return removed
+
+
+class ImageCache:
+    """Least-recently-used cache of decoded images bounded by the total size in bytes
+
+    Images are kept in uint8 on CPU, i.e., a quarter of the size of the float images used for training.
+    An image larger than `max_bytes` is returned without being cached.
+    `draft` is passed to `load_image` by `get_image`, which reads images through `disk` if it is set.
+    """
+    def __init__(self, max_bytes: int=DEFAULT_CACHE_BYTES, draft: bool=True, disk: Optional[DiskImageCache]=None):
+        self.max_bytes = max_bytes
+        self.draft = draft
+        self.disk = disk
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images: 'OrderedDict[Hashable, torch.Tensor]' = OrderedDict()
+
+    def __len__(self):
+        return len(self._images)
+
+    def get(self, key: Hashable, load_fn: Callable[[], torch.Tensor]) -> torch.Tensor:
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = load_fn()
+        nbytes = image.numel() * image.element_size()
+        if nbytes <= self.max_bytes:
+            self._images[key] = image
+            self.nbytes += nbytes
+            self._evict()
+        return image
+
+    def resize(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        self._images.clear()
+        self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            _, image = self._images.popitem(last=False)
+            self.nbytes -= image.numel() * image.element_size()
+
+
+# shared by all cameras of a process
+_image_cache = ImageCache()
+
+
+def get_image_cache() -> ImageCache:
+    return _image_cache
+
+
+def get_image(image_path: str, resolution: Tuple[int, int], device='cuda') -> torch.Tensor:
+    """Returns an image resized to `resolution` through the LRU cache
+
+    Returns:
+        image (torch.Tensor): RGB image of shape (3, height, width) in [0, 1] on `device`
+    """
+    def load_fn():
+        if _image_cache.disk is not None:
+            return _image_cache.disk.get(image_path, resolution, _image_cache.draft)
+        return load_image(image_path, resolution, _image_cache.draft)
+    image = _image_cache.get((image_path, tuple(resolution)), load_fn)
+    # the same values as `PILtoTorch(...) / 255.0`, but transferred in uint8
+    return image.to(device) / 255.0
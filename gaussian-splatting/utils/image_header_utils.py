@@ -0,0 +1,74 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import BinaryIO, Optional, Tuple
+import struct
+
+from PIL import Image
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# start-of-frame markers of JPEG except DHT (0xC4), JPG (0xC8) and DAC (0xCC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# markers without a length field
+JPEG_STANDALONE_MARKERS = frozenset([0x01, 0xD8] + list(range(0xD0, 0xD8)))
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        # skip fill bytes
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        # start of scan without a frame header
+        if marker == 0xDA:
+            return None
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        length, = struct.unpack('>H', header)
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            _, height, width = struct.unpack('>BHH', frame)
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def _png_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def read_image_size(path: str) -> Tuple[int, int]:
+    """Reads the size of an image from its file header without decoding pixels
+
+    JPEG and PNG headers are parsed directly. The other formats (and headers that cannot be parsed)
+    fall back to `PIL.Image.open`, which also only reads the header.
+
+    Returns:
+        size (Tuple[int, int]): (width, height) as `PIL.Image.Image.size`
+    """
+    with open(path, 'rb') as f:
+        size = _jpeg_size(f)
+        if size is None:
+            f.seek(0)
+            size = _png_size(f)
+    if size is None:
+        with Image.open(path) as img:
+            size = img.size
+    return size
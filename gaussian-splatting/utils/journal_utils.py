@@ -0,0 +1,85 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict, List, Optional
+import os
+import json
+import base64
+import pickle
+import random
+
+import numpy as np
+import torch
+
+
+def get_rng_state() -> str:
+    """Returns the states of python, numpy and torch RNGs as a string"""
+    state = dict(random=random.getstate(),
+                 numpy=np.random.get_state(),
+                 torch=torch.get_rng_state())
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return base64.b64encode(pickle.dumps(state)).decode('ascii')
+
+
+def set_rng_state(encoded: str):
+    """Restores RNG states returned by `get_rng_state`"""
+    state = pickle.loads(base64.b64decode(encoded))
+    random.setstate(state['random'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+class Journal:
+    """Append-only log of JSON records, one per line.
+
+    Every record is flushed and fsynced before `write` returns, so records
+    written before a crash are never lost. A partially written last line is
+    ignored by `read`.
+
+    Args:
+        path (str): /path/to/journal.jsonl
+        records (List[Dict[str, Any]]): records written at the top of a new journal.
+                                        if None, records are appended to an existing journal
+    """
+    def __init__(self, path: str, records: Optional[List[Dict[str, Any]]]=None):
+        self.path = path
+        if records is not None:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        else:
+            self._truncate_partial_line()
+        self.file = open(path, 'a')
+
+    def _truncate_partial_line(self):
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+
+    @staticmethod
+    def read(path: str) -> List[Dict[str, Any]]:
+        records = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a record interrupted by a crash is always the last one
+                    break
+        return records
+
+    def write(self, record: Dict[str, Any]):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
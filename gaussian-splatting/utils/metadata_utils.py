@@ -0,0 +1,75 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict, List, Optional
+import os
+
+import numpy as np
+import torch
+
+from .pack_utils import read_pack, write_pack
+
+
+METADATA_PACK = 'metadata.pack'
+
+
+def metadata_pack_path(split_dir: str) -> str:
+    return os.path.join(split_dir, METADATA_PACK)
+
+
+def pack_metadatas(metadatas: Dict[str, Dict[str, Any]], path: str):
+    """Stores metadata (e.g., `c2w`, `intrinsics`, `H` and `W`) of all images as columnar arrays
+
+    Args:
+        metadatas (Dict[str, Dict[str, Any]]): metadata of each image keyed by the file stem
+        path (str): /path/to/metadata.pack
+    """
+    names = sorted(metadatas)
+    keys = sorted(metadatas[names[0]]) if len(names) > 0 else []
+    arrays = {}
+    scalar_keys = []
+    for k in keys:
+        values = []
+        for name in names:
+            if k not in metadatas[name]:
+                raise ValueError(f'metadata of {name} does not have "{k}"')
+            values.append(metadatas[name][k])
+        if isinstance(values[0], torch.Tensor):
+            arrays[k] = torch.stack(values).numpy()
+        else:
+            arrays[k] = np.asarray(values)
+            scalar_keys.append(k)
+    write_pack(path, arrays, dict(names=names, scalar_keys=scalar_keys))
+
+
+def load_metadatas(split_dir: str, names: Optional[List[str]]=None) -> Dict[str, Dict[str, Any]]:
+    """Loads metadata of a split (e.g., `<dataset-dir>/train`)
+
+    `<split_dir>/metadata.pack` is used if it exists (see `tools/pack_metadata.py`),
+    otherwise each file in `<split_dir>/metadata` is loaded by `torch.load`.
+    Both return the same values: tensor entries are tensors and the others are Python scalars.
+
+    Args:
+        split_dir (str): /path/to/dataset/split
+        names (List[str]): file stems to be loaded. all images are loaded if None
+
+    Returns:
+        metadatas (Dict[str, Dict[str, Any]]): metadata of each image keyed by the file stem
+    """
+    pack_path = metadata_pack_path(split_dir)
+    if not os.path.exists(pack_path):
+        metadata_dir = os.path.join(split_dir, 'metadata')
+        if names is None:
+            fnames = sorted(os.listdir(metadata_dir))
+        else:
+            fnames = [name + '.pt' for name in names]
+        return {fname.split('.')[0]: torch.load(os.path.join(metadata_dir, fname)) for fname in fnames}
+    arrays, attrs = read_pack(pack_path)
+    index = {name: i for i, name in enumerate(attrs['names'])}
+    if names is None:
+        names = attrs['names']
+    rows = [index[name] for name in names]
+    scalar_keys = set(attrs['scalar_keys'])
+    # one copy per column; per-image tensors are views of the columns
+    columns = {k: (v[rows].tolist() if k in scalar_keys else torch.from_numpy(np.array(v[rows])))
+               for k, v in arrays.items()}
+    return {name: {k: v[i] for k, v in columns.items()} for i, name in enumerate(names)}
@@ -0,0 +1,136 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict
+import os
+
+import torch
+import torch.nn.functional as F
+
+from .pack_utils import save_tensor_pack, load_tensor_pack
+from .ply_utils import read_ply_header, read_gaussian_ply, write_gaussian_ply
+
+
+# a pack stores every parameter as one contiguous little-endian array, which is memory-mapped
+# into CPU tensors without parsing or copies. `layout` tells client models saved by
+# `GaussianModel.save_ply` (CLIENT) from global models saved by `build_global_model.py` (GLOBAL).
+PACK_EXT = '.pack'
+CLIENT = 'client'
+GLOBAL = 'global'
+
+
+def is_pack(path: str) -> bool:
+    return os.path.splitext(path)[1] == PACK_EXT
+
+
+def pack_path(path: str) -> str:
+    """Returns /path/to/point_cloud.pack for /path/to/point_cloud.ply"""
+    return os.path.splitext(path)[0] + PACK_EXT
+
+
+def save_client_pack(path: str, params: Dict[str, Any]):
+    """Saves parameters in the format returned by `read_gaussian_ply` as a pack"""
+    save_tensor_pack(path, params, dict(layout=CLIENT))
+
+
+def save_global_pack(path: str, params: Dict[str, Any]):
+    """Saves global model's parameters (the format saved by `build_global_model.py`) as a pack"""
+    save_tensor_pack(path, params, dict(layout=GLOBAL))
+
+
+def read_client_model(path: str, max_sh_degree: int, load_appearance: bool=True, device: str='cpu') -> Dict[str, Any]:
+    """Reads a client model from a pack if it exists next to the ply file and is up to date, otherwise from the ply file
+
+    Args:
+        path (str): /path/to/point_cloud.ply or /path/to/point_cloud.pack
+        device (str): device of the returned tensors. tensors of a pack are memory-mapped only on CPU
+
+    Returns:
+        params (Dict[str, Any]): parameters in the format returned by `read_gaussian_ply`
+    """
+    packed = path if is_pack(path) else pack_path(path)
+    if os.path.exists(packed) and (not os.path.exists(path) or os.path.getmtime(packed) >= os.path.getmtime(path)):
+        params = load_tensor_pack(packed)
+        if not load_appearance:
+            params = {k: v for k, v in params.items() if k not in ('appearance_vec', 'mlp', 'hash')}
+        if device != 'cpu':
+            params = {k: v.to(device) if isinstance(v, torch.Tensor) else {sub_k: p.to(device) for sub_k, p in v.items()}
+                      for k, v in params.items()}
+        return params
+    return read_gaussian_ply(path, max_sh_degree, load_appearance, device)
+
+
+def to_global_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts parameters in the format returned by `read_gaussian_ply` into global model's parameters
+
+    Rotations are normalized as `get_model_params` does and per-image appearance vectors are dropped.
+    """
+    if 'mlp' not in params or 'hash' not in params:
+        raise ValueError('a global model needs the appearance networks, '
+                         'i.e., mlp.pt and hash.pt next to the ply file')
+    global_params = {k: params[k] for k in ('xyz', 'scaling', 'features_dc', 'features_rest', 'opacity')}
+    global_params['rotation'] = F.normalize(params['rotation'])
+    global_params['app_mlp'] = params['mlp']
+    global_params['app_pos_emb'] = params['hash']
+    return global_params
+
+
+def to_client_params(global_params: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts global model's parameters into the format returned by `read_gaussian_ply`"""
+    params = {k: global_params[k] for k in ('xyz', 'features_dc', 'features_rest', 'opacity', 'scaling', 'rotation')}
+    params['mlp'] = global_params['app_mlp']
+    params['hash'] = global_params['app_pos_emb']
+    return params
+
+
+def load_global_params(path: str) -> Dict[str, Any]:
+    """Loads global model's parameters from a `.pth` file or a pack of either layout"""
+    if not is_pack(path):
+        return torch.load(path, map_location='cpu')
+    params = load_tensor_pack(path)
+    if 'app_mlp' not in params:
+        params = to_global_params(params)
+    return params
+
+
+def save_global_params(path: str, params: Dict[str, Any]):
+    """Saves global model's parameters as a pack or a `.pth` file depending on the extension of `path`"""
+    if is_pack(path):
+        save_global_pack(path, params)
+    else:
+        torch.save(params, path)
+
+
+def convert_model(src: str, dst: str, max_sh_degree: int=-1):
+    """Converts a model among `.ply` (client model), `.pth` (global model) and `.pack` (either)
+
+    Args:
+        src (str): /path/to/source model
+        dst (str): /path/to/destination model
+        max_sh_degree (int): SH degree of a ply file. if negative, it is inferred from the file
+    """
+    src_ext, dst_ext = os.path.splitext(src)[1], os.path.splitext(dst)[1]
+    if src_ext == '.ply':
+        if max_sh_degree < 0:
+            max_sh_degree = infer_sh_degree(src)
+        params = read_gaussian_ply(src, max_sh_degree)
+        layout = CLIENT
+    elif src_ext == PACK_EXT:
+        params = load_tensor_pack(src, mmap=False)
+        layout = CLIENT if 'app_mlp' not in params else GLOBAL
+    else:
+        params = torch.load(src, map_location='cpu')
+        layout = GLOBAL
+
+    if dst_ext == '.ply':
+        write_gaussian_ply(dst, params if layout == CLIENT else to_client_params(params))
+    elif layout == CLIENT and dst_ext == PACK_EXT:
+        save_client_pack(dst, params)
+    else:
+        save_global_params(dst, params if layout == GLOBAL else to_global_params(params))
+
+
+def infer_sh_degree(path: str) -> int:
+    """Infers the SH degree of a ply file saved by `GaussianModel.save_ply` from its header"""
+    _, elements, _ = read_ply_header(path)
+    n_rest = sum(name.startswith('f_rest_') for _, name in elements[0][2])
+    return round(((n_rest + 3) // 3) ** 0.5) - 1
@@ -8,16 +8,14 @@ import faiss
 import torch
 import numpy as np
 
-from .graphics_utils import getProjectionMatrix, focal2fov
+from .frustum_utils import compute_projection, in_frustum_mask, frustum_visibility
+from .pose_utils import RDF_TO_DRB, meganerf_to_viewmats, intrinsics_to_fovs, full_projections, stack_cameras
+from .spatial_utils import frustum_planes
+from .store_utils import GaussianStore
 
 from diff_gaussian_rasterization import GaussianRasterizationSettings, GaussianRasterizer
 
 
-RDF_TO_DRB = torch.Tensor([[0, 1, 0],
-                           [1, 0, 0],
-                           [0, 0, -1]])
-
-
 def reset_opacity(opacity, activation, inverse_activation, max_op=0.01):
     return inverse_activation(activation(opacity).clamp(max=max_op))
 
@@ -40,31 +38,17 @@ def knn_filtering(index, query, eps):
     return (lims[1:] - lims[:-1]) > 0
 
 
-def compute_projection(fovx, fovy, extrinsic):
-    projection_matrix = getProjectionMatrix(znear=0.01, zfar=100, fovX=fovx, fovY=fovy).transpose(0,1).to(extrinsic.device)
-    full_proj_transform = (extrinsic.unsqueeze(0).bmm(projection_matrix.unsqueeze(0))).squeeze(0)
-    return full_proj_transform
-
-
-@torch.no_grad()
-def in_frustum_mask(points, viewmatrix, projmatrix, far: float=100.0, bound: float=1.3):
-    """This function is based on `in_frustum` in auxiliary.h of diff-gaussian-rasterization
-    
-    Args:
-        points (torch.Tensor): gaussian center that is a Tensor of shape (#points, 3)
-        viewmatrix (torch.Tensor): world-to-camera matrix that is a column-major (=transposed) Tensor of shape (4, 4)
-        projmatrix (torch.Tensor): projection matrix that is a column-major (=transposed) Tensor of shape (4, 4)
-
+def get_frustum_matrices(metadatas: List[Dict[str, Any]], device='cpu') -> Tuple[torch.Tensor, torch.Tensor]:
+    """
     Returns:
-        masks (torch.Tensor): binary mask that is a Tensor of shape (#points,)
+        viewmats (torch.Tensor): column-major world-to-camera matrices of shape (#cameras, 4, 4)
+        projmats (torch.Tensor): column-major full projection matrices of shape (#cameras, 4, 4)
     """
-    p_hom = projmatrix.T[None, :4, :3] @ points.reshape(-1, 3, 1) + projmatrix.T[None, :4, -1:]
-    p_w = 1 / (p_hom[:, -1] + 1e-7)
-    p_proj = p_hom[:, :3, 0] * p_w
-    p_view = viewmatrix.T[None, :3, :3] @ points.reshape(-1, 3, 1) + viewmatrix.T[None, :3, -1:]
-    
-    return torch.logical_and(torch.logical_and(p_proj[:, 0].abs() <= bound, p_proj[:, 1].abs() <= bound),
-                             torch.logical_and(p_view[:, -1, 0] > 0., p_view[:, -1, 0] < far))
+    cameras = stack_cameras(metadatas)
+    viewmat = meganerf_to_viewmats(cameras['c2w']).to(device)
+    fovxs, fovys = intrinsics_to_fovs(cameras['intrinsics'], cameras['H'], cameras['W'])
+    proj_transform = full_projections(viewmat, fovxs, fovys)
+    return viewmat, proj_transform
 
 
 @torch.no_grad()
@@ -73,31 +57,36 @@ def compute_visible_point_mask(xyz: torch.Tensor, metadatas: List[Dict[str, Any]
     Returns:
         masks (torch.Tensor): visible point mask that is a bool Tensor of shape (#points,)
     """
-    viewmat = torch.stack([meganerf2colmap(m['c2w']) for m in metadatas]).to(xyz.device)
-    fx, fy, cx, cy = list(zip(*[m['intrinsics'] for m in metadatas]))
-    Hs = [m['H'] for m in metadatas]
-    Ws = [m['W'] for m in metadatas]
-    fovxs = [focal2fov(f.item(), W) for f, W in zip(fx, Ws)]
-    fovys = [focal2fov(f.item(), H) for f, H in zip(fy, Hs)]
-    proj_transform = torch.stack([compute_projection(fovx, fovy, vm)
-                                  for fovx, fovy, vm in zip(fovxs, fovys, viewmat)])
-    return sum([in_frustum_mask(xyz, viewm, proj) for viewm, proj in zip(viewmat, proj_transform)]).bool()
+    viewmat, proj_transform = get_frustum_matrices(metadatas, xyz.device)
+    return frustum_visibility(xyz, viewmat, proj_transform)[1]
+
+
+@torch.no_grad()
+def compute_visible_rows(global_store: GaussianStore,
+                         metadatas: Optional[List[Dict[str, Any]]]=None,
+                         far: float=100.0,
+                         frustum: Optional[Tuple[torch.Tensor, torch.Tensor]]=None) -> torch.Tensor:
+    """Same as `compute_visible_point_mask`, but only tests candidates from the store's spatial index
+
+    Args:
+        frustum (Tuple[torch.Tensor, torch.Tensor]): `viewmats` and `projmats` on CPU in the format of
+                                                     `get_frustum_matrices`, e.g., from a `CameraTable`.
+                                                     if given, `metadatas` is not used
+
+    Returns:
+        rows (torch.Tensor): ascending indices of visible live rows in `global_store`
+    """
+    viewmat, proj_transform = frustum if frustum is not None else get_frustum_matrices(metadatas)
+    if global_store.index is None:
+        return global_store.select(lambda xyz: frustum_visibility(xyz, viewmat, proj_transform)[1])
+    candidates = global_store.index.query(frustum_planes(viewmat, proj_transform, far))
+    candidates = candidates[global_store.alive[candidates]]
+    xyz = global_store.gather(candidates, keys=('xyz',))['xyz']
+    return candidates[frustum_visibility(xyz, viewmat, proj_transform, far)[1]]
 
 
 def meganerf2colmap(c2w: torch.Tensor, return_w2c: bool=True, reorder: bool=True):
-    if reorder:
-        c2w = torch.cat([-c2w[:, 1:2], c2w[:, :1], c2w[:, 2:]], 1)
-        # inverse transform of https://github.com/cmusatyalab/mega-nerf/blob/main/scripts/colmap_to_mega_nerf.py#L346-L349
-        c2w = torch.cat([RDF_TO_DRB.inverse() @ c2w[:3, :3] @ RDF_TO_DRB,
-                         RDF_TO_DRB.inverse() @ c2w[:3, 3:]], -1)
-    # camera-to-world to world-to-camera
-    if return_w2c:
-        R = c2w[:3, :3].T
-        t = - R @ c2w[:3, -1:]
-        extrinsic = torch.cat([torch.cat([R, t], -1), torch.eye(4)[-1:]], 0).T # column-major
-    else:
-        extrinsic = torch.cat([c2w, torch.eye(4, device=c2w.device)[-1:]], 0)
-    return extrinsic
+    return meganerf_to_viewmats(c2w, return_w2c, reorder)
 
 
 def rendering(model, img_height, img_width, fovx, fovy, extrinsic, bg_color, sh_modifier=None, depth=False):
@@ -170,19 +159,20 @@ def get_model_params(model, preact: bool=False, device='cuda'):
 
 @torch.no_grad()
 def sample_cameras(local_model,
-                   global_metadatas: List[Dict[str, Any]],
+                   global_metadatas: Optional[List[Dict[str, Any]]],
                    max_cameras: int = 50,
-                   far: int = 100) -> List[str]:
-    height, width, fovx, fovy, viewmats = get_cameras_from_metadata(global_metadatas)
+                   far: int = 100,
+                   frustum: Optional[Tuple[torch.Tensor, torch.Tensor]] = None) -> List[str]:
+    if frustum is not None:
+        # precomputed matrices, e.g., from a `CameraTable`
+        viewmats, projmats = frustum
+    else:
+        height, width, fovx, fovy, viewmats = get_cameras_from_metadata(global_metadatas)
+        projmats = full_projections(viewmats, fovx, fovy)
     xyz = local_model._xyz
-    candidates = []
-    viewpnts = []
-    for i, (h, w, fx, fy, viewmat) in enumerate(zip(height, width, fovx, fovy, viewmats)):
-        projmat = compute_projection(fx, fy, viewmat)
-        mask = in_frustum_mask(xyz, viewmat, projmat, far)
-        if mask.any():
-            candidates.append(i)
-            viewpnts.append(mask.sum().item())
+    counts, _ = frustum_visibility(xyz, viewmats, projmats, far)
+    candidates = torch.nonzero(counts).reshape(-1).tolist()
+    viewpnts = counts[counts > 0].tolist()
     if len(candidates) > max_cameras:
         # sample {max_cameras} cameras based on #viewpnts
         sum_vpnts = sum(viewpnts)
@@ -200,25 +190,13 @@ def get_cameras_from_metadata(metadatas: List[Dict[str, Any]],
                                                               List[float],
                                                               List[float],
                                                               torch.Tensor]:
-    image_height = []
-    image_width = []
-    fovx = []
-    fovy = []
-    viewmats = []
-    if indices is None:
-        indices = range(len(metadatas))
-    for i in indices:
-        image_height.append(metadatas[i]['H'])
-        image_width.append(metadatas[i]['W'])
-        fx, fy, _, _ = metadatas[i]['intrinsics']
-        if isinstance(fx, torch.Tensor):
-            fovx.append(focal2fov(fx.item(), image_width[-1]))
-            fovy.append(focal2fov(fy.item(), image_height[-1]))
-        else:
-            fovx.append(focal2fov(fx, image_width[-1]))
-            fovy.append(focal2fov(fy, image_height[-1]))
-        if colmap_fmt:
-            viewmats.append(meganerf2colmap(metadatas[i]['c2w']))
-        else:
-            viewmats.append(metadatas[i]['c2w'])
-    return image_height, image_width, fovx, fovy, torch.stack(viewmats).cuda()
+    if indices is not None:
+        metadatas = [metadatas[i] for i in indices]
+    # all cameras are converted at once
+    cameras = stack_cameras(metadatas)
+    fovx, fovy = intrinsics_to_fovs(cameras['intrinsics'], cameras['H'], cameras['W'])
+    if colmap_fmt:
+        viewmats = meganerf_to_viewmats(cameras['c2w'])
+    else:
+        viewmats = torch.stack([m['c2w'] for m in metadatas])
+    return cameras['H'].tolist(), cameras['W'].tolist(), fovx.tolist(), fovy.tolist(), viewmats.cuda()
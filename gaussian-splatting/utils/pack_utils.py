@@ -0,0 +1,121 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict, Optional, Tuple
+import os
+import json
+import struct
+
+import numpy as np
+import torch
+
+
+# file layout:
+#   magic (8 bytes) | header size (uint64, little endian) | JSON header | padding | arrays ...
+# every array is stored in C order and starts at a multiple of ALIGNMENT bytes,
+# so that the arrays can be memory-mapped without copies.
+PACK_MAGIC = b'FEDPACK1'
+ALIGNMENT = 64
+# temporary files are named `{path}{TMP_SUFFIX}{pid}`
+TMP_SUFFIX = '.tmp'
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_pack(path: str, arrays: Dict[str, np.ndarray], attrs: Optional[Dict[str, Any]]=None):
+    """Writes named arrays and JSON-serializable attributes into a single file
+
+    The file is written to a temporary path unique to the process first and renamed, so readers never see
+    a partial file and processes writing the same file never write the same temporary file.
+
+    Args:
+        path (str): /path/to/file
+        arrays (Dict[str, np.ndarray]): arrays to be stored
+        attrs (Dict[str, Any]): JSON-serializable attributes
+    """
+    arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    entries = {}
+    offset = 0
+    for k, v in arrays.items():
+        entries[k] = dict(dtype=v.dtype.str, shape=list(v.shape), offset=offset)
+        offset = _align(offset + v.nbytes)
+    header = json.dumps(dict(arrays=entries, attrs=attrs or {})).encode('utf-8')
+    data_start = _align(len(PACK_MAGIC) + 8 + len(header))
+    tmp_path = f'{path}{TMP_SUFFIX}{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(PACK_MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for k, v in arrays.items():
+            f.seek(data_start + entries[k]['offset'])
+            f.write(memoryview(v.reshape(-1)).cast('B'))
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_pack(path: str, mmap: bool=True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Args:
+        path (str): /path/to/file written by `write_pack`
+        mmap (bool): if True, arrays are copy-on-write memory maps of the file,
+                     i.e., they are read lazily and modifying them never changes the file
+
+    Returns:
+        arrays (Dict[str, np.ndarray]): stored arrays
+        attrs (Dict[str, Any]): stored attributes
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(PACK_MAGIC))
+        if magic != PACK_MAGIC:
+            raise ValueError(f'{path} is not a pack file')
+        header_size, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size).decode('utf-8'))
+        data_start = _align(len(PACK_MAGIC) + 8 + header_size)
+        arrays = {}
+        for k, entry in header['arrays'].items():
+            dtype = np.dtype(entry['dtype'])
+            shape = tuple(entry['shape'])
+            count = int(np.prod(shape))
+            if mmap and count > 0:
+                arrays[k] = np.memmap(path, dtype=dtype, mode='c', offset=data_start + entry['offset'], shape=shape)
+            else:
+                f.seek(data_start + entry['offset'])
+                arrays[k] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    return arrays, header['attrs']
+
+
+def save_tensor_pack(path: str, params: Dict[str, Any], attrs: Optional[Dict[str, Any]]=None):
+    """Writes tensors and dicts of tensors (e.g., state dicts) as a pack
+
+    Tensors are stored in little-endian byte order and keys of nested dicts are joined by '/'.
+    """
+    arrays = {}
+    nested = []
+    for k, v in params.items():
+        items = [(k, v)]
+        if isinstance(v, dict):
+            nested.append(k)
+            items = [(k + '/' + sub_k, sub_v) for sub_k, sub_v in v.items()]
+        for name, tensor in items:
+            array = tensor.detach().cpu().numpy()
+            arrays[name] = array.astype(array.dtype.newbyteorder('<'), copy=False)
+    write_pack(path, arrays, dict(attrs or {}, nested=nested))
+
+
+def load_tensor_pack(path: str, mmap: bool=True) -> Dict[str, Any]:
+    """Reads tensors written by `save_tensor_pack`
+
+    With `mmap`, the tensors share memory with copy-on-write maps of the file,
+    so that loading costs no copy until the values are used.
+    """
+    arrays, attrs = read_pack(path, mmap)
+    params = {k: {} for k in attrs['nested']}
+    for name, array in arrays.items():
+        k, _, sub_k = name.partition('/')
+        tensor = torch.from_numpy(array)
+        if k in attrs['nested']:
+            params[k][sub_k] = tensor
+        else:
+            params[k] = tensor
+    return params
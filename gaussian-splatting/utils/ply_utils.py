@@ -0,0 +1,211 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict, List, Tuple
+import os
+
+import numpy as np
+import torch
+from numpy.lib.recfunctions import unstructured_to_structured
+
+from plyfile import PlyData
+
+
+# files saved next to point_cloud.ply by `GaussianModel.save_ply`
+APPEARANCE_FILES = dict(appearance_vec='appearance_vec.pt', mlp='mlp.pt', hash='hash.pt')
+# number of vertices converted and written at once by `write_ply`
+PLY_CHUNK_SIZE = 1 << 18
+# ply type names of numpy types
+PLY_TYPES = dict(i1='char', u1='uchar', i2='short', u2='ushort', i4='int', u4='uint', f4='float', f8='double')
+
+
+def _sorted_names(names: List[str], prefix: str) -> List[str]:
+    names = [name for name in names if name.startswith(prefix)]
+    return sorted(names, key = lambda x: int(x.split('_')[-1]))
+
+
+def read_ply_header(path: str) -> Tuple[str, List[Tuple[str, int, List[Tuple[str, str]]]], int]:
+    """
+    Args:
+        path (str): /path/to/file.ply
+
+    Returns:
+        fmt (str): format of the data, e.g., binary_little_endian
+        elements (List[Tuple[str, int, List[Tuple[str, str]]]]): (name, count, [(property type, property name), ...])
+                                                                 of elements. list properties have a type starting with 'list'
+        header_size (int): number of bytes of the header, i.e., offset of the data
+    """
+    fmt, elements = None, []
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f'{path} is not a ply file')
+        while True:
+            line = f.readline()
+            if len(line) == 0:
+                raise ValueError(f'{path} has no end_header')
+            words = line.decode('ascii').split()
+            if len(words) == 0 or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                break
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property':
+                elements[-1][2].append((' '.join(words[1:-1]), words[-1]))
+        header_size = f.tell()
+    return fmt, elements, header_size
+
+
+def read_vertex_block(path: str) -> Tuple[np.ndarray, List[str]]:
+    """Reads the vertices of a ply file whose properties are all float as an array of shape (N, #properties)
+
+    A binary little-endian file with a single vertex element, e.g., the one saved by `GaussianModel.save_ply`,
+    is memory-mapped without reading it; the other files are parsed by `plyfile`.
+
+    Returns:
+        vertices (np.ndarray): float32 array of shape (N, #properties)
+        names (List[str]): property names that correspond to the columns of `vertices`
+    """
+    fmt, elements, header_size = read_ply_header(path)
+    name, n_vertices, properties = elements[0]
+    names = [prop_name for _, prop_name in properties]
+    if (fmt == 'binary_little_endian' and len(elements) == 1
+            and all(prop_type in ('float', 'float32') for prop_type, _ in properties)):
+        if n_vertices == 0:
+            return np.empty((0, len(names)), dtype=np.float32), names
+        vertices = np.memmap(path, dtype='<f4', mode='r', offset=header_size, shape=(n_vertices, len(names)))
+        return vertices, names
+    vertex = PlyData.read(path)[name]
+    return np.stack([np.asarray(vertex[prop_name], dtype=np.float32) for prop_name in names], axis=1), names
+
+
+def read_gaussian_ply(path: str, max_sh_degree: int, load_appearance: bool=True, device: str='cpu') -> Dict[str, Any]:
+    """Reads Gaussians saved by `GaussianModel.save_ply`
+
+    The vertex block is memory-mapped and every attribute is gathered from it into its final layout
+    by a single copy, so the GPU is never touched with `device='cpu'`.
+
+    Args:
+        path (str): /path/to/point_cloud.ply
+        max_sh_degree (int): SH degree of the model
+        load_appearance (bool): if True, `appearance_vec.pt`, `mlp.pt` and `hash.pt` next to the ply file
+                                are also loaded when they exist
+        device (str): device of the returned tensors
+
+    Returns:
+        params (Dict[str, Any]): `xyz`, `features_dc`, `features_rest`, `opacity`, `scaling` and `rotation`
+                                 as float Tensors in the layout of `GaussianModel`, and
+                                 `appearance_vec`, `mlp` and `hash` if they are loaded
+    """
+    vertices, names = read_vertex_block(path)
+    column = {name: i for i, name in enumerate(names)}
+    n_vertices = len(vertices)
+
+    extra_f_names = _sorted_names(names, "f_rest_")
+    assert len(extra_f_names)==3*(max_sh_degree + 1) ** 2 - 3
+    n_coeffs = (max_sh_degree + 1) ** 2 - 1
+    # f_rest_{c * n_coeffs + k} is the k-th coefficient of the c-th channel, which is stored at (k, c)
+    extra_f_names = [extra_f_names[c * n_coeffs + k] for k in range(n_coeffs) for c in range(3)]
+    scale_names = _sorted_names(names, "scale_")
+    rot_names = _sorted_names(names, "rot")
+    groups = dict(xyz=(['x', 'y', 'z'], (3,)),
+                  features_dc=(['f_dc_0', 'f_dc_1', 'f_dc_2'], (1, 3)),
+                  features_rest=(extra_f_names, (n_coeffs, 3)),
+                  opacity=(['opacity'], (1,)),
+                  scaling=(scale_names, (len(scale_names),)),
+                  rotation=(rot_names, (len(rot_names),)))
+
+    params = {}
+    for k, (group_names, shape) in groups.items():
+        # the columns are copied from the map into a contiguous array at once
+        values = np.empty((n_vertices, len(group_names)), dtype=np.float32)
+        np.take(vertices, [column[name] for name in group_names], axis=1, out=values)
+        params[k] = torch.from_numpy(values.reshape(n_vertices, *shape)).to(device)
+
+    model_dir = os.path.dirname(path)
+    if load_appearance and os.path.exists(os.path.join(model_dir, APPEARANCE_FILES['appearance_vec'])):
+        for k, fname in APPEARANCE_FILES.items():
+            params[k] = torch.load(os.path.join(model_dir, fname), map_location=device)
+    return params
+
+
+def ply_attributes(params: Dict[str, Any]) -> List[str]:
+    """Returns property names of the ply file in the order written by `GaussianModel.save_ply`"""
+    l = ['x', 'y', 'z', 'nx', 'ny', 'nz']
+    # All channels except the 3 DC
+    for i in range(params['features_dc'].shape[1]*params['features_dc'].shape[2]):
+        l.append('f_dc_{}'.format(i))
+    for i in range(params['features_rest'].shape[1]*params['features_rest'].shape[2]):
+        l.append('f_rest_{}'.format(i))
+    l.append('opacity')
+    for i in range(params['scaling'].shape[1]):
+        l.append('scale_{}'.format(i))
+    for i in range(params['rotation'].shape[1]):
+        l.append('rot_{}'.format(i))
+    return l
+
+
+def write_ply(path: str, properties: List[Tuple[str, str]], blocks: List[np.ndarray], chunk_size: int=PLY_CHUNK_SIZE):
+    """Writes vertices as a binary little-endian ply file byte-identical to the one written by `plyfile`
+
+    The vertex block is written in chunks of `chunk_size` vertices, each of which is converted
+    into the record layout at once, instead of building a Python tuple per vertex.
+
+    Args:
+        path (str): /path/to/file.ply
+        properties (List[Tuple[str, str]]): (name, numpy type) of vertex properties, e.g., [('x', 'f4'), ('red', 'u1')]
+        blocks (List[np.ndarray]): arrays of shape (N, #properties in the block) whose columns
+                                   are the properties in order
+        chunk_size (int): number of vertices written at once
+    """
+    dtype = np.dtype([(name, np.dtype(fmt).newbyteorder('<')) for name, fmt in properties])
+    n_vertices = len(blocks[0])
+    header = ['ply', 'format binary_little_endian 1.0', f'element vertex {n_vertices}']
+    header += [f'property {PLY_TYPES[np.dtype(fmt).str[1:]]} {name}' for name, fmt in properties]
+    header += ['end_header']
+    uniform = all(np.dtype(fmt) == np.dtype(properties[0][1]) for _, fmt in properties)
+    with open(path, 'wb') as f:
+        f.write(('\n'.join(header) + '\n').encode('ascii'))
+        for start in range(0, n_vertices, chunk_size):
+            chunk = np.concatenate([b[start:start + chunk_size] for b in blocks], axis=1)
+            if uniform:
+                # the records are the rows of the chunk
+                chunk = chunk.astype(dtype[0], copy=False)
+            else:
+                chunk = unstructured_to_structured(chunk, dtype=dtype)
+            f.write(memoryview(np.ascontiguousarray(chunk)).cast('B'))
+
+
+def write_gaussian_ply(path: str, params: Dict[str, Any]):
+    """Writes Gaussians in the format of `GaussianModel.save_ply`
+
+    Args:
+        path (str): /path/to/point_cloud.ply
+        params (Dict[str, Any]): parameters in the format returned by `read_gaussian_ply`.
+                                 `appearance_vec`, `mlp` and `hash` are saved next to the ply file if they exist
+    """
+    xyz = params['xyz'].detach().cpu().numpy()
+    normals = np.zeros_like(xyz)
+    f_dc = params['features_dc'].detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
+    f_rest = params['features_rest'].detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
+    opacities = params['opacity'].detach().cpu().numpy()
+    scale = params['scaling'].detach().cpu().numpy()
+    rotation = params['rotation'].detach().cpu().numpy()
+
+    dtype_full = [(attribute, 'f4') for attribute in ply_attributes(params)]
+    write_ply(path, dtype_full, [xyz, normals, f_dc, f_rest, opacities, scale, rotation])
+
+    model_dir = os.path.dirname(path)
+    for k, fname in APPEARANCE_FILES.items():
+        if k in params:
+            torch.save(params[k], os.path.join(model_dir, fname))
+
+
+def params_nbytes(params: Dict[str, Any]) -> int:
+    """Returns the number of bytes of tensors in (nested dicts of) parameters"""
+    if isinstance(params, torch.Tensor):
+        return params.numel() * params.element_size()
+    if isinstance(params, dict):
+        return sum(params_nbytes(v) for v in params.values())
+    return 0
@@ -0,0 +1,153 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+
+
+# Mega-NeRF's (down, right, backward) axes to COLMAP's (right, down, forward) axes
+RDF_TO_DRB = torch.Tensor([[0, 1, 0],
+                           [1, 0, 0],
+                           [0, 0, -1]])
+
+
+def qvecs_to_rotmats(qvecs: np.ndarray) -> np.ndarray:
+    """Batched `qvec2rotmat` that converts COLMAP's (w, x, y, z) quaternions of shape (..., 4) into (..., 3, 3)"""
+    w, x, y, z = np.moveaxis(np.asarray(qvecs), -1, 0)
+    return np.stack([
+        np.stack([1 - 2 * y**2 - 2 * z**2, 2 * x * y - 2 * w * z, 2 * z * x + 2 * w * y], -1),
+        np.stack([2 * x * y + 2 * w * z, 1 - 2 * x**2 - 2 * z**2, 2 * y * z - 2 * w * x], -1),
+        np.stack([2 * z * x - 2 * w * y, 2 * y * z + 2 * w * x, 1 - 2 * x**2 - 2 * y**2], -1)], -2)
+
+
+def rotmats_to_qvecs(R: np.ndarray) -> np.ndarray:
+    """Batched `rotmat2qvec` that converts rotation matrices of shape (..., 3, 3) into quaternions of shape (..., 4)"""
+    R = np.asarray(R)
+    Rxx, Ryx, Rzx = R[..., 0, 0], R[..., 0, 1], R[..., 0, 2]
+    Rxy, Ryy, Rzy = R[..., 1, 0], R[..., 1, 1], R[..., 1, 2]
+    Rxz, Ryz, Rzz = R[..., 2, 0], R[..., 2, 1], R[..., 2, 2]
+    zeros = np.zeros_like(Rxx)
+    K = np.stack([
+        np.stack([Rxx - Ryy - Rzz, zeros, zeros, zeros], -1),
+        np.stack([Ryx + Rxy, Ryy - Rxx - Rzz, zeros, zeros], -1),
+        np.stack([Rzx + Rxz, Rzy + Ryz, Rzz - Rxx - Ryy, zeros], -1),
+        np.stack([Ryz - Rzy, Rzx - Rxz, Rxy - Ryx, Rxx + Ryy + Rzz], -1)], -2).astype(np.float64) / 3.0
+    eigvals, eigvecs = np.linalg.eigh(K)
+    qvecs = np.take_along_axis(eigvecs, np.argmax(eigvals, -1)[..., None, None], -1)[..., [3, 0, 1, 2], 0]
+    qvecs *= np.where(qvecs[..., :1] < 0, -1, 1)
+    return qvecs
+
+
+def invert_extrinsics(mats: torch.Tensor) -> torch.Tensor:
+    """Converts rigid transforms of shape (..., 3, 4) (or (..., 4, 4)) between camera-to-world and world-to-camera
+
+    Returns:
+        inverses (torch.Tensor): [R^T | -R^T @ t] of shape (..., 3, 4)
+    """
+    R = mats[..., :3, :3].transpose(-1, -2)
+    t = - R @ mats[..., :3, -1:]
+    return torch.cat([R, t], -1)
+
+
+def meganerf_to_colmap(c2ws: torch.Tensor) -> torch.Tensor:
+    """Converts camera-to-world matrices in Mega-NeRF's coordinate system into COLMAP's one"""
+    rdf_to_drb = RDF_TO_DRB.to(c2ws)
+    c2ws = torch.cat([-c2ws[..., :3, 1:2], c2ws[..., :3, :1], c2ws[..., :3, 2:4]], -1)
+    # inverse transform of https://github.com/cmusatyalab/mega-nerf/blob/main/scripts/colmap_to_mega_nerf.py#L346-L349
+    return torch.cat([rdf_to_drb.inverse() @ c2ws[..., :3, :3] @ rdf_to_drb,
+                      rdf_to_drb.inverse() @ c2ws[..., :3, 3:]], -1)
+
+
+def colmap_to_meganerf(c2ws: torch.Tensor) -> torch.Tensor:
+    """Inverse of `meganerf_to_colmap`"""
+    rdf_to_drb = RDF_TO_DRB.to(c2ws)
+    c2ws = torch.cat([rdf_to_drb @ c2ws[..., :3, :3] @ rdf_to_drb.inverse(),
+                      rdf_to_drb @ c2ws[..., :3, 3:4]], -1)
+    return torch.cat([c2ws[..., 1:2], -c2ws[..., 0:1], c2ws[..., 2:]], -1)
+
+
+def to_homogeneous(mats: torch.Tensor) -> torch.Tensor:
+    """Appends (0, 0, 0, 1) to matrices of shape (..., 3, 4)"""
+    bottom = torch.eye(4, dtype=mats.dtype, device=mats.device)[-1:].expand(*mats.shape[:-2], 1, 4)
+    return torch.cat([mats, bottom], -2)
+
+
+def meganerf_to_viewmats(c2ws: torch.Tensor, return_w2c: bool=True, reorder: bool=True) -> torch.Tensor:
+    """Batched `meganerf2colmap`
+
+    Args:
+        c2ws (torch.Tensor): camera-to-world matrices of shape (..., 3, 4) in Mega-NeRF's coordinate system
+        return_w2c (bool): if True, world-to-camera matrices are returned in column-major
+        reorder (bool): if True, the matrices are converted into COLMAP's coordinate system
+
+    Returns:
+        viewmats (torch.Tensor): column-major world-to-camera matrices of shape (..., 4, 4),
+                                 or camera-to-world matrices of shape (..., 4, 4) if not `return_w2c`
+    """
+    if reorder:
+        c2ws = meganerf_to_colmap(c2ws)
+    if return_w2c:
+        return to_homogeneous(invert_extrinsics(c2ws)).transpose(-1, -2)
+    return to_homogeneous(c2ws[..., :3, :])
+
+
+def intrinsics_to_fovs(intrinsics: torch.Tensor, heights: torch.Tensor, widths: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Batched `focal2fov` of (fx, fy, cx, cy) of shape (N, 4), computed in double precision as `focal2fov` does
+
+    Returns:
+        fovx (torch.Tensor): horizontal FoVs of shape (N,)
+        fovy (torch.Tensor): vertical FoVs of shape (N,)
+    """
+    intrinsics = intrinsics.double()
+    fovx = 2 * torch.atan(widths.double() / (2 * intrinsics[:, 0]))
+    fovy = 2 * torch.atan(heights.double() / (2 * intrinsics[:, 1]))
+    return fovx, fovy
+
+
+def projection_matrices(fovx: torch.Tensor, fovy: torch.Tensor, znear: float=0.01, zfar: float=100.0) -> torch.Tensor:
+    """Batched `getProjectionMatrix`
+
+    Returns:
+        projmats (torch.Tensor): column-major (=transposed) projection matrices of shape (N, 4, 4)
+    """
+    tanHalfFovY = torch.tan(torch.as_tensor(fovy, dtype=torch.float64) / 2)
+    tanHalfFovX = torch.tan(torch.as_tensor(fovx, dtype=torch.float64) / 2)
+
+    top = tanHalfFovY * znear
+    bottom = -top
+    right = tanHalfFovX * znear
+    left = -right
+
+    P = torch.zeros(len(top), 4, 4, dtype=torch.float64)
+
+    z_sign = 1.0
+
+    P[:, 0, 0] = 2.0 * znear / (right - left)
+    P[:, 1, 1] = 2.0 * znear / (top - bottom)
+    P[:, 0, 2] = (right + left) / (right - left)
+    P[:, 1, 2] = (top + bottom) / (top - bottom)
+    P[:, 3, 2] = z_sign
+    P[:, 2, 2] = z_sign * zfar / (zfar - znear)
+    P[:, 2, 3] = -(zfar * znear) / (zfar - znear)
+    return P.float().transpose(1, 2)
+
+
+def full_projections(viewmats: torch.Tensor, fovx: torch.Tensor, fovy: torch.Tensor) -> torch.Tensor:
+    """Batched `compute_projection`
+
+    Args:
+        viewmats (torch.Tensor): column-major world-to-camera matrices of shape (N, 4, 4)
+
+    Returns:
+        projmats (torch.Tensor): column-major full projection matrices of shape (N, 4, 4)
+    """
+    return viewmats.bmm(projection_matrices(fovx, fovy).to(viewmats.device))
+
+
+def stack_cameras(metadatas: List[Dict[str, Any]]) -> Dict[str, torch.Tensor]:
+    """Stacks `H`, `W`, `intrinsics` and `c2w` of metadata into tensors of shape (N,), (N,), (N, 4) and (N, 3, 4)"""
+    return dict(H=torch.tensor([m['H'] for m in metadatas], dtype=torch.long),
+                W=torch.tensor([m['W'] for m in metadatas], dtype=torch.long),
+                intrinsics=torch.stack([torch.as_tensor(m['intrinsics'], dtype=torch.float64) for m in metadatas]),
+                c2w=torch.stack([m['c2w'][:3] for m in metadatas]))
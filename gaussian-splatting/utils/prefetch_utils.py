@@ -0,0 +1,79 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import threading
+
+
+class Prefetcher:
+    """Loads items in a background thread ahead of their use.
+
+    Items are loaded in the order of `keys` and must be taken by `get` in the same order.
+    The worker keeps at most `depth` loaded items waiting and stops reading ahead
+    once the waiting items reach `max_bytes` (one item is always allowed,
+    so an item larger than `max_bytes` does not block the loop).
+
+    Args:
+        load_fn (Callable): function that loads an item from a key
+        keys (List[Hashable]): keys in the order they are used
+        depth (int): maximum number of loaded items waiting to be used
+        max_bytes (int): memory budget of the loaded items waiting to be used
+        size_fn (Callable): function that returns the size in bytes of a loaded item
+    """
+    def __init__(self,
+                 load_fn: Callable[[Hashable], Any],
+                 keys: List[Hashable],
+                 depth: int=2,
+                 max_bytes: int=8 << 30,
+                 size_fn: Optional[Callable[[Any], int]]=None):
+        self.load_fn = load_fn
+        self.keys = list(keys)
+        self.depth = max(depth, 1)
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn if size_fn is not None else (lambda item: 0)
+        self._ready: Dict[Hashable, Any] = {}
+        self._sizes: Dict[Hashable, int] = {}
+        self._next = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def _has_room(self) -> bool:
+        return len(self._ready) == 0 or (len(self._ready) < self.depth
+                                         and sum(self._sizes.values()) < self.max_bytes)
+
+    def _worker(self):
+        for key in self.keys:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._has_room())
+                if self._closed:
+                    return
+            try:
+                item, error = self.load_fn(key), None
+            except Exception as e:
+                item, error = None, e
+            with self._cond:
+                self._ready[key] = (item, error)
+                self._sizes[key] = self.size_fn(item) if error is None else 0
+                self._cond.notify_all()
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the loaded item of `key`, waiting for it if it is still being loaded"""
+        if self._next >= len(self.keys) or self.keys[self._next] != key:
+            raise KeyError(f'{key} is not the next scheduled key')
+        self._next += 1
+        with self._cond:
+            self._cond.wait_for(lambda: key in self._ready)
+            item, error = self._ready.pop(key)
+            self._sizes.pop(key)
+            self._cond.notify_all()
+        if error is not None:
+            raise error
+        return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._ready.clear()
+            self._sizes.clear()
+            self._cond.notify_all()
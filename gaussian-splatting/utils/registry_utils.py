@@ -0,0 +1,65 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+# number of set bits of every byte, used when numpy does not provide `bitwise_count`
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bits: np.ndarray) -> int:
+    """Returns the number of set bits in a bitset"""
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bits).sum())
+    return int(_POPCOUNT_TABLE[bits.view(np.uint8)].sum())
+
+
+def count_overlap(a: np.ndarray, b: np.ndarray) -> int:
+    """Returns the number of elements in both bitsets"""
+    return popcount(a & b)
+
+
+class CameraRegistry:
+    """Maps image filenames to dense integer IDs to represent camera sets as bitsets.
+
+    IDs are assigned in sorted order of the filenames so that decoding a bitset
+    returns filenames in the same order as numpy's set routines
+    (e.g., `np.intersect1d`, `np.union1d` and `np.setdiff1d`).
+
+    Args:
+        names (Iterable[str]): image filenames that can appear in camera sets
+    """
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = sorted(set(names))
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.n_words = (len(self.names) + 63) // 64
+
+    def __len__(self):
+        return len(self.names)
+
+    def empty(self) -> np.ndarray:
+        return np.zeros(self.n_words, dtype=np.uint64)
+
+    def lookup(self, names: Iterable[str]) -> np.ndarray:
+        """Returns the IDs of filenames in the given order"""
+        return np.fromiter((self.ids[name] for name in names), dtype=np.int64)
+
+    def encode(self, names: Iterable[str]) -> np.ndarray:
+        """
+        Returns:
+            bits (np.ndarray): bitset that is an ndarray of shape (#words,) and dtype uint64
+        """
+        ids = self.lookup(names)
+        bits = np.zeros(self.n_words * 64, dtype=bool)
+        bits[ids] = True
+        return np.packbits(bits, bitorder='little').view(np.uint64)
+
+    def decode_ids(self, bits: np.ndarray) -> np.ndarray:
+        """Returns the ascending IDs in a bitset"""
+        return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder='little'))
+
+    def decode(self, bits: np.ndarray) -> List[str]:
+        """Returns the sorted filenames in a bitset"""
+        return [self.names[i] for i in self.decode_ids(bits)]
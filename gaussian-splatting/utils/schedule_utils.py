@@ -0,0 +1,118 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import List
+import heapq
+
+import numpy as np
+
+
+def _bit_ids(bits: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder='little'))
+
+
+class OverlapScheduler:
+    """Plans the order in which client models are aggregated into the global model.
+
+    The client-client overlap graph is given by an inverted index from images to clients,
+    and each client's overlap with the global camera set is updated incrementally,
+    only for the clients sharing the images newly added by a merged client.
+
+    Two policies are supported:
+        'sequential': clients are visited in file order and a client whose overlap is
+                      below `threshold` is buffered. After every merge, the buffered
+                      clients are rescanned in buffer order until no client is merged.
+                      This is the same order as the original buffer loop.
+        'greedy': the client with the largest overlap is merged first (ties are broken
+                  by file order) as long as the overlap is not below `threshold`.
+    Both policies merge the same set of clients; the remaining ones never reach `threshold`.
+
+    Args:
+        client_bits (List[np.ndarray]): camera bitset of each client, see `CameraRegistry`
+        global_bits (np.ndarray): camera bitset of the initial global model
+        threshold (int): minimum number of images shared with the global model to merge a client
+    """
+    def __init__(self, client_bits: List[np.ndarray], global_bits: np.ndarray, threshold: int):
+        self.threshold = threshold
+        self.in_global = np.unpackbits(global_bits.view(np.uint8), bitorder='little').astype(bool)
+        self.client_ids = [_bit_ids(bits) for bits in client_bits]
+        self.n_clients = len(client_bits)
+        # inverted index from image IDs to clients in CSR layout
+        image_ids = np.concatenate([np.zeros(0, dtype=np.int64)] + self.client_ids)
+        owners = np.repeat(np.arange(self.n_clients), [len(ids) for ids in self.client_ids])
+        order = np.argsort(image_ids, kind='stable')
+        self.owners = owners[order]
+        self.indptr = np.zeros(len(self.in_global) + 1, dtype=np.int64)
+        np.add.at(self.indptr, image_ids + 1, 1)
+        np.cumsum(self.indptr, out=self.indptr)
+        self.overlap = np.array([np.count_nonzero(self.in_global[ids]) for ids in self.client_ids], dtype=np.int64)
+        self.merged = np.zeros(self.n_clients, dtype=bool)
+
+    def _merge(self, client: int) -> np.ndarray:
+        """Adds a client's cameras to the global set and returns the clients whose overlap changed"""
+        self.merged[client] = True
+        new_ids = self.client_ids[client][~self.in_global[self.client_ids[client]]]
+        self.in_global[new_ids] = True
+        if len(new_ids) == 0:
+            return new_ids
+        starts = self.indptr[new_ids]
+        counts = self.indptr[new_ids + 1] - starts
+        pos = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        neighbours = self.owners[pos]
+        np.add.at(self.overlap, neighbours, 1)
+        return np.unique(neighbours[~self.merged[neighbours]])
+
+    def plan(self, policy: str='sequential') -> List[int]:
+        """
+        Returns:
+            order (List[int]): indices of clients in the order they are merged
+        """
+        if policy == 'sequential':
+            return self._plan_sequential()
+        if policy == 'greedy':
+            return self._plan_greedy()
+        raise ValueError(f'unknown scheduling policy: {policy}')
+
+    def _plan_sequential(self) -> List[int]:
+        order = []
+        buffered = np.zeros(self.n_clients, dtype=bool)
+        for client in range(self.n_clients):
+            if self.overlap[client] < self.threshold:
+                buffered[client] = True
+                continue
+            order.append(client)
+            newly_ready = self._merge(client)
+            # a rescan of the buffer visits the ready clients in buffer order. clients
+            # becoming ready behind the cursor are merged in the next rescan.
+            current = [c for c in newly_ready if buffered[c] and self.overlap[c] >= self.threshold]
+            heapq.heapify(current)
+            deferred = []
+            cursor = -1
+            while current or deferred:
+                if not current:
+                    current, deferred, cursor = deferred, [], -1
+                    heapq.heapify(current)
+                c = heapq.heappop(current)
+                if not buffered[c]:
+                    continue
+                buffered[c] = False
+                cursor = c
+                order.append(c)
+                for n in self._merge(c):
+                    if buffered[n] and self.overlap[n] >= self.threshold:
+                        heapq.heappush(current if n > cursor else deferred, n)
+        return order
+
+    def _plan_greedy(self) -> List[int]:
+        order = []
+        heap = [(-self.overlap[c], c) for c in range(self.n_clients) if self.overlap[c] >= self.threshold]
+        heapq.heapify(heap)
+        while heap:
+            neg_overlap, c = heapq.heappop(heap)
+            # skip stale entries; overlaps only grow, so the latest entry is the valid one
+            if self.merged[c] or -neg_overlap != self.overlap[c]:
+                continue
+            order.append(c)
+            for n in self._merge(c):
+                if self.overlap[n] >= self.threshold:
+                    heapq.heappush(heap, (-self.overlap[n], n))
+        return order
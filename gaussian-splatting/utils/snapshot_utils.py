@@ -0,0 +1,122 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Dict, Optional
+import os
+
+import torch
+
+from .store_utils import GAUSSIAN_KEYS, GaussianStore
+from .model_io_utils import is_pack, load_global_params, save_global_params
+
+
+# value of `snapshot_type` in delta snapshot files. base snapshots are plain parameter dicts
+# (the format saved by `torch.save(global_store.to_params(), ...)`), which are loadable by `torch.load`,
+# or packs of them if their paths end with `.pack` (see `utils.model_io_utils`).
+DELTA = 'delta'
+
+
+def _save(obj: Any, path: str):
+    if is_pack(path):
+        # packs are written to a temporary file and renamed by themselves
+        save_global_params(path, obj)
+        return
+    # write to a temporary file and rename it, so that a crash never leaves a partial file
+    torch.save(obj, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def is_delta(snapshot: Dict[str, Any]) -> bool:
+    return snapshot.get('snapshot_type') == DELTA
+
+
+def removed_ranges(kept: torch.Tensor, n_rows: int) -> torch.Tensor:
+    """
+    Args:
+        kept (torch.Tensor): ascending indices of kept rows
+        n_rows (int): number of rows
+
+    Returns:
+        ranges (torch.Tensor): [start, end) of removed rows that is a Tensor of shape (#ranges, 2)
+    """
+    removed = torch.ones(n_rows + 2, dtype=torch.int8)
+    removed[0] = removed[-1] = 0
+    removed[kept + 1] = 0
+    edges = torch.nonzero(removed[1:] != removed[:-1]).reshape(-1)
+    return edges.reshape(-1, 2)
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    """Materializes a base or delta snapshot into the global model's parameters
+
+    Returns:
+        params (Dict[str, Any]): global model's parameters in the format saved by `torch.save`
+    """
+    # follow parents back to the base
+    deltas = []
+    snapshot = load_global_params(path)
+    while is_delta(snapshot):
+        deltas.append(snapshot)
+        path = os.path.join(os.path.dirname(path), snapshot['parent'])
+        snapshot = load_global_params(path)
+    params = snapshot
+    for delta in reversed(deltas):
+        n_parent = len(params['xyz'])
+        if n_parent != delta['n_parent']:
+            raise ValueError(f"a delta on {delta['parent']} expects {delta['n_parent']} rows but got {n_parent}")
+        mask = torch.ones(n_parent, dtype=torch.bool)
+        for start, end in delta['removed'].tolist():
+            mask[start:end] = False
+        params = {k: torch.cat([params[k][mask], delta['appended'][k]]) for k in GAUSSIAN_KEYS}
+        params['app_mlp'] = delta['app_mlp']
+        params['app_pos_emb'] = delta['app_pos_emb']
+    return params
+
+
+def compact_snapshot(path: str):
+    """Rewrites a delta snapshot as a base snapshot, which cuts its dependency on the older snapshots"""
+    _save(load_snapshot(path), path)
+
+
+class SnapshotWriter:
+    """Writes snapshots of a `GaussianStore` as a chain of deltas on top of a periodic full base.
+
+    A delta stores the row ranges of its parent snapshot removed since then, the rows appended
+    since then (which includes the replaced visible regions) and the appearance networks.
+
+    Args:
+        base_freq (int): every `base_freq`-th snapshot is written as a full base (1: no delta)
+        parent (str): /path/to/snapshot that matches the store's last snapshot, e.g., when resuming
+        depth (int): number of deltas between `parent` and its base
+    """
+    def __init__(self, base_freq: int=20, parent: Optional[str]=None, depth: int=0):
+        self.base_freq = max(base_freq, 1)
+        self.parent = parent
+        self.depth = depth
+
+    def save(self, global_store: GaussianStore, path: str, base: bool=False) -> bool:
+        """
+        Args:
+            base (bool): if True, the snapshot is written as a full base regardless of `base_freq`
+
+        Returns:
+            is_base (bool): True if the snapshot has been written as a base
+        """
+        # packs only store plain parameters
+        is_base = base or is_pack(path) or self.parent is None or self.depth + 1 >= self.base_freq
+        if is_base:
+            _save(global_store.to_params(), path)
+            self.depth = 0
+        else:
+            kept, new_rows = global_store.changes_since_snapshot()
+            n_parent = global_store.snapshot_size
+            _save(dict(snapshot_type=DELTA,
+                       parent=os.path.relpath(self.parent, os.path.dirname(path)),
+                       n_parent=n_parent,
+                       removed=removed_ranges(kept, n_parent),
+                       appended=global_store.gather(new_rows),
+                       app_mlp=global_store.app_mlp,
+                       app_pos_emb=global_store.app_pos_emb), path)
+            self.depth += 1
+        global_store.mark_snapshot()
+        self.parent = path
+        return is_base
@@ -0,0 +1,136 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import List
+
+import torch
+
+
+# number of bits per axis used for packing voxel coordinates into a single int64 key
+KEY_BITS = 21
+KEY_OFFSET = 1 << (KEY_BITS - 1)
+
+
+def voxel_keys(xyz: torch.Tensor, voxel_size: float) -> torch.Tensor:
+    ijk = torch.floor(xyz.double() / voxel_size).long().clamp(-KEY_OFFSET, KEY_OFFSET - 1) + KEY_OFFSET
+    return (ijk[:, 0] << (2 * KEY_BITS)) | (ijk[:, 1] << KEY_BITS) | ijk[:, 2]
+
+
+@torch.no_grad()
+def auto_voxel_size(xyz: torch.Tensor, n_cells: int=128, max_samples: int=1_000_000) -> float:
+    """Returns a voxel size that splits the robust extent of the points into `n_cells` cells"""
+    if len(xyz) > max_samples:
+        xyz = xyz[torch.randperm(len(xyz))[:max_samples]]
+    xyz = xyz.double()
+    extent = (torch.quantile(xyz, 0.99, dim=0) - torch.quantile(xyz, 0.01, dim=0)).max().item()
+    return max(extent / n_cells, 1e-6)
+
+
+@torch.no_grad()
+def frustum_planes(viewmats: torch.Tensor, projmats: torch.Tensor, far: float=100.0, bound: float=1.3) -> torch.Tensor:
+    """Half-spaces whose intersection is the region accepted by `in_frustum_mask`
+
+    Args:
+        viewmats (torch.Tensor): column-major world-to-camera matrices of shape (#cameras, 4, 4)
+        projmats (torch.Tensor): column-major full projection matrices of shape (#cameras, 4, 4)
+
+    Returns:
+        planes (torch.Tensor): coefficients (a, b, c, d) of shape (#cameras, 6, 4)
+                               meaning that a point x is inside if a*x + b*y + c*z + d >= 0 for all planes
+    """
+    P = projmats.double().transpose(1, 2)
+    V = viewmats.double().transpose(1, 2)
+    far_plane = -V[:, 2]
+    far_plane[:, 3] += far
+    return torch.stack([bound * P[:, 3] - P[:, 0],
+                        bound * P[:, 3] + P[:, 0],
+                        bound * P[:, 3] - P[:, 1],
+                        bound * P[:, 3] + P[:, 1],
+                        V[:, 2],
+                        far_plane], 1)
+
+
+class _Segment:
+    """Gaussian centers grouped by voxels in CSR layout"""
+    def __init__(self, rows: torch.Tensor, xyz: torch.Tensor, voxel_size: float):
+        keys = voxel_keys(xyz, voxel_size)
+        keys, order = torch.sort(keys, stable=True)
+        self.rows = rows[order]
+        self.keys, counts = torch.unique_consecutive(keys, return_counts=True)
+        self.indptr = torch.zeros(len(counts) + 1, dtype=torch.long)
+        self.indptr[1:] = torch.cumsum(counts, 0)
+        voxel_ids = torch.repeat_interleave(torch.arange(len(counts)), counts)[:, None].expand(-1, 3)
+        self.xyz = xyz[order]
+        # tight bounds of the centers in each voxel
+        self.lo = torch.full((len(counts), 3), float('inf'), dtype=torch.float64)
+        self.hi = torch.full((len(counts), 3), -float('inf'), dtype=torch.float64)
+        self.lo.scatter_reduce_(0, voxel_ids, self.xyz.double(), 'amin')
+        self.hi.scatter_reduce_(0, voxel_ids, self.xyz.double(), 'amax')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def query(self, planes: torch.Tensor, eps: float) -> torch.Tensor:
+        lo = self.lo - eps
+        hi = self.hi + eps
+        hit = torch.zeros(len(lo), dtype=torch.bool)
+        for cam_planes in planes:
+            # a box is outside of a half-space if its farthest corner along the normal is outside
+            normals = cam_planes[:, :3]
+            corner_max = (torch.where(normals[None] >= 0, hi[:, None], lo[:, None]) * normals[None]).sum(-1)
+            hit |= ((corner_max + cam_planes[None, :, 3]) >= 0).all(-1)
+        voxel_ids = torch.nonzero(hit).reshape(-1)
+        starts = self.indptr[voxel_ids]
+        counts = self.indptr[voxel_ids + 1] - starts
+        # expand voxel ranges into row positions
+        pos = torch.repeat_interleave(starts - torch.cumsum(counts, 0) + counts, counts) + torch.arange(int(counts.sum()))
+        return self.rows[pos]
+
+
+class VoxelIndex:
+    """Persistent voxel hash over Gaussian centers for frustum queries on CPU.
+
+    Inserted rows form a new segment, and segments are merged once there are more
+    than `max_segments`. Removed rows are not tracked: queries may return them and
+    callers are expected to filter candidates with their own tombstones.
+
+    Args:
+        voxel_size (float): edge length of a voxel
+        max_segments (int): number of segments that triggers merging
+    """
+    def __init__(self, voxel_size: float, max_segments: int=8):
+        self.voxel_size = voxel_size
+        self.max_segments = max_segments
+        self.segments: List[_Segment] = []
+
+    def __len__(self):
+        return sum(len(s) for s in self.segments)
+
+    @torch.no_grad()
+    def build(self, rows: torch.Tensor, xyz: torch.Tensor):
+        self.segments = []
+        self.insert(rows, xyz)
+
+    @torch.no_grad()
+    def insert(self, rows: torch.Tensor, xyz: torch.Tensor):
+        if len(rows) == 0:
+            return
+        self.segments.append(_Segment(rows.cpu(), xyz.detach().cpu(), self.voxel_size))
+        if len(self.segments) > self.max_segments:
+            rows = torch.cat([s.rows for s in self.segments])
+            xyz = torch.cat([s.xyz for s in self.segments])
+            self.segments = [_Segment(rows, xyz, self.voxel_size)]
+
+    @torch.no_grad()
+    def query(self, planes: torch.Tensor) -> torch.Tensor:
+        """
+        Args:
+            planes (torch.Tensor): frustum half-spaces of shape (#cameras, #planes, 4), see `frustum_planes`
+
+        Returns:
+            rows (torch.Tensor): ascending candidate rows, a superset of the rows inside of any frustum
+        """
+        eps = 1e-3 * self.voxel_size
+        candidates = [s.query(planes.cpu(), eps) for s in self.segments]
+        if len(candidates) == 0:
+            return torch.zeros(0, dtype=torch.long)
+        return torch.sort(torch.cat(candidates))[0]
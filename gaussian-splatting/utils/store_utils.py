@@ -0,0 +1,201 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import torch
+
+from .spatial_utils import VoxelIndex
+
+
+GAUSSIAN_KEYS = ('xyz', 'rotation', 'scaling', 'opacity', 'features_dc', 'features_rest')
+
+
+class GaussianStore:
+    """Chunked, append-friendly storage of the global model's Gaussians.
+
+    Gaussians are kept in a list of blocks. Removing rows only marks them in a
+    tombstone bitmap and appending rows adds a new block, so that replacing the
+    visible region of the global model costs time proportional to the visible subset.
+    Removed rows are reclaimed by `compact`, which renumbers the rows.
+    Row indices are stable between two compactions.
+    If a spatial index is given, it is kept in sync with appended and compacted rows.
+    The store also remembers which rows existed at the last snapshot (see `mark_snapshot`),
+    so that snapshots can store only the changes (see `utils.snapshot_utils`).
+
+    Args:
+        params (Dict[str, Any]): global model's parameters (the dict saved by `torch.save`)
+        compact_ratio (float): rows are compacted when the ratio of removed rows exceeds this value
+        max_blocks (int): rows are compacted when the number of blocks exceeds this value
+        index (VoxelIndex): optional spatial index over Gaussian centers
+    """
+    def __init__(self,
+                 params: Dict[str, Any],
+                 compact_ratio: float=0.5,
+                 max_blocks: int=64,
+                 index: Optional[VoxelIndex]=None):
+        self.compact_ratio = compact_ratio
+        self.max_blocks = max_blocks
+        self.index = index
+        self.app_mlp = params['app_mlp']
+        self.app_pos_emb = params['app_pos_emb']
+        self.blocks = []
+        self.offsets = []
+        self.n_rows = 0
+        self.n_removed = 0
+        self._alive = torch.zeros(0, dtype=torch.bool)
+        # index of each row in the last snapshot (-1 for rows appended after it)
+        self._origin = torch.zeros(0, dtype=torch.long)
+        # number of rows in the last snapshot
+        self.snapshot_size = 0
+        self.append({k: params[k] for k in GAUSSIAN_KEYS})
+
+    def __len__(self):
+        return self.n_rows - self.n_removed
+
+    @property
+    def alive(self) -> torch.Tensor:
+        """Returns a bool Tensor of shape (#rows,) that is False for removed rows"""
+        return self._alive[:self.n_rows]
+
+    def iter_blocks(self) -> Iterator[Tuple[int, Dict[str, torch.Tensor], torch.Tensor]]:
+        """Yields (first row index, attributes, alive mask) of each block"""
+        for offset, block in zip(self.offsets, self.blocks):
+            yield offset, block, self._alive[offset:offset + len(block['xyz'])]
+
+    @torch.no_grad()
+    def append(self, params: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Appends Gaussians as a new block
+
+        Returns:
+            rows (torch.Tensor): indices of appended rows that is a Tensor of shape (#appended points,)
+        """
+        n = len(params['xyz'])
+        start = self.n_rows
+        if n == 0:
+            return torch.arange(start, start)
+        self.blocks.append({k: params[k].detach().cpu().contiguous() for k in GAUSSIAN_KEYS})
+        self.offsets.append(start)
+        if start + n > len(self._alive):
+            # grow the bitmap geometrically to keep appending amortized O(n)
+            alive = torch.zeros(max(start + n, 2 * len(self._alive)), dtype=torch.bool)
+            alive[:start] = self._alive[:start]
+            self._alive = alive
+            origin = torch.zeros(len(alive), dtype=torch.long)
+            origin[:start] = self._origin[:start]
+            self._origin = origin
+        self._alive[start:start + n] = True
+        self._origin[start:start + n] = -1
+        self.n_rows += n
+        rows = torch.arange(start, self.n_rows)
+        if self.index is not None:
+            self.index.insert(rows, self.blocks[-1]['xyz'])
+        return rows
+
+    @torch.no_grad()
+    def remove(self, rows: torch.Tensor):
+        """Marks rows as removed"""
+        self.n_removed += int(self._alive[rows].sum())
+        self._alive[rows] = False
+
+    @torch.no_grad()
+    def select(self, mask_fn: Callable[[torch.Tensor], torch.Tensor]) -> torch.Tensor:
+        """
+        Args:
+            mask_fn (Callable): function that takes Gaussian centers of shape (#points, 3)
+                                and returns a bool Tensor of shape (#points,)
+
+        Returns:
+            rows (torch.Tensor): ascending indices of live rows where `mask_fn` is True
+        """
+        rows = []
+        for offset, block, alive in self.iter_blocks():
+            mask = mask_fn(block['xyz']).to(alive.device) & alive
+            rows.append(torch.nonzero(mask).reshape(-1) + offset)
+        if len(rows) == 0:
+            return torch.zeros(0, dtype=torch.long)
+        return torch.cat(rows)
+
+    @torch.no_grad()
+    def gather(self, rows: torch.Tensor, keys: Sequence[str]=GAUSSIAN_KEYS) -> Dict[str, torch.Tensor]:
+        """
+        Args:
+            rows (torch.Tensor): ascending row indices
+            keys (Sequence[str]): attributes to gather
+
+        Returns:
+            params (Dict[str, torch.Tensor]): attributes of the given rows
+        """
+        if len(rows) == 0:
+            return {k: self.blocks[0][k][:0] for k in keys}
+        offsets = torch.tensor(self.offsets, dtype=torch.long)
+        block_ids = torch.searchsorted(offsets, rows, right=True) - 1
+        pieces = {k: [] for k in keys}
+        for b in torch.unique_consecutive(block_ids).tolist():
+            local = rows[block_ids == b] - self.offsets[b]
+            for k in keys:
+                pieces[k].append(self.blocks[b][k].index_select(0, local))
+        return {k: torch.cat(v) for k, v in pieces.items()}
+
+    def needs_compaction(self) -> bool:
+        return (self.n_removed > self.compact_ratio * self.n_rows
+                or len(self.blocks) > self.max_blocks)
+
+    @torch.no_grad()
+    def compact(self, force: bool=False) -> bool:
+        """Drops removed rows and merges all blocks into one
+
+        Returns:
+            compacted (bool): True if rows have been renumbered
+        """
+        if not (force or self.needs_compaction()):
+            return False
+        masks = [alive for _, _, alive in self.iter_blocks()]
+        block = {}
+        for k in GAUSSIAN_KEYS:
+            # merge attribute by attribute to keep the peak memory low
+            block[k] = torch.cat([b[k][alive] for b, alive in zip(self.blocks, masks)])
+            for b in self.blocks:
+                b[k] = None
+        n = len(block['xyz'])
+        self._origin = self._origin[:self.n_rows][self.alive]
+        self.blocks = [block]
+        self.offsets = [0]
+        self.n_rows = n
+        self.n_removed = 0
+        self._alive = torch.ones(n, dtype=torch.bool)
+        if self.index is not None:
+            self.index.build(torch.arange(n), block['xyz'])
+        return True
+
+    def mark_snapshot(self):
+        """Records that the live rows have been saved as a snapshot in their current order"""
+        origin = torch.full((self.n_rows,), -1, dtype=torch.long)
+        origin[self.alive] = torch.arange(len(self))
+        self._origin[:self.n_rows] = origin
+        self.snapshot_size = len(self)
+
+    def changes_since_snapshot(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Live rows are always ordered as the surviving rows of the last snapshot
+        followed by the rows appended after it, because compaction keeps the order of rows.
+
+        Returns:
+            kept (torch.Tensor): ascending indices in the last snapshot of its surviving rows
+            new_rows (torch.Tensor): ascending live rows appended after the last snapshot
+        """
+        origin = self._origin[:self.n_rows]
+        kept = origin[self.alive & (origin >= 0)]
+        new_rows = torch.nonzero(self.alive & (origin < 0)).reshape(-1)
+        return kept, new_rows
+
+    @torch.no_grad()
+    def to_params(self) -> Dict[str, Any]:
+        """Returns the global model's parameters in the format saved by `torch.save`"""
+        if len(self.blocks) == 1 and self.n_removed == 0:
+            params = dict(self.blocks[0])
+        else:
+            params = {k: torch.cat([b[k][alive] for _, b, alive in self.iter_blocks()])
+                      for k in GAUSSIAN_KEYS}
+        params['app_mlp'] = self.app_mlp
+        params['app_pos_emb'] = self.app_pos_emb
+        return params
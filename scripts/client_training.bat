@@ -48,7 +48,8 @@ for /L %%i in (%START_IDX%, 1, %END_IDX%) do (
 
     :: Step 2: Run Gaussian Splatting Training
     echo Running training...
-    python gaussian-splatting\train.py -s "!CUR_COLMAP_DIR!" -i "!RGBS_DIR!" -w -m "!CUR_OUTPUT_DIR!" 
+    :: resized images are cached on disk and reused by the following clients
+    python gaussian-splatting\train.py -s "!CUR_COLMAP_DIR!" -i "!RGBS_DIR!" -w -m "!CUR_OUTPUT_DIR!" --image_cache_dir "!OUTPUT_DIR!\image_cache" 
     ::--iterations 3000 -r 2
     :: --iterations 3000 : 将迭代次数限制为 3000 (默认通常是 30000)
     :: -r 2              : 对图像进行 2 倍下采样训练 (分辨率变小，速度变快)
@@ -8,5 +8,6 @@ OUTPUT_DIR=$6
 
 for i in `seq -f '%05g' $1 $2`; do
     bash tools/triangulate_colmap.sh $COLMAP_RESULTS_DIR/$i $DATASET_ROOT/train $IMAGE_LIST_DIR/$i.txt
-    python gaussian-splatting/train.py -s $COLMAP_RESULTS_DIR/$i -i $DATASET_ROOT/train/rgbs -w -m $OUTPUT_DIR/$i
+    # resized images are cached on disk and reused by the following clients
+    python gaussian-splatting/train.py -s $COLMAP_RESULTS_DIR/$i -i $DATASET_ROOT/train/rgbs -w -m $OUTPUT_DIR/$i --image_cache_dir $OUTPUT_DIR/image_cache
 done
@@ -53,7 +53,8 @@ for /L %%i in (%START_IDX%, 1, %END_IDX%) do (
 
     :: Step 2: Run Gaussian Splatting Training
     echo Running training...
-    python gaussian-splatting\train.py -s "!CUR_COLMAP_DIR!" -i "!RGBS_DIR!" -w -m "!CUR_OUTPUT_DIR!" 
+    :: resized images are cached on disk and reused by the following clients
+    python gaussian-splatting\train.py -s "!CUR_COLMAP_DIR!" -i "!RGBS_DIR!" -w -m "!CUR_OUTPUT_DIR!" --image_cache_dir "!OUTPUT_DIR!\image_cache" 
     if errorlevel 1 (
         echo [ERROR] Training failed for sequence !SEQ_ID!
     )
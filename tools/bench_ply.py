@@ -0,0 +1,92 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""Benchmark of saving and loading Gaussian models as ply files
+
+The chunked writer `utils.ply_utils.write_gaussian_ply` is compared with the previous
+implementation that builds a tuple per Gaussian and writes it with `plyfile`, which is
+only run up to `--reference-max` Gaussians as it takes minutes for larger models.
+
+Usage:
+    python tools/bench_ply.py --n-gaussians 1000000 2000000 5000000 10000000
+"""
+import os
+import sys
+import time
+import filecmp
+import argparse
+import tempfile
+
+import numpy as np
+import torch
+
+from plyfile import PlyData, PlyElement
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
+from utils.ply_utils import ply_attributes, read_gaussian_ply, write_gaussian_ply
+
+
+def random_params(n_gaussians: int, sh_degree: int, generator: torch.Generator):
+    n_rest = (sh_degree + 1) ** 2 - 1
+    return dict(xyz=torch.randn(n_gaussians, 3, generator=generator),
+                features_dc=torch.randn(n_gaussians, 1, 3, generator=generator),
+                features_rest=torch.randn(n_gaussians, n_rest, 3, generator=generator),
+                opacity=torch.randn(n_gaussians, 1, generator=generator),
+                scaling=torch.randn(n_gaussians, 3, generator=generator),
+                rotation=torch.randn(n_gaussians, 4, generator=generator))
+
+
+def reference_write(path, params):
+    """Reference implementation as it was done in `GaussianModel.save_ply`"""
+    xyz = params['xyz'].detach().cpu().numpy()
+    normals = np.zeros_like(xyz)
+    f_dc = params['features_dc'].detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
+    f_rest = params['features_rest'].detach().transpose(1, 2).flatten(start_dim=1).contiguous().cpu().numpy()
+    opacities = params['opacity'].detach().cpu().numpy()
+    scale = params['scaling'].detach().cpu().numpy()
+    rotation = params['rotation'].detach().cpu().numpy()
+
+    dtype_full = [(attribute, 'f4') for attribute in ply_attributes(params)]
+
+    elements = np.empty(xyz.shape[0], dtype=dtype_full)
+    attributes = np.concatenate((xyz, normals, f_dc, f_rest, opacities, scale, rotation), axis=1)
+    elements[:] = list(map(tuple, attributes))
+    el = PlyElement.describe(elements, 'vertex')
+    PlyData([el]).write(path)
+
+
+def timeit(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(args):
+    generator = torch.Generator().manual_seed(args.seed)
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp_dir:
+        path = os.path.join(tmp_dir, 'point_cloud.ply')
+        ref_path = os.path.join(tmp_dir, 'reference.ply')
+        for n_gaussians in args.n_gaussians:
+            params = random_params(n_gaussians, args.sh_degree, generator)
+            t = timeit(lambda: write_gaussian_ply(path, params))
+            size = os.path.getsize(path) / (1 << 20)
+            print(f'{n_gaussians:>10d} Gaussians: {t:7.2f} sec ({n_gaussians / t / 1e6:.2f} M Gaussians/sec, {size / t:.0f} MB/sec)')
+            t_read = timeit(lambda: read_gaussian_ply(path, args.sh_degree))
+            print(f'{"":>10s} load      : {t_read:7.2f} sec ({size / t_read:.0f} MB/sec)')
+            if n_gaussians <= args.reference_max:
+                t_ref = timeit(lambda: reference_write(ref_path, params))
+                assert filecmp.cmp(path, ref_path, shallow=False), 'the file differs from the reference'
+                print(f'{"":>10s} reference : {t_ref:7.2f} sec (x{t_ref / t:.1f})')
+            del params
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n-gaussians', default=[1_000_000, 2_000_000, 5_000_000, 10_000_000], type=int, nargs='+')
+    parser.add_argument('--sh-degree', default=2, type=int)
+    parser.add_argument('--reference-max', default=1_000_000, type=int,
+                        help='the reference implementation is run only for models up to this size')
+    parser.add_argument('--tmp-dir', default=None, type=str,
+                        help='directory to write ply files (default: system temporary directory)')
+    parser.add_argument('--seed', default=0, type=int)
+    args = parser.parse_args()
+    main(args)
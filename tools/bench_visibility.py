@@ -0,0 +1,86 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""Microbenchmark of the batched frustum culling against the per-camera loop
+
+Usage:
+    python tools/bench_visibility.py --n-points 1000000 --n-cameras 200
+"""
+import os
+import sys
+import time
+import math
+import argparse
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
+from utils.frustum_utils import compute_projection, in_frustum_mask, frustum_visibility
+
+
+def random_cameras(n_cameras: int, radius: float, generator: torch.Generator):
+    """Cameras on a sphere looking at random points around the origin"""
+    viewmats = []
+    for _ in range(n_cameras):
+        center = torch.randn(3, generator=generator)
+        center = center / center.norm() * radius
+        forward = torch.randn(3, generator=generator) * radius * 0.2 - center
+        forward = forward / forward.norm()
+        right = torch.linalg.cross(forward, torch.tensor([0., 0., 1.]))
+        right = right / right.norm()
+        down = torch.linalg.cross(forward, right)
+        R = torch.stack([right, down, forward])  # world-to-camera rotation
+        w2c = torch.eye(4)
+        w2c[:3, :3] = R
+        w2c[:3, 3] = - R @ center
+        viewmats.append(w2c.T)  # column-major
+    viewmats = torch.stack(viewmats)
+    fov = math.radians(60)
+    projmats = torch.stack([compute_projection(fov, fov, viewmat) for viewmat in viewmats])
+    return viewmats, projmats
+
+
+def loop_visibility(points, viewmats, projmats, far):
+    """Reference implementation as it was done before batching"""
+    masks = [in_frustum_mask(points, viewmat, projmat, far) for viewmat, projmat in zip(viewmats, projmats)]
+    counts = torch.stack([m.sum() for m in masks])
+    return counts, sum(masks).bool()
+
+
+def timeit(fn, n_repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(n_repeat):
+        out = fn()
+    return (time.perf_counter() - start) / n_repeat, out
+
+
+def main(args):
+    if args.n_threads > 0:
+        torch.set_num_threads(args.n_threads)
+    generator = torch.Generator().manual_seed(args.seed)
+    points = torch.randn(args.n_points, 3, generator=generator) * args.radius * 0.5
+    viewmats, projmats = random_cameras(args.n_cameras, args.radius, generator)
+
+    t_loop, (counts_ref, mask_ref) = timeit(lambda: loop_visibility(points, viewmats, projmats, args.far), args.n_repeat)
+    print(f'loop   : {t_loop * 1e3:9.2f} ms')
+    for chunk_size in args.chunk_sizes:
+        t, (counts, mask) = timeit(lambda: frustum_visibility(points, viewmats, projmats, args.far,
+                                                              chunk_size=chunk_size), args.n_repeat)
+        assert torch.equal(counts, counts_ref) and torch.equal(mask, mask_ref), 'results differ from the loop'
+        print(f'batched: {t * 1e3:9.2f} ms (chunk size: {chunk_size}, x{t_loop / t:.2f})')
+    print(f'{int(mask_ref.sum())} / {args.n_points} points are visible')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n-points', default=1_000_000, type=int)
+    parser.add_argument('--n-cameras', default=100, type=int)
+    parser.add_argument('--radius', default=50.0, type=float)
+    parser.add_argument('--far', default=100.0, type=float)
+    parser.add_argument('--chunk-sizes', default=[1 << 20, 1 << 22, 1 << 24], type=int, nargs='+')
+    parser.add_argument('--n-repeat', default=3, type=int)
+    parser.add_argument('--n-threads', default=0, type=int,
+                        help='number of torch threads (0: torch default)')
+    parser.add_argument('--seed', default=0, type=int)
+    args = parser.parse_args()
+    main(args)
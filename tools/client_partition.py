@@ -0,0 +1,145 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""Spatial partitioner of training images into clients
+
+A client is the `n_data` cameras nearest to a randomly chosen base camera.
+`ClientPartitioner` builds a KD-tree over the camera centers once (scipy's cKDTree if it is installed)
+and answers the k-nearest queries of many clients in a batch, instead of sorting the distances
+to all cameras for every client. Without scipy, the queries are answered by a batched `argpartition`.
+
+The random numbers are drawn in the same order as the per-client loop of `tools/gen_client_data*.py`,
+so a seed gives the same clients as before, whichever backend answers the queries.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+    SCIPY_FOUND = True
+except ImportError:
+    SCIPY_FOUND = False
+
+
+# upper bound of the number of distances computed at once by the argpartition backend
+MAX_DISTANCES = 1 << 24
+
+
+class ClientPartitioner:
+    def __init__(self, c2ws: np.ndarray, use_kdtree: bool=True):
+        """
+        Args:
+            c2ws (np.ndarray): camera extrinsic (camera2world) that is
+                               an ndarray of shape (#cameras, 3, 4)
+            use_kdtree (bool): if False, a KD-tree is not built even if scipy is installed
+        """
+        self.centers = np.ascontiguousarray(c2ws[:, :3, -1]) # (#cameras, 3)
+        self.tree = cKDTree(self.centers) if use_kdtree and SCIPY_FOUND else None
+
+    @property
+    def n_cameras(self) -> int:
+        return len(self.centers)
+
+    def _candidates(self, base_indices: np.ndarray, k: int) -> np.ndarray:
+        """Returns (a superset of) the k nearest cameras of each base camera of shape (#bases, >=k)"""
+        if self.tree is not None:
+            # one more neighbor than needed, so that a tie at the k-th distance is resolved by `query`
+            k = min(k + 1, self.n_cameras)
+            _, candidates = self.tree.query(self.centers[base_indices], k=k, workers=-1)
+            return candidates.reshape(len(base_indices), k)
+        chunk_size = max(1, MAX_DISTANCES // self.n_cameras)
+        candidates = []
+        for start in range(0, len(base_indices), chunk_size):
+            centers = self.centers[base_indices[start:start + chunk_size]]
+            dists = np.sum(np.square(self.centers[None] - centers[:, None]), -1)
+            if k < self.n_cameras:
+                candidates.append(np.argpartition(dists, k - 1, axis=1)[:, :k])
+            else:
+                candidates.append(np.broadcast_to(np.arange(self.n_cameras), dists.shape))
+        return np.concatenate(candidates)
+
+    def query(self, base_indices: np.ndarray, n_datas: np.ndarray) -> List[np.ndarray]:
+        """
+        Args:
+            base_indices (np.ndarray): base camera of each client
+            n_datas (np.ndarray): number of data of each client
+
+        Returns:
+            indices (List[np.ndarray]): sorted data indices of each client, i.e.,
+                                        the `n_datas[i]` cameras nearest to `base_indices[i]`
+        """
+        base_indices = np.asarray(base_indices, dtype=np.int64)
+        n_datas = np.minimum(np.asarray(n_datas, dtype=np.int64), self.n_cameras)
+        if len(base_indices) == 0 or n_datas.max() <= 0:
+            return [np.empty(0, dtype=np.int64) for _ in range(len(base_indices))]
+        candidates = self._candidates(base_indices, int(n_datas.max()))
+        # exact distances of the candidates in the precision of the cameras, as the full argsort used
+        dists = np.sum(np.square(self.centers[candidates] - self.centers[base_indices][:, None]), -1)
+        indices = []
+        for cands, d, n_data in zip(candidates, dists, n_datas):
+            # nearest first, ties broken by the camera index
+            order = np.lexsort((cands, d))[:n_data]
+            indices.append(np.sort(cands[order]))
+        return indices
+
+
+def sample_clients(n_clients: int, n_cameras: int, n_data_min: int, n_data_max: int,
+                   max_data: Optional[int]=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Draws the number of data and the base camera of clients from `np.random`
+
+    The draws are interleaved per client as in the original loop of `tools/gen_client_data*.py`.
+
+    Args:
+        max_data (int): if set, the number of data is clipped to it and the base camera is not drawn
+                        for a client without data, as in `tools/gen_client_data_with_pointclouds.py`
+
+    Returns:
+        n_datas (np.ndarray): number of data of each client
+        base_indices (np.ndarray): base camera of each client (0 for a client without data if `max_data` is set)
+    """
+    n_datas = np.zeros(n_clients, dtype=np.int64)
+    base_indices = np.zeros(n_clients, dtype=np.int64)
+    for i in range(n_clients):
+        n_data = np.random.randint(n_data_min, n_data_max + 1)
+        if max_data is not None:
+            n_data = min(n_data, max_data)
+            if n_data <= 0:
+                continue
+        n_datas[i] = n_data
+        base_indices[i] = np.random.randint(0, n_cameras)
+    return n_datas, base_indices
+
+
+def gen_clients_data(c2ws: np.ndarray, n_clients: int, n_data_min: int, n_data_max: int) -> List[np.ndarray]:
+    """
+    Args:
+        c2ws (np.ndarray): camera extrinsic (camera2world) that is
+                           an ndarray of shape (#cameras, 3, 4).
+                           the coordinate system is following mega-nerf,
+                           i.e., (down, right, backward)
+        n_clients (int): number of clients
+        n_data_min (int): minimum number of data for a client
+        n_data_max (int): maximum number of data for a client
+
+    Returns:
+        indices (List[np.ndarray]): data indices of each client
+    """
+    partitioner = ClientPartitioner(c2ws)
+    n_datas, base_indices = sample_clients(n_clients, partitioner.n_cameras, n_data_min, n_data_max)
+    return partitioner.query(base_indices, n_datas)
+
+
+def gen_client_data(c2ws: np.ndarray, n_data: int) -> np.ndarray:
+    """
+    Args:
+        c2ws (np.ndarray): camera extrinsic (camera2world) that is
+                        an ndarray of shape (#cameras, 3, 4).
+                        the coordinate system is following mega-nerf,
+                        i.e., (down, right, backward)
+        n_data (int): a number of data for a client
+
+    Returns:
+        indices (np.ndarray): client's data indices
+    """
+    base_camera_idx = np.random.randint(0, c2ws.shape[0])
+    return ClientPartitioner(c2ws, use_kdtree=False).query([base_camera_idx], [n_data])[0]
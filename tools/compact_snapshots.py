@@ -0,0 +1,60 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""Rewrites delta snapshots of `build_global_model.py` as full snapshots
+
+Snapshots `global_model_{n}clients.pth` and `resume_{n}clients.pth` may only store changes from the
+previous snapshot (see `--resume-freq` and `--base-freq` of `build_global_model.py`). This script
+materializes a snapshot so that it no longer depends on older ones, and optionally removes the older snapshots.
+
+Usage:
+    # compact the latest snapshot
+    python tools/compact_snapshots.py -o /path/to/output-dir
+    # compact a given snapshot and remove the older ones
+    python tools/compact_snapshots.py -o /path/to/output-dir -s global_model_120clients.pth --prune
+"""
+import os
+import re
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
+from utils.snapshot_utils import compact_snapshot
+
+
+SNAPSHOT_PATTERN = re.compile(r'(?:global_model|resume)_(\d+)clients\.pth$')
+
+
+def list_snapshots(output_dir: str):
+    """Returns snapshot filenames sorted by the number of aggregated clients"""
+    fnames = [f for f in os.listdir(output_dir) if SNAPSHOT_PATTERN.match(f)]
+    return sorted(fnames, key=lambda f: int(SNAPSHOT_PATTERN.match(f).group(1)))
+
+
+def main(args):
+    snapshots = list_snapshots(args.output_dir)
+    if len(snapshots) == 0:
+        print(f'no snapshot is found in {args.output_dir}')
+        return
+    target = args.snapshot if args.snapshot is not None else snapshots[-1]
+    if target not in snapshots:
+        raise FileNotFoundError(f'{target} is not found in {args.output_dir}')
+    print(f'compact {target}')
+    compact_snapshot(os.path.join(args.output_dir, target))
+    if args.prune:
+        # deltas only depend on older snapshots, so the older ones are no longer needed
+        older = snapshots[:snapshots.index(target)]
+        for fname in older:
+            os.remove(os.path.join(args.output_dir, fname))
+        print(f'removed {len(older)} snapshots')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output-dir', '-o', required=True, type=str,
+                        help='/path/to/output-dir of build_global_model.py')
+    parser.add_argument('--snapshot', '-s', default=None, type=str,
+                        help='filename of the snapshot to compact (default: the latest one)')
+    parser.add_argument('--prune', action='store_true',
+                        help='if True, remove the snapshots (including resume ones) older than the compacted one')
+    args = parser.parse_args()
+    main(args)
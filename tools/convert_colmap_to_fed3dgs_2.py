@@ -8,78 +8,82 @@
 
 示例:
     python tools/convert_colmap_to_fed3dgs_2.py -i "D:\githubdownloads\Fed3DGS_data\pixsfm\train" -o "D:\githubdownloads\Fed3DGS_data\pixsfm\train-converted"
+
+图像由进程池并行放置（JPEG源图像用reflink/硬链接，见 image_staging.py），已是最新的输出会被跳过，
+所以中断后重新运行只处理剩下的图像。metadata默认直接写入 train/metadata.pack 和 val/metadata.pack
+（--metadata-format pt 时按图像保存为 metadata/*.pt）。
 """
 
 import os
 import sys
-import shutil
 import argparse
 from pathlib import Path
-from PIL import Image
 import numpy as np
 import torch
 from tqdm import tqdm
 
 # 添加路径以便导入
+sys.path.insert(0, os.path.dirname(__file__))
+from image_staging import LINK_MODES, stage_images
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
 # 类型检查器无法解析动态添加的路径，但运行时是正确的，所以添加 type: ignore 注释
 from scene.colmap_loader import (  # type: ignore
     read_extrinsics_binary, read_intrinsics_binary,
-    read_extrinsics_text, read_intrinsics_text,
-    qvec2rotmat
+    read_extrinsics_text, read_intrinsics_text
 )
-
-# 坐标系转换矩阵 (Mega-NeRF格式)
-RDF_TO_DRB = torch.Tensor([[0, 1, 0],
-                           [1, 0, 0],
-                           [0, 0, -1]])
+from utils.pose_utils import qvecs_to_rotmats, invert_extrinsics, colmap_to_meganerf  # type: ignore
+from utils.metadata_utils import metadata_pack_path, pack_metadatas  # type: ignore
+from utils.pack_utils import read_pack  # type: ignore
 
 
-def w2c_to_c2w(R, T):
-    """将world-to-camera转换为camera-to-world"""
-    # R是旋转矩阵，T是平移向量
-    # w2c = [R | T]
-    # c2w = w2c^-1 = [R^T | -R^T @ T]
-    R_inv = R.T
-    T_inv = -R_inv @ T.reshape(3, 1)
-    c2w = np.hstack([R_inv, T_inv])
-    return c2w
+def is_metadata_pack_up_to_date(pack_path, names, model_mtime):
+    """pack存在、包含相同的图像且比COLMAP模型新时返回True"""
+    if not os.path.exists(pack_path) or os.path.getmtime(pack_path) < model_mtime:
+        return False
+    _, attrs = read_pack(pack_path)
+    return attrs.get('names') == sorted(names)
 
 
-def colmap_to_meganerf_c2w(c2w_colmap):
+def save_metadatas(metadatas, split_dir, metadata_format, model_mtime, force=False):
     """
-    将COLMAP格式的c2w转换为Mega-NeRF格式
-    
-    这是create_db.py中转换的逆过程：
-    create_db.py: Mega-NeRF c2w → COLMAP w2c
-    这里: COLMAP c2w → Mega-NeRF c2w
+    保存一个split的metadata，比COLMAP模型新的输出被跳过
+
+    Returns:
+        保存的文件数
     """
-    c2w = torch.from_numpy(c2w_colmap).float()
-    
-    # 步骤1: 应用RDF_TO_DRB坐标系转换 (create_db.py第71行的逆变换)
-    # create_db.py: RDF_TO_DRB.inverse() @ c2w[:3, :3] @ RDF_TO_DRB
-    # 逆变换: RDF_TO_DRB @ c2w[:3, :3] @ RDF_TO_DRB.inverse()
-    c2w_rot = RDF_TO_DRB @ c2w[:3, :3] @ RDF_TO_DRB.inverse()
-    c2w_trans = RDF_TO_DRB @ c2w[:3, 3:]
-    c2w_transformed = torch.cat([c2w_rot, c2w_trans], -1)
-    
-    # 步骤2: 应用列交换 (create_db.py第69行的逆变换)
-    # create_db.py: torch.cat([-c2w[:, 1:2], c2w[:, :1], c2w[:, 2:]], 1)
-    # 逆变换: torch.cat([c2w[:, 1:2], -c2w[:, 0:1], c2w[:, 2:]], 1)
-    c2w_meganerf = torch.cat([c2w_transformed[:, 1:2], 
-                              -c2w_transformed[:, 0:1], 
-                              c2w_transformed[:, 2:]], 1)
-    
-    return c2w_meganerf.numpy()
+    pack_path = metadata_pack_path(str(split_dir))
+    if metadata_format == 'pack':
+        if not force and is_metadata_pack_up_to_date(pack_path, list(metadatas), model_mtime):
+            return 0
+        pack_metadatas(metadatas, pack_path)
+        return 1
+    # load_metadatas优先读取pack，删除旧的pack以免读到过期的metadata
+    if os.path.exists(pack_path):
+        print(f"  删除旧的metadata pack: {pack_path}")
+        os.remove(pack_path)
+    metadata_dir = Path(split_dir) / "metadata"
+    metadata_dir.mkdir(parents=True, exist_ok=True)
+    n_saved = 0
+    for name, metadata in metadatas.items():
+        metadata_file = metadata_dir / f"{name}.pt"
+        if not force and metadata_file.exists() and metadata_file.stat().st_mtime >= model_mtime:
+            continue
+        torch.save(metadata, metadata_file)
+        n_saved += 1
+    return n_saved
 
 
-def convert_colmap_to_fed3dgs(colmap_dir, output_dir):
+def convert_colmap_to_fed3dgs(colmap_dir, output_dir, workers=None, link_mode='auto', metadata_format='pack', force=False):
     """
     将COLMAP格式数据集转换为Fed3DGS格式
     
     Args:
         colmap_dir: COLMAP数据集目录（包含images/和sparse/0/）
-        output_dir: 输出目录（将创建train/metadata/和train/rgbs/）
+        output_dir: 输出目录（将创建train/rgbs/和train/metadata.pack（或train/metadata/））
+        workers: 并行放置图像的进程数（默认: CPU核数）
+        link_mode: JPEG图像的放置方法，见 image_staging.link_or_copy
+        metadata_format: 'pack'=写入metadata.pack, 'pt'=按图像保存为metadata/*.pt
+        force: 为True时不跳过已是最新的输出
     """
     colmap_dir = Path(colmap_dir)
     output_dir = Path(output_dir)
@@ -94,13 +98,11 @@ def convert_colmap_to_fed3dgs(colmap_dir, output_dir):
         raise FileNotFoundError(f"图像目录不存在: {images_dir}")
     
     # 创建输出目录
-    train_metadata_dir = output_dir / "train" / "metadata"
-    train_rgbs_dir = output_dir / "train" / "rgbs"
-    val_metadata_dir = output_dir / "val" / "metadata"
-    val_rgbs_dir = output_dir / "val" / "rgbs"
-    train_metadata_dir.mkdir(parents=True, exist_ok=True)
+    train_dir = output_dir / "train"
+    val_dir = output_dir / "val"
+    train_rgbs_dir = train_dir / "rgbs"
+    val_rgbs_dir = val_dir / "rgbs"
     train_rgbs_dir.mkdir(parents=True, exist_ok=True)
-    val_metadata_dir.mkdir(parents=True, exist_ok=True)
     val_rgbs_dir.mkdir(parents=True, exist_ok=True)
     
     # 读取COLMAP数据
@@ -120,19 +122,34 @@ def convert_colmap_to_fed3dgs(colmap_dir, output_dir):
         print(f"  成功读取文本格式")
     
     print(f"  找到 {len(cam_extrinsics)} 个相机")
+    # 比COLMAP模型新的metadata视为最新
+    model_mtime = max(cameras_extrinsic_file.stat().st_mtime, cameras_intrinsic_file.stat().st_mtime)
     
     # 按图像名称排序
     sorted_images = sorted(cam_extrinsics.items(), key=lambda x: x[1].name)
     
     # 转换每个图像
-    print("\n转换相机参数和复制图像...")
+    print("\n转换相机参数...")
     print("  将每8张图像中的1张作为验证集（与readColmapSceneInfo的llffhold=8一致）")
-    mappings = []
+    train_metadatas = {}
+    val_metadatas = {}
+    # 图像的放置任务，由进程池处理
+    image_tasks = []
     
     # 收集所有c2w用于计算coordinates.pt
     all_c2ws = []
     
-    for idx, (image_id, extr) in enumerate(tqdm(sorted_images, desc="处理图像")):
+    # 一次性转换所有相机的c2w
+    qvecs = np.array([extr.qvec for _, extr in sorted_images], dtype=np.float64).reshape(-1, 4)
+    tvecs = np.array([extr.tvec for _, extr in sorted_images], dtype=np.float64).reshape(-1, 3)
+    R = np.swapaxes(qvecs_to_rotmats(qvecs), -1, -2)  # world-to-camera旋转矩阵
+    T = tvecs  # world-to-camera平移向量
+    # 转换为camera-to-world，再转换为Mega-NeRF格式
+    # (COLMAP: w2c = [R | T]  ->  c2w = w2c^-1 = [R^T | -R^T @ T])
+    c2ws_colmap = invert_extrinsics(torch.from_numpy(np.concatenate([R, T[..., None]], -1)))
+    c2ws_meganerf = colmap_to_meganerf(c2ws_colmap.float()).numpy()
+    
+    for idx, (image_id, extr) in enumerate(tqdm(sorted_images, desc="转换相机参数")):
         # 获取相机内参
         intr = cam_intrinsics[extr.camera_id]
         
@@ -152,15 +169,8 @@ def convert_colmap_to_fed3dgs(colmap_dir, output_dir):
         width = intr.width
         height = intr.height
         
-        # 将qvec/tvec转换为c2w
-        R = np.transpose(qvec2rotmat(extr.qvec))  # world-to-camera旋转矩阵
-        T = np.array(extr.tvec)  # world-to-camera平移向量
-        
-        # 转换为camera-to-world
-        c2w_colmap = w2c_to_c2w(R, T)
-        
-        # 转换为Mega-NeRF格式的c2w
-        c2w_meganerf = colmap_to_meganerf_c2w(c2w_colmap)
+        # Mega-NeRF格式的c2w（复制一份，保存的metadata只包含这个相机）
+        c2w_meganerf = c2ws_meganerf[idx].copy()
         
         # 收集c2w用于计算coordinates.pt
         all_c2ws.append(c2w_meganerf)
@@ -177,43 +187,36 @@ def convert_colmap_to_fed3dgs(colmap_dir, output_dir):
         is_val = (idx % 8 == 0)
         
         # 生成文件名（使用6位数字，从000000开始）
-        image_name_base = Path(extr.name).stem
         new_index = f"{idx:06d}"
         
         # 选择输出目录
         if is_val:
-            metadata_file = val_metadata_dir / f"{new_index}.pt"
+            val_metadatas[new_index] = metadata
             dest_image_dir = val_rgbs_dir
         else:
-            metadata_file = train_metadata_dir / f"{new_index}.pt"
+            train_metadatas[new_index] = metadata
             dest_image_dir = train_rgbs_dir
         
-        # 保存metadata
-        torch.save(metadata, metadata_file)
-        
-        # 复制图像
-        source_image = images_dir / extr.name
-        if not source_image.exists():
-            # 尝试不同的扩展名
-            for ext in ['.jpg', '.JPG', '.png', '.PNG', '.jpeg', '.JPEG']:
-                alt_source = images_dir / f"{Path(extr.name).stem}{ext}"
-                if alt_source.exists():
-                    source_image = alt_source
-                    break
-        
-        if source_image.exists():
-            dest_image = dest_image_dir / f"{new_index}.jpg"
-            # 如果是jpg，直接复制；否则转换
-            if source_image.suffix.lower() in ['.jpg', '.jpeg']:
-                shutil.copy2(source_image, dest_image)
-            else:
-                img = Image.open(source_image).convert('RGB')
-                img.save(dest_image, 'JPEG', quality=95)
-            
-            # 记录映射
-            mappings.append(f"{extr.name},{new_index}.pt")
+        image_tasks.append((len(image_tasks), str(images_dir), extr.name,
+                            str(dest_image_dir / f"{new_index}.jpg"), link_mode, force))
+    
+    # 保存metadata
+    print("\n保存metadata...")
+    n_saved = (save_metadatas(train_metadatas, train_dir, metadata_format, model_mtime, force)
+               + save_metadatas(val_metadatas, val_dir, metadata_format, model_mtime, force))
+    print(f"  保存 {n_saved} 个文件（其余已是最新）")
+    
+    # 并行放置图像（JPEG用reflink/硬链接，其他格式转换为JPEG）
+    print("\n放置图像...")
+    statuses, counts = stage_images(image_tasks, workers)
+    print("  " + ", ".join(f"{status}: {n}" for status, n in sorted(counts.items())))
+    mappings = []
+    for (_, _, name, dest_image, _, _), status in zip(image_tasks, statuses):
+        if status == 'missing':
+            print(f"\n警告: 图像文件不存在: {images_dir / name}")
         else:
-            print(f"\n警告: 图像文件不存在: {source_image}")
+            # 记录映射
+            mappings.append(f"{name},{Path(dest_image).stem}.pt")
     
     # 保存mappings.txt
     mappings_file = output_dir / "mappings.txt"
@@ -239,17 +242,17 @@ def convert_colmap_to_fed3dgs(colmap_dir, output_dir):
     torch.save(coordinates, coordinates_file)
     
     # 统计信息
-    n_train = len([f for f in train_metadata_dir.glob("*.pt")])
-    n_val = len([f for f in val_metadata_dir.glob("*.pt")])
+    n_train = len(train_metadatas)
+    n_val = len(val_metadatas)
     
     print(f"\n✅ 转换完成！")
     print(f"   输出目录: {output_dir}")
     print(f"   总图像数: {len(sorted_images)}")
     print(f"   训练集: {n_train} 张图像")
     print(f"   验证集: {n_val} 张图像")
-    print(f"   Train Metadata: {train_metadata_dir}")
+    print(f"   Train Metadata: {metadata_pack_path(str(train_dir)) if metadata_format == 'pack' else train_dir / 'metadata'}")
     print(f"   Train Images: {train_rgbs_dir}")
-    print(f"   Val Metadata: {val_metadata_dir}")
+    print(f"   Val Metadata: {metadata_pack_path(str(val_dir)) if metadata_format == 'pack' else val_dir / 'metadata'}")
     print(f"   Val Images: {val_rgbs_dir}")
     print(f"   映射文件: {mappings_file}")
     print(f"   坐标归一化: {coordinates_file}")
@@ -260,10 +263,18 @@ if __name__ == '__main__':
     parser.add_argument('-i', '--input', required=True, type=str,
                         help='COLMAP数据集目录（包含images/和sparse/0/）')
     parser.add_argument('-o', '--output', required=True, type=str,
-                        help='输出目录（将创建train/metadata/和train/rgbs/）')
+                        help='输出目录（将创建train/rgbs/和train/metadata.pack）')
+    parser.add_argument('--workers', '-j', default=os.cpu_count(), type=int,
+                        help='并行放置图像的进程数（默认: CPU核数）')
+    parser.add_argument('--link-mode', choices=LINK_MODES, default='auto',
+                        help='JPEG图像的放置方法：auto=reflink->硬链接->复制（默认: auto）')
+    parser.add_argument('--metadata-format', choices=['pack', 'pt'], default='pack',
+                        help='pack=写入metadata.pack, pt=按图像保存为metadata/*.pt（默认: pack）')
+    parser.add_argument('--force', action='store_true',
+                        help='重新生成所有输出（默认跳过已是最新的输出）')
     
     args = parser.parse_args()
     
-    convert_colmap_to_fed3dgs(args.input, args.output)
+    convert_colmap_to_fed3dgs(args.input, args.output, args.workers, args.link_mode, args.metadata_format, args.force)
 
 
@@ -0,0 +1,55 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""Converts Gaussian models between `.ply`, `.pth` and memory-mapped `.pack` files
+
+A client model `point_cloud.ply` (with `appearance_vec.pt`, `mlp.pt` and `hash.pt`) is converted
+into `point_cloud.pack` next to it, which `GaussianModel.load_ply` and `build_global_model.py` read
+instead of parsing the ply file while the pack is newer than the ply file.
+A global model `global_model.pth` is converted into `global_model.pack`, which `eval.py` accepts.
+
+Usage:
+    # convert a single model (the direction is given by the extensions)
+    python tools/convert_gaussian_model.py -s /path/to/global_model.pth -d /path/to/global_model.pack
+    python tools/convert_gaussian_model.py -s /path/to/point_cloud.pack -d /path/to/point_cloud.ply
+    # pack all client models of build_global_model.py's --model-dir
+    python tools/convert_gaussian_model.py -m /path/to/model-dir -liter 20000
+"""
+import os
+import sys
+import time
+import argparse
+
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
+from utils.model_io_utils import convert_model, pack_path
+
+
+def main(args):
+    if args.model_dir is None:
+        start = time.perf_counter()
+        convert_model(args.src, args.dst, args.sh_degree)
+        print(f'{args.src} -> {args.dst} ({time.perf_counter() - start:.2f} sec)')
+        return
+    ply_paths = [os.path.join(args.model_dir, d, 'point_cloud', 'iteration_' + args.load_iteration, 'point_cloud.ply')
+                 for d in sorted(os.listdir(args.model_dir))]
+    ply_paths = [p for p in ply_paths if os.path.exists(p)]
+    for ply_path in tqdm(ply_paths):
+        convert_model(ply_path, pack_path(ply_path), args.sh_degree)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--src', '-s', default=None, type=str,
+                        help='/path/to/source model (.ply, .pth or .pack)')
+    parser.add_argument('--dst', '-d', default=None, type=str,
+                        help='/path/to/destination model (.ply, .pth or .pack)')
+    parser.add_argument('--model-dir', '-m', default=None, type=str,
+                        help='/path/to/model-dir containing client models. every point_cloud.ply is packed')
+    parser.add_argument('--load-iteration', '-liter', default='20000', type=str)
+    parser.add_argument('--sh-degree', default=-1, type=int,
+                        help='SH degree of ply files (-1: inferred from the files)')
+    args = parser.parse_args()
+    if args.model_dir is None and (args.src is None or args.dst is None):
+        parser.error('either --model-dir or both --src and --dst are required')
+    main(args)
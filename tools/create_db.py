@@ -1,8 +1,7 @@
 # Copyright (C) 2024 Denso IT Laboratory, Inc.
 # All Rights Reserved
-from PIL import Image
-
 import os
+import sys
 
 import numpy as np
 import torch
@@ -10,25 +9,12 @@ import torch
 from tqdm import tqdm
 
 from database import COLMAPDatabase
+from client_partition import ClientPartitioner
 
-
-RDF_TO_DRB = torch.Tensor([[0, 1, 0],
-                           [1, 0, 0],
-                           [0, 0, -1]])
-
-
-def rotmat2qvec(R):
-    Rxx, Ryx, Rzx, Rxy, Ryy, Rzy, Rxz, Ryz, Rzz = R.flat
-    K = np.array([
-        [Rxx - Ryy - Rzz, 0, 0, 0],
-        [Ryx + Rxy, Ryy - Rxx - Rzz, 0, 0],
-        [Rzx + Rxz, Rzy + Ryz, Rzz - Rxx - Ryy, 0],
-        [Ryz - Rzy, Rzx - Rxz, Rxy - Ryx, Rxx + Ryy + Rzz]]) / 3.0
-    eigvals, eigvecs = np.linalg.eigh(K)
-    qvec = eigvecs[[3, 0, 1, 2], np.argmax(eigvals)]
-    if qvec[0] < 0:
-        qvec *= -1
-    return qvec
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
+from utils.pose_utils import meganerf_to_colmap, invert_extrinsics, rotmats_to_qvecs
+from utils.metadata_utils import load_metadatas
+from utils.image_header_utils import read_image_size
 
 
 @torch.inference_mode()
@@ -38,80 +24,108 @@ def load_cameras_and_create_txt(root, out_dir, index_file, database, scale=1):
     else:
         image_fnames = np.loadtxt(index_file, dtype=str)
 
-    image_txts = []
-    camera_txts = []
-    tvec_prior_txts = []
-    Rs = []
-    Ts = []
-    Ks = []
-    image_ids = []
     image_sizes = []
+    intrinsics = []
+    c2ws = []
+    # metadata.pack is used if it exists
+    metadatas = load_metadatas(root, [img_fname.split('.')[0] for img_fname in image_fnames])
     for img_fname in tqdm(image_fnames):
-        img = Image.open(os.path.join(root, 'rgbs', img_fname))        
-        w, h = img.size
-        image_sizes.append((w, h))
-        findex = img_fname.split('.')[0]
-        metadata = torch.load(os.path.join(root, 'metadata', f'{findex}.pt'))
-        # add camera
-        fx, fy, cx, cy = metadata['intrinsics']
-        if isinstance(fx, torch.Tensor):
-            fx = fx.item()
-        if isinstance(fy, torch.Tensor):
-            fy = fy.item()
-        if isinstance(fx, torch.Tensor):
-            cx = cx.item()
-        if isinstance(fy, torch.Tensor):
-            cy = cy.item()
-        camera_id = database.add_camera(1, w, h, (fx, fy, cx, cy))
-        # add image
-        c2w = metadata['c2w'].reshape(3, 4)
-        # inverse transform of https://github.com/cmusatyalab/mega-nerf/blob/main/scripts/colmap_to_mega_nerf.py#L409
-        c2w = torch.cat([-c2w[:, 1:2], c2w[:, :1], c2w[:, 2:]], 1)
-        # inverse transform of https://github.com/cmusatyalab/mega-nerf/blob/main/scripts/colmap_to_mega_nerf.py#L346-L349
-        c2w = torch.cat([RDF_TO_DRB.inverse() @ c2w[:3, :3] @ RDF_TO_DRB,
-                         RDF_TO_DRB.inverse() @ c2w[:3, 3:]], -1)
-        # camera-to-world to world-to-camera
-        R = c2w[:3, :3].T
-        t = - R @ c2w[:3, -1:]
-        Rs.append(R)
-        Ts.append(t)
-        # w2c = (torch.cat([c2w, torch.eye(4)[-1:]])).inverse()[:3, :4]
-        # qx, qy, qz, qw = rot_mat_to_quaternion(R.cpu().numpy())
-        q = rotmat2qvec(R.cpu().numpy())
-        t = t[:, -1].tolist()
-        image_id = database.add_image(img_fname, camera_id, q, t)
-        image_ids.append(image_id)
-
-        K = torch.Tensor([[fx, 0., cx],
-                          [0., fy, cy],
-                          [0., 0., 1.]])
-        Ks.append(K)
-        
-        image_txts.append(f'{image_id} {q[0]} {q[1]} {q[2]} {q[3]} {t[0]} {t[1]} {t[2]} {camera_id} {img_fname}')
-        image_txts.append('')
-        camera_txts.append(f'{camera_id} PINHOLE {w} {h} {fx} {fy} {cx} {cy}')
-        tvec_prior_txts.append(f'{img_fname} {t[0]} {t[1]} {t[2]}')
-
-    np.savetxt(os.path.join(out_dir, 'images.txt'), np.array(image_txts, dtype=str), fmt="%s")
-    np.savetxt(os.path.join(out_dir, 'cameras.txt'), np.array(camera_txts, dtype=str), fmt="%s")
-    np.savetxt(os.path.join(out_dir, 'tvec_priors.txt'), np.array(tvec_prior_txts, dtype=str), fmt="%s")
+        # only the file header is read
+        image_sizes.append(read_image_size(os.path.join(root, 'rgbs', img_fname)))
+        metadata = metadatas[img_fname.split('.')[0]]
+        intrinsics.append([v.item() if isinstance(v, torch.Tensor) else v for v in metadata['intrinsics']])
+        c2ws.append(metadata['c2w'].reshape(3, 4))
+
+    # all poses are converted at once
+    # inverse transform of https://github.com/cmusatyalab/mega-nerf/blob/main/scripts/colmap_to_mega_nerf.py#L409
+    # and https://github.com/cmusatyalab/mega-nerf/blob/main/scripts/colmap_to_mega_nerf.py#L346-L349
+    c2ws = meganerf_to_colmap(torch.stack(c2ws)) if len(c2ws) > 0 else torch.empty(0, 3, 4)
+    # camera-to-world to world-to-camera
+    w2cs = invert_extrinsics(c2ws)
+    Rs = w2cs[:, :, :3]
+    Ts = w2cs[:, :, 3:]
+    qvecs = rotmats_to_qvecs(Rs.numpy())
+    Ks = torch.zeros(len(intrinsics), 3, 3)
+    if len(intrinsics) > 0:
+        fxs, fys, cxs, cys = torch.tensor(intrinsics).T
+        Ks[:, 0, 0], Ks[:, 1, 1], Ks[:, 0, 2], Ks[:, 1, 2], Ks[:, 2, 2] = fxs, fys, cxs, cys, 1.
+    tvecs = Ts[:, :, 0].tolist()
+
+    # cameras and images are inserted in bulk within the caller's transaction
+    database.enable_bulk_insert()
+    camera_ids = database.add_cameras(1, [w for w, _ in image_sizes], [h for _, h in image_sizes], intrinsics)
+    image_ids = database.add_images(image_fnames, camera_ids, qvecs, tvecs)
+
+    # the text model is written in one pass
+    with open(os.path.join(out_dir, 'images.txt'), 'w') as f_image, \
+         open(os.path.join(out_dir, 'cameras.txt'), 'w') as f_camera, \
+         open(os.path.join(out_dir, 'tvec_priors.txt'), 'w') as f_prior:
+        for img_fname, (w, h), (fx, fy, cx, cy), q, t, camera_id, image_id in zip(
+                image_fnames, image_sizes, intrinsics, qvecs, tvecs, camera_ids, image_ids):
+            f_image.write(f'{image_id} {q[0]} {q[1]} {q[2]} {q[3]} {t[0]} {t[1]} {t[2]} {camera_id} {img_fname}\n\n')
+            f_camera.write(f'{camera_id} PINHOLE {w} {h} {fx} {fy} {cx} {cy}\n')
+            f_prior.write(f'{img_fname} {t[0]} {t[1]} {t[2]}\n')
     # make an empty file
     f = open(os.path.join(out_dir, 'points3D.txt'), 'w')
     f.close()
 
-    Rs = torch.stack(Rs)
-    Ts = torch.stack(Ts)
-    Ks = torch.stack(Ks)
     return Rs, Ts, Ks, image_ids, image_sizes, database
 
 
+def gen_image_pairs(Rs, Ts, n_matched, min_cos=0.5, n_candidates=None):
+    """Selects image pairs to be matched from the known poses
+
+    For each image, the nearest cameras (by a KD-tree over the camera centers, see `ClientPartitioner`)
+    whose viewing directions are within `arccos(min_cos)` are selected as likely co-visible images.
+
+    Args:
+        Rs (torch.Tensor): world-to-camera rotations of shape (N, 3, 3) in COLMAP's coordinate system
+        Ts (torch.Tensor): world-to-camera translations of shape (N, 3, 1)
+        n_matched (int): maximum number of pairs per image
+        min_cos (float): minimum cosine between the viewing directions of a pair
+        n_candidates (int): number of nearest cameras tested per image (default: 4 * n_matched)
+
+    Returns:
+        pairs (np.ndarray): unique pairs of image indices (i < j) of shape (#pairs, 2)
+    """
+    n_images = len(Rs)
+    if n_images < 2 or n_matched <= 0:
+        return np.empty((0, 2), dtype=np.int64)
+    c2ws = invert_extrinsics(torch.cat([Rs, Ts], -1)).numpy()
+    partitioner = ClientPartitioner(c2ws)
+    # the image itself is one of the nearest cameras
+    k = min(n_images, (n_candidates or 4 * n_matched) + 1)
+    indices = np.arange(n_images)
+    candidates = np.stack(partitioner.query(indices, np.full(n_images, k)))
+    centers = partitioner.centers
+    # the camera's z-axis in world coordinates
+    view_dirs = c2ws[:, :3, 2] / np.linalg.norm(c2ws[:, :3, 2], axis=-1, keepdims=True)
+    dists = np.sum(np.square(centers[candidates] - centers[:, None]), -1)
+    cos = np.sum(view_dirs[candidates] * view_dirs[:, None], -1)
+    dists[(candidates == indices[:, None]) | (cos < min_cos)] = np.inf
+    order = np.argsort(dists, axis=1, kind='stable')[:, :n_matched]
+    selected = np.take_along_axis(candidates, order, 1)
+    valid = np.isfinite(np.take_along_axis(dists, order, 1))
+    pairs = np.stack([np.broadcast_to(indices[:, None], selected.shape)[valid], selected[valid]], -1)
+    return np.unique(np.sort(pairs, axis=1), axis=0)
+
+
+def write_pairs(path, image_fnames, pairs):
+    """Writes a match list for `colmap matches_importer --match_type pairs`"""
+    with open(path, 'w') as f:
+        f.writelines(f'{image_fnames[i]} {image_fnames[j]}\n' for i, j in pairs)
+
+
 if __name__=='__main__':
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('--root', '-r', required=True, type=str)
     parser.add_argument('--out-dir', '-out', default='./sparse_model', type=str)
     parser.add_argument('--index-file', default=None, type=str)
-    parser.add_argument('--n-matched', default=20, type=int)
+    parser.add_argument('--n-matched', default=20, type=int,
+                        help='number of images matched with each image. all pairs are matched if <= 0')
+    parser.add_argument('--min-cos', default=0.5, type=float,
+                        help='minimum cosine between the viewing directions of matched images')
     parser.add_argument('--scale-factor', default=4, type=int)
     parser.add_argument('--cuda', action='store_true')
     parser.add_argument('--max-keypoints', default=None, type=int)
@@ -135,5 +149,15 @@ if __name__=='__main__':
                                                                            args.index_file,
                                                                            db,
                                                                            args.scale_factor)
+    # pairs for `colmap matches_importer`. the scripts fall back to exhaustive matching without the file
+    pairs_path = os.path.join(args.out_dir, 'pairs.txt')
+    if args.n_matched > 0:
+        print('generate image pairs')
+        image_fnames = dict(database.execute('SELECT image_id, name FROM images'))
+        pairs = gen_image_pairs(Rs, Ts, args.n_matched, args.min_cos)
+        write_pairs(pairs_path, [image_fnames[image_id] for image_id in img_ids], pairs)
+        print(f'{len(pairs)} pairs of {len(img_ids)} images')
+    elif os.path.exists(pairs_path):
+        os.remove(pairs_path)
     database.commit()
     database.close()
@@ -126,14 +126,14 @@ def pair_id_to_image_ids(pair_id):
 
 def array_to_blob(array):
     if IS_PYTHON3:
-        return array.tostring()
+        return array.tobytes()
     else:
         return np.getbuffer(array)
 
 
 def blob_to_array(blob, dtype, shape=(-1,)):
     if IS_PYTHON3:
-        return np.fromstring(blob, dtype=dtype).reshape(*shape)
+        return np.frombuffer(blob, dtype=dtype).reshape(*shape)
     else:
         return np.frombuffer(blob, dtype=dtype).reshape(*shape)
 
@@ -163,6 +163,22 @@ class COLMAPDatabase(sqlite3.Connection):
             lambda: self.executescript(CREATE_MATCHES_TABLE)
         self.create_name_index = lambda: self.executescript(CREATE_NAME_INDEX)
 
+    def enable_bulk_insert(self):
+        """Trades durability for insertion speed, e.g., for a database
+        that is populated once and can be recreated if it is lost."""
+        self.execute("PRAGMA journal_mode=WAL")
+        self.execute("PRAGMA synchronous=OFF")
+
+    def _next_ids(self, table, column, num):
+        # IDs that AUTOINCREMENT would assign to the next `num` rows
+        last_id = self.execute(
+            "SELECT MAX({}) FROM {}".format(column, table)).fetchone()[0] or 0
+        row = self.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        if row is not None:
+            last_id = max(last_id, row[0])
+        return list(range(last_id + 1, last_id + 1 + num))
+
     def add_camera(self, model, width, height, params,
                    prior_focal_length=False, camera_id=None):
         params = np.asarray(params, np.float64)
@@ -180,6 +196,39 @@ class COLMAPDatabase(sqlite3.Connection):
              prior_q[3], prior_t[0], prior_t[1], prior_t[2]))
         return cursor.lastrowid
 
+    def add_cameras(self, model, widths, heights, params,
+                    prior_focal_length=False, camera_ids=None):
+        """Bulk version of `add_camera` that inserts all cameras with one
+        `executemany`. Returns the camera IDs in the given order."""
+        params = [np.asarray(p, np.float64) for p in params]
+        if camera_ids is None:
+            camera_ids = self._next_ids("cameras", "camera_id", len(params))
+        self.executemany(
+            "INSERT INTO cameras VALUES (?, ?, ?, ?, ?, ?)",
+            ((camera_id, model, int(width), int(height), array_to_blob(p),
+              prior_focal_length)
+             for camera_id, width, height, p
+             in zip(camera_ids, widths, heights, params)))
+        return list(camera_ids)
+
+    def add_images(self, names, camera_ids, prior_qs=None, prior_ts=None,
+                   image_ids=None):
+        """Bulk version of `add_image` that inserts all images with one
+        `executemany`. Returns the image IDs in the given order."""
+        if prior_qs is None:
+            prior_qs = np.full((len(names), 4), np.nan)
+        if prior_ts is None:
+            prior_ts = np.full((len(names), 3), np.nan)
+        if image_ids is None:
+            image_ids = self._next_ids("images", "image_id", len(names))
+        self.executemany(
+            "INSERT INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((image_id, name, camera_id) + tuple(map(float, prior_q))
+             + tuple(map(float, prior_t))
+             for image_id, name, camera_id, prior_q, prior_t
+             in zip(image_ids, names, camera_ids, prior_qs, prior_ts)))
+        return list(image_ids)
+
     def add_keypoints(self, image_id, keypoints):
         assert(len(keypoints.shape) == 2)
         assert(keypoints.shape[1] in [2, 4, 6])
@@ -189,6 +238,16 @@ class COLMAPDatabase(sqlite3.Connection):
             "INSERT INTO keypoints VALUES (?, ?, ?, ?)",
             (image_id,) + keypoints.shape + (array_to_blob(keypoints),))
 
+    def add_keypoints_many(self, image_ids, keypoints_list):
+        """Bulk version of `add_keypoints` for keypoints of many images"""
+        def rows():
+            for image_id, keypoints in zip(image_ids, keypoints_list):
+                assert(len(keypoints.shape) == 2)
+                assert(keypoints.shape[1] in [2, 4, 6])
+                keypoints = np.ascontiguousarray(keypoints, np.float32)
+                yield (image_id,) + keypoints.shape + (array_to_blob(keypoints),)
+        self.executemany("INSERT INTO keypoints VALUES (?, ?, ?, ?)", rows())
+
     def add_descriptors(self, image_id, descriptors):
         descriptors = np.ascontiguousarray(descriptors, np.uint8)
         self.execute(
@@ -208,6 +267,19 @@ class COLMAPDatabase(sqlite3.Connection):
             "INSERT INTO matches VALUES (?, ?, ?, ?)",
             (pair_id,) + matches.shape + (array_to_blob(matches),))
 
+    def add_matches_many(self, image_id_pairs, matches_list):
+        """Bulk version of `add_matches` for matches of many image pairs"""
+        def rows():
+            for (image_id1, image_id2), matches in zip(image_id_pairs, matches_list):
+                assert(len(matches.shape) == 2)
+                assert(matches.shape[1] == 2)
+                if image_id1 > image_id2:
+                    matches = matches[:,::-1]
+                pair_id = image_ids_to_pair_id(image_id1, image_id2)
+                matches = np.ascontiguousarray(matches, np.uint32)
+                yield (pair_id,) + matches.shape + (array_to_blob(matches),)
+        self.executemany("INSERT INTO matches VALUES (?, ?, ?, ?)", rows())
+
     def add_two_view_geometry(self, image_id1, image_id2, matches,
                               F=np.eye(3), E=np.eye(3), H=np.eye(3),
                               qvec=np.array([1.0, 0.0, 0.0, 0.0]),
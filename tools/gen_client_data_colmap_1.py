@@ -16,68 +16,16 @@ import sys
 import numpy as np
 import torch
 from pathlib import Path
-from tqdm import tqdm
 
 # 添加路径以便导入
+sys.path.insert(0, os.path.dirname(__file__))
+from client_partition import gen_clients_data
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
 from scene.colmap_loader import (  # pyright: ignore[reportMissingImports]
     read_extrinsics_binary, read_intrinsics_binary,
-    read_extrinsics_text, read_intrinsics_text,
-    qvec2rotmat
+    read_extrinsics_text, read_intrinsics_text
 )
-
-# 坐标系转换矩阵 (Mega-NeRF格式)
-RDF_TO_DRB = torch.Tensor([[0, 1, 0],
-                           [1, 0, 0],
-                           [0, 0, -1]])
-
-
-def w2c_to_c2w(R, T):
-    """将world-to-camera转换为camera-to-world"""
-    R_inv = R.T
-    T_inv = -R_inv @ T.reshape(3, 1)
-    c2w = np.hstack([R_inv, T_inv])
-    return c2w
-
-
-def colmap_to_meganerf_c2w(c2w_colmap):
-    """将COLMAP格式的c2w转换为Mega-NeRF格式"""
-    c2w = torch.from_numpy(c2w_colmap).float()
-    
-    # 步骤1: 应用RDF_TO_DRB坐标系转换
-    c2w_rot = RDF_TO_DRB @ c2w[:3, :3] @ RDF_TO_DRB.inverse()
-    c2w_trans = RDF_TO_DRB @ c2w[:3, 3:]
-    c2w_transformed = torch.cat([c2w_rot, c2w_trans], -1)
-    
-    # 步骤2: 应用列交换
-    c2w_meganerf = torch.cat([c2w_transformed[:, 1:2], 
-                              -c2w_transformed[:, 0:1], 
-                              c2w_transformed[:, 2:]], 1)
-    
-    return c2w_meganerf.numpy()
-
-
-def gen_client_data(c2ws: np.ndarray, n_data: int):
-    """
-    Args:
-        c2ws (np.ndarray): camera extrinsic (camera2world) that is
-                        an ndarray of shape (#cameras, 3, 4).
-                        the coordinate system is following mega-nerf,
-                        i.e., (down, right, backward)
-        n_data (int): a number of data for a client
-                        
-    Returns:
-        indices (np.ndarray): client's data indices
-    """
-    n_cameras = c2ws.shape[0]
-    xyz_coord = c2ws[:, :3, -1]  # (#cameras, 3)
-    
-    base_camera_idx = np.random.randint(0, n_cameras)
-    center_xyz = xyz_coord[base_camera_idx]
-    dists = np.sum(np.square(xyz_coord - center_xyz), -1)
-    
-    indices = np.argsort(dists, 0)[:n_data]
-    return np.sort(indices)
+from utils.pose_utils import qvecs_to_rotmats, invert_extrinsics, colmap_to_meganerf  # pyright: ignore[reportMissingImports]
 
 
 def load_colmap_c2ws(colmap_dir):
@@ -121,26 +69,21 @@ def load_colmap_c2ws(colmap_dir):
     # 按图像名称排序
     sorted_images = sorted(cam_extrinsics.items(), key=lambda x: x[1].name)
     
-    # 转换每个相机的c2w
+    # 一次性转换所有相机的c2w
     print("转换相机参数...")
-    c2ws = []
-    image_names = []
+    image_names = [extr.name for _, extr in sorted_images]
+    qvecs = np.array([extr.qvec for _, extr in sorted_images], dtype=np.float64).reshape(-1, 4)
+    tvecs = np.array([extr.tvec for _, extr in sorted_images], dtype=np.float64).reshape(-1, 3)
+    
+    # 将qvec/tvec转换为c2w
+    R = np.swapaxes(qvecs_to_rotmats(qvecs), -1, -2)  # world-to-camera旋转矩阵
+    T = tvecs  # world-to-camera平移向量
     
-    for image_id, extr in tqdm(sorted_images, desc="处理相机"):
-        # 将qvec/tvec转换为c2w
-        R = np.transpose(qvec2rotmat(extr.qvec))  # world-to-camera旋转矩阵
-        T = np.array(extr.tvec)  # world-to-camera平移向量
-        
-        # 转换为camera-to-world
-        c2w_colmap = w2c_to_c2w(R, T)
-        
-        # 转换为Mega-NeRF格式的c2w
-        c2w_meganerf = colmap_to_meganerf_c2w(c2w_colmap)
-        
-        c2ws.append(c2w_meganerf)
-        image_names.append(extr.name)
+    # 转换为camera-to-world
+    c2ws_colmap = invert_extrinsics(torch.from_numpy(np.concatenate([R, T[..., None]], -1)))
     
-    c2ws = np.stack(c2ws)
+    # 转换为Mega-NeRF格式的c2w
+    c2ws = colmap_to_meganerf(c2ws_colmap.float()).numpy()
     return c2ws, image_names
 
 
@@ -181,9 +124,8 @@ if __name__ == '__main__':
     
     print('split data')
     os.makedirs(args.output_dir, exist_ok=True)
-    for i in range(args.n_clients):
-        n_data = np.random.randint(args.n_data_min, args.n_data_max + 1)
-        indices = gen_client_data(c2ws, n_data)
+    clients = gen_clients_data(c2ws, args.n_clients, args.n_data_min, args.n_data_max)
+    for i, indices in enumerate(clients):
         training_image_names = [image_names[idx] for idx in indices]
         np.savetxt(os.path.join(args.output_dir, str(i).zfill(5) + '.txt'), training_image_names, fmt="%s")
     
@@ -0,0 +1,150 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""
+并行地将源图像放置到数据集目录（convert_colmap_to_fed3dgs_*.py 使用）
+
+JPEG源图像不重新编码：优先用reflink（写时复制，与源文件互不影响），不支持时用硬链接，
+跨文件系统等都不行时才复制。其他格式的图像转换为JPEG。
+输出文件已存在且不比源文件旧（链接/复制时大小也相同）时跳过，所以中断后重新运行只处理剩下的图像。
+输出先写到临时文件再替换，中断时不会留下不完整的图像。
+"""
+import os
+import errno
+import shutil
+import multiprocessing
+from pathlib import Path
+from collections import Counter
+
+from PIL import Image
+from tqdm import tqdm
+
+try:
+    import fcntl
+    FCNTL_FOUND = True
+except ImportError:
+    FCNTL_FOUND = False
+
+
+JPEG_SUFFIXES = ('.jpg', '.jpeg')
+SOURCE_SUFFIXES = ['.jpg', '.JPG', '.png', '.PNG', '.jpeg', '.JPEG']
+# Linux的FICLONE ioctl（btrfs、xfs等支持）
+FICLONE = 0x40049409
+LINK_MODES = ('auto', 'reflink', 'hardlink', 'copy')
+
+
+def find_source_image(images_dir, name):
+    """返回图像文件路径，不存在时尝试不同的扩展名，都不存在时返回None"""
+    source_image = Path(images_dir) / name
+    if source_image.exists():
+        return source_image
+    for ext in SOURCE_SUFFIXES:
+        alt_source = Path(images_dir) / f"{Path(name).stem}{ext}"
+        if alt_source.exists():
+            return alt_source
+    return None
+
+
+def is_jpeg(path):
+    return Path(path).suffix.lower() in JPEG_SUFFIXES
+
+
+def is_up_to_date(source, dest):
+    """输出存在、不比源文件旧，且（不重新编码时）大小相同时返回True"""
+    try:
+        dest_stat = os.stat(dest)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(source)
+    if os.path.samestat(source_stat, dest_stat):
+        return True
+    if dest_stat.st_mtime < source_stat.st_mtime:
+        return False
+    return not is_jpeg(source) or dest_stat.st_size == source_stat.st_size
+
+
+def reflink(source, dest):
+    """写时复制，不支持时抛出OSError"""
+    if not FCNTL_FOUND:
+        raise OSError(errno.EOPNOTSUPP, 'reflink is not supported on this platform')
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, dest)
+
+
+def link_or_copy(source, dest, link_mode='auto'):
+    """
+    将source放置为dest，先写临时文件再替换
+
+    Args:
+        link_mode: 'auto'=reflink -> 硬链接 -> 复制, 'reflink'/'hardlink'=不支持时复制, 'copy'=总是复制
+
+    Returns:
+        实际使用的方法（'reflink', 'hardlink' 或 'copy'）
+    """
+    tmp = f"{dest}.tmp{os.getpid()}"
+    methods = {'auto': ('reflink', 'hardlink'), 'copy': ()}.get(link_mode, (link_mode,))
+    for method in methods:
+        try:
+            if method == 'reflink':
+                reflink(source, tmp)
+            else:
+                os.link(source, tmp)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            continue
+        os.replace(tmp, dest)
+        return method
+    shutil.copy2(source, tmp)
+    os.replace(tmp, dest)
+    return 'copy'
+
+
+def encode_jpeg(source, dest, quality=95):
+    tmp = f"{dest}.tmp{os.getpid()}"
+    img = Image.open(source).convert('RGB')
+    img.save(tmp, 'JPEG', quality=quality)
+    os.replace(tmp, dest)
+    return 'encode'
+
+
+def stage_image(task):
+    """
+    Args:
+        task: (任务序号, 源图像目录, 图像名, 输出图像路径, link_mode, force)
+
+    Returns:
+        (任务序号, 状态) 状态为 'missing', 'skip', 'reflink', 'hardlink', 'copy' 或 'encode'
+    """
+    i, images_dir, name, dest, link_mode, force = task
+    source = find_source_image(images_dir, name)
+    if source is None:
+        return i, 'missing'
+    if not force and is_up_to_date(source, dest):
+        return i, 'skip'
+    if is_jpeg(source):
+        return i, link_or_copy(source, dest, link_mode)
+    return i, encode_jpeg(source, dest)
+
+
+def stage_images(tasks, workers=None, desc="放置图像"):
+    """
+    用进程池处理 stage_image 的任务（任务序号为在tasks中的位置）
+
+    Returns:
+        statuses: 每个任务的状态，顺序同tasks
+        counts: 各状态的数量
+    """
+    statuses = [None] * len(tasks)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            # 任务很多时按块分发，减少进程间通信
+            chunksize = max(1, min(64, len(tasks) // (workers * 8)))
+            for i, status in tqdm(pool.imap_unordered(stage_image, tasks, chunksize), total=len(tasks), desc=desc):
+                statuses[i] = status
+    else:
+        for task in tqdm(tasks, desc=desc):
+            i, status = stage_image(task)
+            statuses[i] = status
+    return statuses, Counter(statuses)
@@ -31,12 +31,126 @@ import numpy as np
 # 导入点云读写函数
 sys.path.insert(0, os.path.dirname(__file__))
 from read_write_model import (
-    read_points3D_binary, read_points3D_text,
-    write_points3D_binary, write_points3D_text,
-    Point3D
+    read_points3D_binary_arrays, read_points3D_text,
+    write_points3D_binary_arrays, write_points3D_text,
+    points3D_to_arrays, arrays_to_points3D
 )
 
 
+def read_point_arrays(pc_path):
+    """
+    读取点云文件为列式数组（格式同 read_points3D_binary_arrays(with_tracks=True)）
+
+    Args:
+        pc_path: 点云文件路径（.bin或.txt）
+
+    Returns:
+        列式点云，不支持的文件格式返回None
+    """
+    pc_path = Path(pc_path)
+    if pc_path.suffix == '.bin':
+        return read_points3D_binary_arrays(str(pc_path), with_tracks=True)
+    if pc_path.suffix == '.txt':
+        return points3D_to_arrays(read_points3D_text(str(pc_path)))
+    return None
+
+
+def merge_point_arrays(point_arrays, merge_strategy='union'):
+    """
+    列式合并多个点云，结果与按文件顺序逐点合并字典相同
+
+    所有输入的点按 (点ID, 出现顺序) 排序后分组处理：
+    - 'union': 同一ID的相邻两次出现位置相同（np.allclose, atol=1e-6）时合并观测信息，
+      位置不同时用新点覆盖，所以每个ID只保留最后一段连续合并的出现。
+      位置和颜色取最后一次出现，误差取该段的最小值，(image_id, point2D_idx) 去重并保持首次出现的顺序
+    - 'replace': 每个ID只保留最后一次出现
+
+    Args:
+        point_arrays: 列式点云列表（按合并顺序）
+        merge_strategy: 合并策略
+
+    Returns:
+        merged: 合并后的列式点云，点按各ID首次出现的顺序排列
+        conflict_ids: 'union' 策略下ID相同但位置不同的点ID
+    """
+    point_arrays = list(point_arrays)
+    ids = np.concatenate([p['ids'] for p in point_arrays] + [np.empty(0, np.int64)]).astype(np.int64)
+    xyz = np.concatenate([p['xyz'] for p in point_arrays] + [np.empty((0, 3))]).astype(np.float64)
+    rgb = np.concatenate([p['rgb'] for p in point_arrays] + [np.empty((0, 3), np.uint8)])
+    error = np.concatenate([p['error'] for p in point_arrays] + [np.empty(0)]).astype(np.float64)
+    track_lengths = np.concatenate([np.diff(p['track_offsets']) for p in point_arrays] + [np.empty(0, np.int64)])
+    image_ids = np.concatenate([p['image_ids'] for p in point_arrays] + [np.empty(0, np.int64)]).astype(np.int64)
+    point2D_idxs = np.concatenate([p['point2D_idxs'] for p in point_arrays] + [np.empty(0, np.int64)]).astype(np.int64)
+    n_points = len(ids)
+
+    # 按 (点ID, 出现顺序) 排序，first/last 标记每个ID的第一次/最后一次出现
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    first = np.ones(n_points, dtype=bool)
+    first[1:] = sorted_ids[1:] != sorted_ids[:-1]
+    last = np.ones(n_points, dtype=bool)
+    last[:-1] = first[1:]
+    # 连续合并的一段出现从 segment_start 开始
+    if merge_strategy == 'union':
+        # 与同一ID的上一次出现比较位置（与 np.allclose(上一次.xyz, 本次.xyz, atol=1e-6) 相同）
+        prev_xyz, cur_xyz = xyz[order[:-1]], xyz[order[1:]]
+        close = np.all(np.abs(prev_xyz - cur_xyz) <= 1e-6 + 1e-5 * np.abs(cur_xyz), axis=1)
+        segment_start = first.copy()
+        segment_start[1:] |= ~close
+        conflict_ids = sorted_ids[segment_start & ~first]
+    else:
+        segment_start = np.ones(n_points, dtype=bool)
+        conflict_ids = np.empty(0, dtype=np.int64)
+    segment = np.cumsum(segment_start) - 1
+    group = np.cumsum(first) - 1
+    n_unique = int(first.sum())
+    # 只保留每个ID的最后一段
+    keep = segment == segment[last][group]
+    kept = np.nonzero(keep)[0]
+    group_starts = np.nonzero(np.diff(group[kept], prepend=-1))[0]
+    min_error = np.minimum.reduceat(error[order[kept]], group_starts) if n_points > 0 else np.empty(0)
+
+    # 输出顺序：各ID首次出现的顺序
+    out_order = np.argsort(order[first], kind='stable')
+    out_rank = np.empty(n_unique, dtype=np.int64)
+    out_rank[out_order] = np.arange(n_unique)
+    last_index = order[last][out_order]
+
+    # 观测信息：保留最后一段的观测，合并过的点去重 (image_id, point2D_idx)
+    occurrence_group = np.empty(n_points, dtype=np.int64)
+    occurrence_group[order] = group
+    occurrence_keep = np.zeros(n_points, dtype=bool)
+    occurrence_keep[order] = keep
+    owner = np.repeat(np.arange(n_points), track_lengths)
+    elem_group = occurrence_group[owner]
+    elem_keep = occurrence_keep[owner]
+    merged_group = np.bincount(group[kept], minlength=n_unique) > 1
+    candidates = np.nonzero(elem_keep & merged_group[elem_group])[0]
+    keys = (point2D_idxs[candidates], image_ids[candidates], elem_group[candidates])
+    # lexsort is stable, so the first of each run of equal keys is the first occurrence
+    sort = np.lexsort(keys)
+    duplicate = np.ones(len(candidates), dtype=bool)
+    duplicate[0:1] = False
+    for key in keys:
+        duplicate[1:] &= key[sort][1:] == key[sort][:-1]
+    elem_keep[candidates[sort[duplicate]]] = False
+    elems = np.nonzero(elem_keep)[0]
+    # 按输出顺序排列，同一个点内保持出现顺序
+    elem_rank = out_rank[elem_group[elems]]
+    elems = elems[np.argsort(elem_rank, kind='stable')]
+    track_offsets = np.zeros(n_unique + 1, dtype=np.int64)
+    np.cumsum(np.bincount(elem_rank, minlength=n_unique), out=track_offsets[1:])
+
+    merged = dict(ids=sorted_ids[first][out_order],
+                  xyz=xyz[last_index],
+                  rgb=rgb[last_index],
+                  error=min_error[out_order],
+                  track_offsets=track_offsets,
+                  image_ids=image_ids[elems],
+                  point2D_idxs=point2D_idxs[elems])
+    return merged, conflict_ids
+
+
 def merge_pointclouds(pointcloud_files, output_file, merge_strategy='union'):
     """
     合并多个点云文件
@@ -49,9 +163,9 @@ def merge_pointclouds(pointcloud_files, output_file, merge_strategy='union'):
             - 'replace': 如果点ID重复，用后面的文件覆盖前面的
     
     Returns:
-        合并后的点云字典
+        合并后的列式点云（格式同 read_points3D_binary_arrays(with_tracks=True)）
     """
-    merged_points = {}
+    point_arrays = []
     total_points = 0
     
     print(f"开始合并 {len(pointcloud_files)} 个点云文件...")
@@ -64,75 +178,31 @@ def merge_pointclouds(pointcloud_files, output_file, merge_strategy='union'):
         
         try:
             # 读取点云文件
-            if pc_path.suffix == '.bin':
-                points3D = read_points3D_binary(str(pc_path))
-            elif pc_path.suffix == '.txt':
-                points3D = read_points3D_text(str(pc_path))
-            else:
+            points = read_point_arrays(pc_path)
+            if points is None:
                 print(f"  警告: 不支持的文件格式，跳过: {pc_file}")
                 continue
             
-            print(f"  [{idx+1}/{len(pointcloud_files)}] 读取 {pc_path.name}: {len(points3D)} 个点")
-            total_points += len(points3D)
-            
-            # 合并点云
-            for point_id, point in points3D.items():
-                if point_id in merged_points:
-                    # 点ID已存在，需要合并观测信息
-                    existing_point = merged_points[point_id]
-                    
-                    if merge_strategy == 'union':
-                        # 合并策略：合并image_ids和point2D_idxs
-                        # 检查点是否相同（位置、颜色、误差）
-                        if np.allclose(existing_point.xyz, point.xyz, atol=1e-6):
-                            # 相同位置的点，合并观测信息
-                            # 合并image_ids和point2D_idxs，去重
-                            combined_image_ids = np.concatenate([existing_point.image_ids, point.image_ids])
-                            combined_point2D_idxs = np.concatenate([existing_point.point2D_idxs, point.point2D_idxs])
-                            
-                            # 去重：保留唯一的(image_id, point2D_idx)对
-                            # 使用字典来去重，保持顺序
-                            unique_pairs = {}
-                            for img_id, pt2d_idx in zip(combined_image_ids, combined_point2D_idxs):
-                                key = (int(img_id), int(pt2d_idx))
-                                if key not in unique_pairs:
-                                    unique_pairs[key] = (img_id, pt2d_idx)
-                            
-                            # 重建数组
-                            unique_image_ids = np.array([p[0] for p in unique_pairs.values()], dtype=np.int32)
-                            unique_point2D_idxs = np.array([p[1] for p in unique_pairs.values()], dtype=np.int32)
-                            
-                            # 使用较小的误差值（更精确的点）
-                            error = min(existing_point.error, point.error)
-                            
-                            merged_points[point_id] = Point3D(
-                                id=point_id,
-                                xyz=point.xyz,  # 使用新点的位置（或可以取平均）
-                                rgb=point.rgb,  # 使用新点的颜色（或可以取平均）
-                                error=error,
-                                image_ids=unique_image_ids,
-                                point2D_idxs=unique_point2D_idxs
-                            )
-                        else:
-                            # 不同位置的点，但ID相同（可能是不同重建中的点）
-                            # 使用新点覆盖（或可以创建新ID）
-                            print(f"    警告: 点ID {point_id} 在不同文件中有不同位置，使用新点覆盖")
-                            merged_points[point_id] = point
-                    else:  # replace策略
-                        # 直接覆盖
-                        merged_points[point_id] = point
-                else:
-                    # 新点，直接添加
-                    merged_points[point_id] = point
+            n_points = len(points['ids'])
+            print(f"  [{idx+1}/{len(pointcloud_files)}] 读取 {pc_path.name}: {n_points} 个点")
+            total_points += n_points
+            point_arrays.append(points)
                     
         except Exception as e:
             print(f"  错误: 读取文件失败 {pc_file}: {e}")
             continue
     
+    # 合并点云
+    merged_points, conflict_ids = merge_point_arrays(point_arrays, merge_strategy)
+    for point_id in conflict_ids:
+        # 不同位置的点，但ID相同（可能是不同重建中的点），使用新点覆盖
+        print(f"    警告: 点ID {point_id} 在不同文件中有不同位置，使用新点覆盖")
+    n_merged = len(merged_points['ids'])
+    
     print(f"\n合并完成:")
     print(f"  总输入点数: {total_points}")
-    print(f"  合并后点数: {len(merged_points)}")
-    print(f"  去重减少: {total_points - len(merged_points)} 个点")
+    print(f"  合并后点数: {n_merged}")
+    print(f"  去重减少: {total_points - n_merged} 个点")
     
     # 保存合并后的点云
     output_path = Path(output_file)
@@ -140,15 +210,15 @@ def merge_pointclouds(pointcloud_files, output_file, merge_strategy='union'):
     
     try:
         if output_path.suffix == '.bin':
-            write_points3D_binary(merged_points, str(output_path))
+            write_points3D_binary_arrays(merged_points, str(output_path))
             print(f"  已保存二进制格式: {output_path}")
         elif output_path.suffix == '.txt':
-            write_points3D_text(merged_points, str(output_path))
+            write_points3D_text(arrays_to_points3D(merged_points), str(output_path))
             print(f"  已保存文本格式: {output_path}")
         else:
             # 默认保存为.bin格式
             output_path = output_path.with_suffix('.bin')
-            write_points3D_binary(merged_points, str(output_path))
+            write_points3D_binary_arrays(merged_points, str(output_path))
             print(f"  已保存二进制格式: {output_path}")
     except Exception as e:
         print(f"  错误: 保存文件失败: {e}")
@@ -261,12 +331,12 @@ if __name__ == '__main__':
         if args.format in ['txt', 'both']:
             output_path = Path(args.output)
             txt_output = output_path.with_suffix('.txt')
-            write_points3D_text(merged_points, str(txt_output))
+            write_points3D_text(arrays_to_points3D(merged_points), str(txt_output))
             print(f"  已保存文本格式: {txt_output}")
         
         print(f"\n✅ 合并完成！")
         print(f"   输出文件: {args.output}")
-        print(f"   合并点数: {len(merged_points)}")
+        print(f"   合并点数: {len(merged_points['ids'])}")
         
     except Exception as e:
         print(f"错误: 合并失败: {e}")
@@ -0,0 +1,55 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""Consolidates per-image metadata files into a single metadata pack
+
+`<dataset-dir>/<split>/metadata/*.pt` is converted into `<dataset-dir>/<split>/metadata.pack`,
+which is used by `build_global_model.py`, `eval.py` and `tools/gen_client_data*.py` if it exists.
+Re-run this script after modifying the metadata files.
+
+Usage:
+    python tools/pack_metadata.py --dataset-dir /path/to/dataset --splits train val
+"""
+import os
+import sys
+import time
+import argparse
+
+import torch
+
+from tqdm import tqdm
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
+from utils.metadata_utils import load_metadatas, metadata_pack_path, pack_metadatas
+
+
+def main(args):
+    for split in args.splits:
+        split_dir = os.path.join(args.dataset_dir, split)
+        metadata_dir = os.path.join(split_dir, 'metadata')
+        if not os.path.isdir(metadata_dir):
+            print(f'skip {split}: {metadata_dir} does not exist')
+            continue
+        fnames = sorted(f for f in os.listdir(metadata_dir) if f.endswith('.pt'))
+        metadatas = {fname.split('.')[0]: torch.load(os.path.join(metadata_dir, fname))
+                     for fname in tqdm(fnames, desc=split)}
+        pack_path = metadata_pack_path(split_dir)
+        pack_metadatas(metadatas, pack_path)
+        # check the round trip
+        start = time.perf_counter()
+        packed = load_metadatas(split_dir)
+        elapsed = time.perf_counter() - start
+        for name, meta in metadatas.items():
+            for k, v in meta.items():
+                same = torch.equal(v, packed[name][k]) if isinstance(v, torch.Tensor) else v == packed[name][k]
+                if not same:
+                    raise RuntimeError(f'"{k}" of {name} differs after packing')
+        print(f'{split}: {len(metadatas)} metadata -> {pack_path} (loaded in {elapsed * 1e3:.1f} ms)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset-dir', '-data', required=True, type=str,
+                        help='/path/to/dataset-dir')
+    parser.add_argument('--splits', default=['train', 'val'], type=str, nargs='+')
+    args = parser.parse_args()
+    main(args)
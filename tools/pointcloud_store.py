@@ -0,0 +1,168 @@
+# Copyright (C) 2024 Denso IT Laboratory, Inc.
+# All Rights Reserved
+"""
+将每张图像的点云合并为一个列式点云索引
+
+`<dataset-dir>/train/pointclouds/<图像索引>/points3D.bin` 只解析一次，所有点按图像顺序拼接后保存为
+`<dataset-dir>/train/pointclouds.pack`，并用CSR形式记录 图像 -> 点 的对应关系：
+第i张图像的点是 [image_offsets[i], image_offsets[i+1]) 行，
+第j个点的观测是 [track_offsets[j], track_offsets[j+1]) 个元素。
+gen_client_data_with_pointclouds.py 从索引中按行范围取出各客户端图像的点云，不再逐个读取点云文件。
+点云文件比索引新或图像有增减时索引会自动重建。
+
+用法:
+    python tools/pointcloud_store.py -d <数据集根目录>
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+from tqdm import tqdm
+
+# 导入点云读写函数
+sys.path.insert(0, os.path.dirname(__file__))
+from read_write_model import read_points3D_binary_arrays
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'gaussian-splatting'))
+from utils.pack_utils import write_pack, read_pack
+
+
+POINTCLOUD_STORE = 'pointclouds.pack'
+
+
+def pointcloud_store_path(dataset_dir):
+    return Path(dataset_dir) / "train" / POINTCLOUD_STORE
+
+
+def list_pointcloud_files(dataset_dir):
+    """
+    Returns:
+        (图像索引, 点云.bin文件路径) 的列表，按图像索引排序
+    """
+    pointclouds_dir = Path(dataset_dir) / "train" / "pointclouds"
+    if not pointclouds_dir.exists():
+        return []
+    files = [(d, pointclouds_dir / d / "points3D.bin") for d in sorted(os.listdir(pointclouds_dir))]
+    return [(image_index, bin_file) for image_index, bin_file in files if bin_file.exists()]
+
+
+def is_store_up_to_date(store_path, pointcloud_files):
+    """索引存在、包含相同的图像且比所有点云文件新时返回True"""
+    store_path = Path(store_path)
+    if not store_path.exists():
+        return False
+    _, attrs = read_pack(str(store_path))
+    if attrs.get('images') != [image_index for image_index, _ in pointcloud_files]:
+        return False
+    store_mtime = store_path.stat().st_mtime
+    return all(bin_file.stat().st_mtime <= store_mtime for _, bin_file in pointcloud_files)
+
+
+def build_pointcloud_store(dataset_dir, store_path=None):
+    """
+    解析所有图像的点云并保存为一个列式点云索引
+
+    Args:
+        dataset_dir: 数据集根目录
+        store_path: 索引文件路径（默认: <dataset_dir>/train/pointclouds.pack）
+
+    Returns:
+        索引文件路径
+    """
+    store_path = Path(store_path or pointcloud_store_path(dataset_dir))
+    pointcloud_files = list_pointcloud_files(dataset_dir)
+    empty = dict(ids=np.empty(0, np.int64), xyz=np.empty((0, 3)), rgb=np.empty((0, 3), np.uint8),
+                 error=np.empty(0), track_lengths=np.empty(0, np.int64),
+                 image_ids=np.empty(0, np.int64), point2D_idxs=np.empty(0, np.int64))
+    columns = {k: [] for k in ('ids', 'xyz', 'rgb', 'error', 'track_lengths', 'image_ids', 'point2D_idxs')}
+    images = []
+    n_points = [0]
+    for image_index, bin_file in tqdm(pointcloud_files, desc="解析点云文件"):
+        try:
+            points = read_points3D_binary_arrays(str(bin_file), with_tracks=True)
+        except Exception as e:
+            # 读取失败的图像按没有点处理
+            print(f"  警告: 读取点云文件失败 {bin_file}: {e}")
+            points = dict(empty, track_offsets=np.zeros(1, np.int64))
+        images.append(image_index)
+        n_points.append(len(points['ids']))
+        points['track_lengths'] = np.diff(points['track_offsets'])
+        for k, column in columns.items():
+            column.append(points[k])
+
+    arrays = {k: np.concatenate(column + [empty[k]]).astype(empty[k].dtype) for k, column in columns.items()}
+    track_lengths = arrays.pop('track_lengths')
+    arrays['track_offsets'] = np.zeros(len(track_lengths) + 1, dtype=np.int64)
+    np.cumsum(track_lengths, out=arrays['track_offsets'][1:])
+    arrays['image_offsets'] = np.cumsum(n_points, dtype=np.int64)
+    write_pack(str(store_path), arrays, dict(images=images))
+    return store_path
+
+
+def load_pointcloud_store(dataset_dir, store_path=None, rebuild=False):
+    """
+    读取列式点云索引，不存在或过期时先重建
+
+    Returns:
+        store: 索引的数组（内存映射），以及 'images'（图像索引 -> 在索引中的位置）
+    """
+    store_path = Path(store_path or pointcloud_store_path(dataset_dir))
+    if rebuild or not is_store_up_to_date(store_path, list_pointcloud_files(dataset_dir)):
+        build_pointcloud_store(dataset_dir, store_path)
+    return open_pointcloud_store(store_path)
+
+
+def open_pointcloud_store(store_path):
+    """读取已经建好的列式点云索引（不检查是否过期）"""
+    arrays, attrs = read_pack(str(store_path))
+    arrays['images'] = {image_index: i for i, image_index in enumerate(attrs['images'])}
+    return arrays
+
+
+def gather_image_points(store, image_indices):
+    """
+    按行范围取出多张图像的点云
+
+    Args:
+        store: load_pointcloud_store 的返回值
+        image_indices: 图像索引列表，不在索引中的图像被忽略
+
+    Returns:
+        每张图像的列式点云列表（格式同 read_points3D_binary_arrays(with_tracks=True)），顺序同 image_indices
+    """
+    point_arrays = []
+    for image_index in image_indices:
+        i = store['images'].get(image_index)
+        if i is None:
+            continue
+        start, end = store['image_offsets'][i], store['image_offsets'][i + 1]
+        track_start, track_end = store['track_offsets'][start], store['track_offsets'][end]
+        point_arrays.append(dict(ids=store['ids'][start:end],
+                                 xyz=store['xyz'][start:end],
+                                 rgb=store['rgb'][start:end],
+                                 error=store['error'][start:end],
+                                 track_offsets=store['track_offsets'][start:end + 1] - track_start,
+                                 image_ids=store['image_ids'][track_start:track_end],
+                                 point2D_idxs=store['point2D_idxs'][track_start:track_end]))
+    return point_arrays
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='将每张图像的点云合并为一个列式点云索引')
+    parser.add_argument('--dataset-dir', '-d',
+                        required=True,
+                        type=str,
+                        help='数据集根目录（包含train/pointclouds/）')
+    parser.add_argument('--store-path',
+                        default=None,
+                        type=str,
+                        help='索引文件路径（默认: <dataset-dir>/train/pointclouds.pack）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store_path = build_pointcloud_store(args.dataset_dir, args.store_path)
+    store = open_pointcloud_store(store_path)
+    print(f'{len(store["images"])} 张图像, {len(store["ids"])} 个点 -> {store_path} '
+          f'({time.perf_counter() - start:.1f} 秒)')
@@ -69,6 +69,14 @@ CAMERA_MODEL_IDS = dict([(camera_model.model_id, camera_model)
                          for camera_model in CAMERA_MODELS])
 CAMERA_MODEL_NAMES = dict([(camera_model.model_name, camera_model)
                            for camera_model in CAMERA_MODELS])
+# record layouts of the binary files, which are packed without padding
+POINT3D_DTYPE = np.dtype([("id", "<u8"), ("xyz", "<f8", 3), ("rgb", "u1", 3), ("error", "<f8")])
+TRACK_ELEM_DTYPE = np.dtype([("image_id", "<i4"), ("point2D_idx", "<i4")])
+IMAGE_DTYPE = np.dtype([("id", "<i4"), ("qvec", "<f8", 4), ("tvec", "<f8", 3), ("camera_id", "<i4")])
+POINT2D_DTYPE = np.dtype([("xy", "<f8", 2), ("point3D_id", "<i8")])
+CAMERA_DTYPE = np.dtype([("id", "<i4"), ("model_id", "<i4"), ("width", "<u8"), ("height", "<u8")])
+# a point record followed by its track length
+POINT3D_TRACK_DTYPE = np.dtype(POINT3D_DTYPE.descr + [("track_length", "<u8")])
 
 
 def read_next_bytes(fid, num_bytes, format_char_sequence, endian_character="<"):
@@ -99,6 +107,71 @@ def write_next_bytes(fid, data, format_char_sequence, endian_character="<"):
     fid.write(bytes)
 
 
+def gather_records(raw, offsets, dtype, chunk_size=1 << 16):
+    """Copies fixed-size records at arbitrary byte offsets into an array of `dtype`.
+    Records are gathered in chunks to bound the size of the byte index.
+    """
+    records = np.empty(len(offsets), dtype=dtype)
+    out = records.view(np.uint8).reshape(len(offsets), dtype.itemsize)
+    columns = np.arange(dtype.itemsize)
+    for start in range(0, len(offsets), chunk_size):
+        out[start:start + chunk_size] = raw[offsets[start:start + chunk_size, None] + columns]
+    return records
+
+
+def scatter_records(raw, offsets, records, chunk_size=1 << 16):
+    """Copies fixed-size records into a byte buffer at arbitrary byte offsets (inverse of `gather_records`)"""
+    values = records.view(np.uint8).reshape(len(records), records.dtype.itemsize)
+    columns = np.arange(records.dtype.itemsize)
+    for start in range(0, len(offsets), chunk_size):
+        raw[offsets[start:start + chunk_size, None] + columns] = values[start:start + chunk_size]
+
+
+def scan_points3D_binary(data):
+    """Finds the offsets of the variable-length records of points3D.bin.
+    Only the track length of every record is read, so this is the only per-point loop.
+    :param data: memoryview of the file
+    :return: offsets of the records and their track lengths as int64 arrays
+    """
+    num_points = struct.unpack_from("<Q", data, 0)[0]
+    unpack_track_length = struct.Struct("<Q").unpack_from
+    track_length_offset = POINT3D_DTYPE.itemsize
+    offsets = [0] * num_points
+    offset = 8
+    for p_id in range(num_points):
+        offsets[p_id] = offset
+        offset += track_length_offset + 8 + TRACK_ELEM_DTYPE.itemsize * unpack_track_length(data, offset + track_length_offset)[0]
+    offsets = np.array(offsets, dtype=np.int64)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    track_lengths = gather_records(raw, offsets + track_length_offset, np.dtype("<u8")).astype(np.int64)
+    return offsets, track_lengths
+
+
+def read_points3D_binary_arrays(path_to_model_file, with_tracks=False):
+    """Reads points3D.bin into arrays without unpacking every point.
+    :param with_tracks: if False, track payloads are skipped
+    :return: dict of "ids", "xyz", "rgb" and "error". with tracks, "track_offsets" (N+1,),
+             "image_ids" and "point2D_idxs", where the track of the i-th point is
+             [track_offsets[i], track_offsets[i+1]) of the latter two
+    """
+    raw = np.memmap(path_to_model_file, dtype=np.uint8, mode="r")
+    offsets, track_lengths = scan_points3D_binary(memoryview(raw))
+    records = gather_records(raw, offsets, POINT3D_DTYPE)
+    points = dict(ids=records["id"].astype(np.int64), xyz=records["xyz"],
+                  rgb=records["rgb"], error=records["error"])
+    if with_tracks:
+        track_offsets = np.zeros(len(offsets) + 1, dtype=np.int64)
+        np.cumsum(track_lengths, out=track_offsets[1:])
+        # byte offset of every track element
+        elem_index = np.arange(track_offsets[-1], dtype=np.int64) - np.repeat(track_offsets[:-1], track_lengths)
+        elem_offsets = np.repeat(offsets + POINT3D_DTYPE.itemsize + 8, track_lengths) + TRACK_ELEM_DTYPE.itemsize * elem_index
+        track_elems = gather_records(raw, elem_offsets, TRACK_ELEM_DTYPE)
+        points.update(track_offsets=track_offsets,
+                      image_ids=track_elems["image_id"].astype(np.int64),
+                      point2D_idxs=track_elems["point2D_idx"].astype(np.int64))
+    return points
+
+
 def read_cameras_text(path):
     """
     see: src/colmap/scene/reconstruction.cc
@@ -177,17 +250,14 @@ def write_cameras_binary(cameras, path_to_model_file):
         void Reconstruction::WriteCamerasBinary(const std::string& path)
         void Reconstruction::ReadCamerasBinary(const std::string& path)
     """
+    chunks = [np.array(len(cameras), dtype="<u8").tobytes()]
+    for _, cam in cameras.items():
+        properties = np.array((cam.id, CAMERA_MODEL_NAMES[cam.model].model_id,
+                               cam.width, cam.height), dtype=CAMERA_DTYPE)
+        chunks.append(properties.tobytes())
+        chunks.append(np.asarray(cam.params, dtype="<f8").tobytes())
     with open(path_to_model_file, "wb") as fid:
-        write_next_bytes(fid, len(cameras), "Q")
-        for _, cam in cameras.items():
-            model_id = CAMERA_MODEL_NAMES[cam.model].model_id
-            camera_properties = [cam.id,
-                                 model_id,
-                                 cam.width,
-                                 cam.height]
-            write_next_bytes(fid, camera_properties, "iiQQ")
-            for p in cam.params:
-                write_next_bytes(fid, float(p), "d")
+        fid.write(b"".join(chunks))
     return cameras
 
 
@@ -230,30 +300,24 @@ def read_images_binary(path_to_model_file):
     """
     images = {}
     with open(path_to_model_file, "rb") as fid:
-        num_reg_images = read_next_bytes(fid, 8, "Q")[0]
-        for _ in range(num_reg_images):
-            binary_image_properties = read_next_bytes(
-                fid, num_bytes=64, format_char_sequence="idddddddi")
-            image_id = binary_image_properties[0]
-            qvec = np.array(binary_image_properties[1:5])
-            tvec = np.array(binary_image_properties[5:8])
-            camera_id = binary_image_properties[8]
-            image_name = ""
-            current_char = read_next_bytes(fid, 1, "c")[0]
-            while current_char != b"\x00":   # look for the ASCII 0 entry
-                image_name += current_char.decode("utf-8")
-                current_char = read_next_bytes(fid, 1, "c")[0]
-            num_points2D = read_next_bytes(fid, num_bytes=8,
-                                           format_char_sequence="Q")[0]
-            x_y_id_s = read_next_bytes(fid, num_bytes=24*num_points2D,
-                                       format_char_sequence="ddq"*num_points2D)
-            xys = np.column_stack([tuple(map(float, x_y_id_s[0::3])),
-                                   tuple(map(float, x_y_id_s[1::3]))])
-            point3D_ids = np.array(tuple(map(int, x_y_id_s[2::3])))
-            images[image_id] = Image(
-                id=image_id, qvec=qvec, tvec=tvec,
-                camera_id=camera_id, name=image_name,
-                xys=xys, point3D_ids=point3D_ids)
+        data = fid.read()
+    num_reg_images = struct.unpack_from("<Q", data, 0)[0]
+    offset = 8
+    for _ in range(num_reg_images):
+        properties = np.frombuffer(data, dtype=IMAGE_DTYPE, count=1, offset=offset)[0]
+        offset += IMAGE_DTYPE.itemsize
+        name_end = data.index(b"\x00", offset)   # look for the ASCII 0 entry
+        image_name = data[offset:name_end].decode("utf-8")
+        offset = name_end + 1
+        num_points2D = struct.unpack_from("<Q", data, offset)[0]
+        offset += 8
+        points2D = np.frombuffer(data, dtype=POINT2D_DTYPE, count=num_points2D, offset=offset)
+        offset += POINT2D_DTYPE.itemsize * num_points2D
+        image_id = int(properties["id"])
+        images[image_id] = Image(
+            id=image_id, qvec=properties["qvec"].astype(np.float64), tvec=properties["tvec"].astype(np.float64),
+            camera_id=int(properties["camera_id"]), name=image_name,
+            xys=points2D["xy"].astype(np.float64), point3D_ids=points2D["point3D_id"].astype(np.int64))
     return images
 
 
@@ -291,19 +355,20 @@ def write_images_binary(images, path_to_model_file):
         void Reconstruction::ReadImagesBinary(const std::string& path)
         void Reconstruction::WriteImagesBinary(const std::string& path)
     """
+    chunks = [np.array(len(images), dtype="<u8").tobytes()]
+    for _, img in images.items():
+        properties = np.zeros((), dtype=IMAGE_DTYPE)
+        properties["id"] = img.id
+        properties["qvec"] = img.qvec
+        properties["tvec"] = img.tvec
+        properties["camera_id"] = img.camera_id
+        points2D = np.empty(len(img.point3D_ids), dtype=POINT2D_DTYPE)
+        points2D["xy"] = np.asarray(img.xys).reshape(-1, 2)
+        points2D["point3D_id"] = img.point3D_ids
+        chunks += [properties.tobytes(), img.name.encode("utf-8") + b"\x00",
+                   np.array(len(points2D), dtype="<u8").tobytes(), points2D.tobytes()]
     with open(path_to_model_file, "wb") as fid:
-        write_next_bytes(fid, len(images), "Q")
-        for _, img in images.items():
-            write_next_bytes(fid, img.id, "i")
-            write_next_bytes(fid, img.qvec.tolist(), "dddd")
-            write_next_bytes(fid, img.tvec.tolist(), "ddd")
-            write_next_bytes(fid, img.camera_id, "i")
-            for char in img.name:
-                write_next_bytes(fid, char.encode("utf-8"), "c")
-            write_next_bytes(fid, b"\x00", "c")
-            write_next_bytes(fid, len(img.point3D_ids), "Q")
-            for xy, p3d_id in zip(img.xys, img.point3D_ids):
-                write_next_bytes(fid, [*xy, p3d_id], "ddq")
+        fid.write(b"".join(chunks))
 
 
 def read_points3D_text(path):
@@ -339,30 +404,41 @@ def read_points3D_binary(path_to_model_file):
         void Reconstruction::ReadPoints3DBinary(const std::string& path)
         void Reconstruction::WritePoints3DBinary(const std::string& path)
     """
-    points3D = {}
-    with open(path_to_model_file, "rb") as fid:
-        num_points = read_next_bytes(fid, 8, "Q")[0]
-        for _ in range(num_points):
-            binary_point_line_properties = read_next_bytes(
-                fid, num_bytes=43, format_char_sequence="QdddBBBd")
-            point3D_id = binary_point_line_properties[0]
-            xyz = np.array(binary_point_line_properties[1:4])
-            rgb = np.array(binary_point_line_properties[4:7])
-            error = np.array(binary_point_line_properties[7])
-            track_length = read_next_bytes(
-                fid, num_bytes=8, format_char_sequence="Q")[0]
-            track_elems = read_next_bytes(
-                fid, num_bytes=8*track_length,
-                format_char_sequence="ii"*track_length)
-            image_ids = np.array(tuple(map(int, track_elems[0::2])))
-            point2D_idxs = np.array(tuple(map(int, track_elems[1::2])))
-            points3D[point3D_id] = Point3D(
-                id=point3D_id, xyz=xyz, rgb=rgb,
-                error=error, image_ids=image_ids,
-                point2D_idxs=point2D_idxs)
+    return arrays_to_points3D(read_points3D_binary_arrays(path_to_model_file, with_tracks=True))
+
+
+def arrays_to_points3D(points):
+    """Converts arrays in the format returned by `read_points3D_binary_arrays(with_tracks=True)`
+    into a dict of Point3D, whose rows and tracks are views of the arrays.
+    """
+    point3D_ids = points["ids"].tolist()
+    track_offsets = points["track_offsets"].tolist()
+    track_ranges = list(zip(track_offsets[:-1], track_offsets[1:]))
+    image_ids, point2D_idxs = points["image_ids"], points["point2D_idxs"]
+    points3D = dict(zip(point3D_ids, map(
+        Point3D, point3D_ids, points["xyz"], points["rgb"].astype(np.int64), points["error"],
+        [image_ids[start:end] for start, end in track_ranges],
+        [point2D_idxs[start:end] for start, end in track_ranges])))
     return points3D
 
 
+def points3D_to_arrays(points3D):
+    """Converts a dict of Point3D into arrays in the format returned by `read_points3D_binary_arrays(with_tracks=True)`"""
+    pts = list(points3D.values())
+    track_lengths = np.array([len(pt.image_ids) for pt in pts], dtype=np.int64)
+    track_offsets = np.zeros(len(pts) + 1, dtype=np.int64)
+    np.cumsum(track_lengths, out=track_offsets[1:])
+    return dict(ids=np.array([pt.id for pt in pts], dtype=np.int64).reshape(-1),
+                xyz=np.array([pt.xyz for pt in pts], dtype=np.float64).reshape(-1, 3),
+                rgb=np.array([pt.rgb for pt in pts]).reshape(-1, 3),
+                error=np.array([pt.error for pt in pts], dtype=np.float64).reshape(-1),
+                track_offsets=track_offsets,
+                image_ids=np.concatenate([np.asarray(pt.image_ids, dtype=np.int64).reshape(-1) for pt in pts]
+                                         + [np.empty(0, np.int64)]),
+                point2D_idxs=np.concatenate([np.asarray(pt.point2D_idxs, dtype=np.int64).reshape(-1) for pt in pts]
+                                            + [np.empty(0, np.int64)]))
+
+
 def write_points3D_text(points3D, path):
     """
     see: src/colmap/scene/reconstruction.cc
@@ -394,17 +470,41 @@ def write_points3D_binary(points3D, path_to_model_file):
         void Reconstruction::ReadPoints3DBinary(const std::string& path)
         void Reconstruction::WritePoints3DBinary(const std::string& path)
     """
+    write_points3D_binary_arrays(points3D_to_arrays(points3D), path_to_model_file)
+
+
+def write_points3D_binary_arrays(points, path_to_model_file, chunk_size=1 << 16):
+    """Writes points3D.bin from arrays in the format returned by `read_points3D_binary_arrays(with_tracks=True)`.
+    Every chunk of `chunk_size` points is assembled in a byte buffer and written at once.
+    """
+    num_points = len(points["ids"])
+    track_offsets = points["track_offsets"]
+    track_lengths = np.diff(track_offsets)
+    records = np.empty(num_points, dtype=POINT3D_TRACK_DTYPE)
+    records["id"] = points["ids"]
+    records["xyz"] = points["xyz"]
+    records["rgb"] = points["rgb"]
+    records["error"] = points["error"]
+    records["track_length"] = track_lengths
+    track_elems = np.empty(track_offsets[-1], dtype=TRACK_ELEM_DTYPE)
+    track_elems["image_id"] = points["image_ids"]
+    track_elems["point2D_idx"] = points["point2D_idxs"]
     with open(path_to_model_file, "wb") as fid:
-        write_next_bytes(fid, len(points3D), "Q")
-        for _, pt in points3D.items():
-            write_next_bytes(fid, pt.id, "Q")
-            write_next_bytes(fid, pt.xyz.tolist(), "ddd")
-            write_next_bytes(fid, pt.rgb.tolist(), "BBB")
-            write_next_bytes(fid, pt.error, "d")
-            track_length = pt.image_ids.shape[0]
-            write_next_bytes(fid, track_length, "Q")
-            for image_id, point2D_id in zip(pt.image_ids, pt.point2D_idxs):
-                write_next_bytes(fid, [image_id, point2D_id], "ii")
+        np.array(num_points, dtype="<u8").tofile(fid)
+        for start in range(0, num_points, chunk_size):
+            end = min(start + chunk_size, num_points)
+            elem_start, elem_end = track_offsets[start], track_offsets[end]
+            # byte offsets of the records and the track elements in the chunk
+            offsets = (POINT3D_TRACK_DTYPE.itemsize * np.arange(end - start)
+                       + TRACK_ELEM_DTYPE.itemsize * (track_offsets[start:end] - elem_start))
+            elem_index = np.arange(elem_start, elem_end) - np.repeat(track_offsets[start:end], track_lengths[start:end])
+            elem_offsets = (np.repeat(offsets + POINT3D_TRACK_DTYPE.itemsize, track_lengths[start:end])
+                            + TRACK_ELEM_DTYPE.itemsize * elem_index)
+            raw = np.empty(POINT3D_TRACK_DTYPE.itemsize * (end - start)
+                           + TRACK_ELEM_DTYPE.itemsize * (elem_end - elem_start), dtype=np.uint8)
+            scatter_records(raw, offsets, records[start:end])
+            scatter_records(raw, elem_offsets, track_elems[elem_start:elem_end])
+            raw.tofile(fid)
 
 
 def detect_model_format(path, ext):
@@ -24,8 +24,12 @@ if errorlevel 1 goto :error
 colmap feature_extractor --database_path "%OUT_DIR%\database.db" --image_path "%DATA_ROOT%\rgbs" --image_list_path "%INDEX_FILE%" --ImageReader.camera_model PINHOLE
 if errorlevel 1 goto :error
 
-:: 3. 特征匹配 (Exhaustive Matcher)
-colmap exhaustive_matcher --database_path "%OUT_DIR%\database.db"
+:: 3. 特征匹配：只匹配create_db.py根据位姿选出的图像对(pairs.txt)，没有时匹配所有图像对
+if exist "%OUT_DIR%\pairs.txt" (
+    colmap matches_importer --database_path "%OUT_DIR%\database.db" --match_list_path "%OUT_DIR%\pairs.txt" --match_type pairs
+) else (
+    colmap exhaustive_matcher --database_path "%OUT_DIR%\database.db"
+)
 if errorlevel 1 goto :error
 
 :: 4. 创建 sparse/0 目录
@@ -38,6 +42,7 @@ if errorlevel 1 goto :error
 :: 6. 清理临时文件 (Cleanup)
 del /Q "%OUT_DIR%\sparse\*.txt" 2>nul
 del /Q "%OUT_DIR%\database.db" 2>nul
+del /Q "%OUT_DIR%\pairs.txt" 2>nul
 
 echo [SUCCESS] Triangulation completed successfully.
 exit /b 0